@@ -1,21 +1,19 @@
 from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from models.user import UserCreate, UserResponse, User
-from services.user_service import UserService, get_current_user, get_current_admin_user
+from models.user import UserCreate, UserResponse, User, UserPage
+from services.user_service import UserService, get_current_user, get_current_admin_user, get_user_service, invalidate_user
+from services.password_hasher import get_password_hasher
+from services.pagination import decode_cursor, page_limit, page
 from datetime import timedelta, datetime
 from jose import jwt, JWTError
 from core.config import settings
-import bcrypt
-from typing import List
-from typing import List, Dict  
+from typing import List, Dict, Optional
 from bson import ObjectId
 import logging
 
 router = APIRouter()
 
-user_service = UserService()
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
@@ -34,7 +32,7 @@ def create_access_token(data: dict, expires_delta: timedelta):
 
 # Route to register a new user
 @router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, user_service: UserService = Depends(get_user_service)):
     existing_user = await user_service.get_user_by_email(user_data.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
@@ -43,7 +41,7 @@ async def register(user_data: UserCreate):
 
     # If an admin key is provided, validate it
     if user_data.admin_key:
-        if bcrypt.checkpw(user_data.admin_key.encode(), settings.admin_key_hash.encode()):
+        if await get_password_hasher().verify_admin_key(user_data.admin_key):
             role = "admin"
         else:
             raise HTTPException(status_code=403, detail="Invalid admin key")
@@ -67,7 +65,7 @@ async def register(user_data: UserCreate):
 
 # User login endpoint
 @router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), user_service: UserService = Depends(get_user_service)):
     user = await user_service.get_user_by_email(form_data.username)
     
     # Vérifier si l'utilisateur existe et n'est pas bloqué
@@ -77,7 +75,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     if user.is_blocked:
         raise HTTPException(status_code=403, detail="This account has been blocked")
         
-    if not user_service.verify_password(form_data.password, user.hashed_password):
+    if not await user_service.verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     access_token = create_access_token(
@@ -88,8 +86,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
 # Admin login endpoint
 @router.post("/admin/login")
-async def admin_login(admin_key: str):
-    if not bcrypt.checkpw(admin_key.encode(), settings.admin_key_hash.encode()):
+async def admin_login(admin_key: str, user_service: UserService = Depends(get_user_service)):
+    if not await get_password_hasher().verify_admin_key(admin_key):
         raise HTTPException(status_code=401, detail="Invalid admin key")
 
     # Create token with admin role and specific admin email
@@ -124,13 +122,20 @@ async def admin_dashboard(current_admin: dict = Depends(get_current_admin_user))
     return {"message": "Bienvenue sur le tableau de bord administrateur !"}
 
 # Endpoint to get all non-admin users
-@router.get("/admin/users", response_model=List[UserResponse])
-async def get_all_users(current_user: User = Depends(get_current_admin_user)):
+@router.get("/admin/users", response_model=UserPage)
+async def get_all_users(limit: Optional[int] = None, cursor: Optional[str] = None,
+                        current_user: User = Depends(get_current_admin_user),
+                        user_service: UserService = Depends(get_user_service)):
+    position = decode_cursor(cursor, id=ObjectId)
+    limit = page_limit(limit)
     try:
-        await user_service.users.create_index("role")
-        
+        match = {"role": {"$ne": "admin"}}
+        if position:
+            match["_id"] = {"$gt": position["id"]}
         pipeline = [
-            {"$match": {"role": {"$ne": "admin"}}},
+            {"$match": match},
+            {"$sort": {"_id": 1}},
+            {"$limit": limit + 1},
             {"$project": {
                 "email": 1,
                 "first_name": 1,
@@ -140,9 +145,13 @@ async def get_all_users(current_user: User = Depends(get_current_admin_user)):
             }}
         ]
         
-        users = await user_service.users.aggregate(pipeline).to_list(length=100)
-        
-        return [
+        users = await user_service.users.aggregate(pipeline).to_list(length=limit + 1)
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = {"id": str(users[-1]["_id"])}
+
+        return page([
             UserResponse(
                 id=str(user["_id"]),
                 email=user["email"],
@@ -152,7 +161,7 @@ async def get_all_users(current_user: User = Depends(get_current_admin_user)):
                 is_blocked=user.get("is_blocked", False)  # Ajouter ce champ
             ) 
             for user in users
-        ]
+        ], next_cursor)
     except Exception as e:
         print(f"Error in get_all_users: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -181,7 +190,8 @@ def verify_admin_token(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
 @router.delete("/admin/users/{user_id}")
-async def delete_user(user_id: str, current_user: User = Depends(get_current_admin_user)):
+async def delete_user(user_id: str, current_user: User = Depends(get_current_admin_user),
+                      user_service: UserService = Depends(get_user_service)):
     try:
         # Validate ObjectId format
         if not ObjectId.is_valid(user_id):
@@ -204,7 +214,8 @@ async def delete_user(user_id: str, current_user: User = Depends(get_current_adm
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
-            
+
+        await invalidate_user(user["email"], user_service)
         return {"message": "User successfully deleted"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid user ID: {str(e)}")
@@ -215,7 +226,8 @@ async def delete_user(user_id: str, current_user: User = Depends(get_current_adm
 @router.put("/admin/users/{user_id}/toggle-block")
 async def toggle_user_block(
     user_id: str, 
-    current_user: User = Depends(get_current_admin_user)
+    current_user: User = Depends(get_current_admin_user),
+    user_service: UserService = Depends(get_user_service)
 ):
     try:
         # Validate ObjectId format
@@ -242,7 +254,8 @@ async def toggle_user_block(
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="User not found")
-            
+
+        await invalidate_user(user["email"], user_service)
         return {
             "message": f"User {'blocked' if new_status else 'unblocked'} successfully",
             "is_blocked": new_status
@@ -255,7 +268,8 @@ async def toggle_user_block(
         )
 
 @router.get("/user/status")
-async def check_user_status(current_user: User = Depends(get_current_user)):
+async def check_user_status(current_user: User = Depends(get_current_user),
+                            user_service: UserService = Depends(get_user_service)):
     """Vérifie si l'utilisateur est bloqué"""
     user = await user_service.get_user_by_email(current_user.email)
     
@@ -275,7 +289,8 @@ class UserStatsResponse(BaseModel):
     count: int
 
 @router.get("/admin/user-stats", response_model=List[UserStatsResponse])
-async def get_user_stats(days: int = 30, current_user: User = Depends(get_current_admin_user)):
+async def get_user_stats(days: int = 30, current_user: User = Depends(get_current_admin_user),
+                         user_service: UserService = Depends(get_user_service)):
     try:
         # Log des paramètres reçus
         logger.info(f"Requête pour les statistiques avec days={days}, utilisateur : {current_user.email}")
@@ -291,7 +306,8 @@ async def get_user_stats(days: int = 30, current_user: User = Depends(get_curren
         logger.error(f"Erreur dans /admin/user-stats : {e}")
         raise HTTPException(status_code=500, detail=f"Erreur : {str(e)}")
 @router.get("/admin/sessions-per-user")
-async def get_sessions_per_user(current_user: User = Depends(get_current_admin_user)):
+async def get_sessions_per_user(current_user: User = Depends(get_current_admin_user),
+                                user_service: UserService = Depends(get_user_service)):
     try:
         stats = await user_service.get_sessions_per_user()
         return stats
@@ -299,3 +315,8 @@ async def get_sessions_per_user(current_user: User = Depends(get_current_admin_u
         logger.error(f"Erreur dans /admin/sessions-per-user : {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/admin/activity-stats")
+async def get_activity_stats(days: int = 30, current_user: User = Depends(get_current_admin_user),
+                             user_service: UserService = Depends(get_user_service)):
+    """Inscriptions, sessions, messages et tokens par jour (compteurs pré-agrégés)."""
+    return await user_service.get_activity_stats(days)
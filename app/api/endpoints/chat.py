@@ -5,44 +5,24 @@ Inclut les endpoints du TP1 et du TP2, avec authentification
 """
 from fastapi import APIRouter, HTTPException, Depends
 from models.chat import ChatRequestTP1, ChatRequestTP2, ChatRequestWithContext, ChatResponse
-from services.EnhancedLLMService import EnhancedLLMService
-from typing import Dict, List
+from services.EnhancedLLMService import EnhancedLLMService, get_llm_service
+from typing import Dict, Optional
 import uuid
-from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-import os
 import logging
 from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi.responses import StreamingResponse
+import json
 from datetime import datetime
-from core.config import settings
+from services.user_service import get_current_user_email as get_current_user
+from services.pagination import decode_cursor, page_limit
+from bson import ObjectId
 
 router = APIRouter()
 
-llm_service = EnhancedLLMService(
-    mongo_uri=settings.mongodb_uri,
-    db_name=settings.database_name,
-    collection_name="pdf_chunks",  # Assurez-vous que cela correspond à votre collection
-    embedding_model_name="all-MiniLM-L6-v2"  # Modèle utilisé pour les embeddings
-)
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
-
 logging.basicConfig(level=logging.INFO)
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    """
-    Vérifie et décode le token JWT pour obtenir l'utilisateur connecté.
-    """
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication")
-        return email
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid authentication")
 @router.post("/chat/simple", response_model=ChatResponse)
-async def chat_simple(request: ChatRequestTP1, user: str = Depends(get_current_user)) -> ChatResponse:
+async def chat_simple(request: ChatRequestTP1, user: str = Depends(get_current_user),
+                      llm_service: EnhancedLLMService = Depends(get_llm_service)) -> ChatResponse:
     """Endpoint simple du TP1 avec authentification"""
     logging.info(f"Demande reçue pour chat_simple : {request.message}")
     try:
@@ -53,7 +33,8 @@ async def chat_simple(request: ChatRequestTP1, user: str = Depends(get_current_u
         logging.error(f"Erreur dans chat_simple : {e}")
         raise HTTPException(status_code=500, detail=f"Erreur interne : {e}")
 @router.post("/chat/with-context", response_model=ChatResponse)
-async def chat_with_context(request: ChatRequestWithContext, user: str = Depends(get_current_user)) -> ChatResponse:
+async def chat_with_context(request: ChatRequestWithContext, user: str = Depends(get_current_user),
+                            llm_service: EnhancedLLMService = Depends(get_llm_service)) -> ChatResponse:
     """Endpoint avec contexte du TP1 et authentification"""
     logging.info(f"Demande reçue pour chat_with_context : message={request.message}, contexte={request.context}")
     try:
@@ -67,7 +48,8 @@ async def chat_with_context(request: ChatRequestWithContext, user: str = Depends
         logging.error(f"Erreur dans chat_with_context : {e}")
         raise HTTPException(status_code=500, detail=f"Erreur interne : {e}")
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequestTP2, user: str = Depends(get_current_user)) -> ChatResponse:
+async def chat(request: ChatRequestTP2, user: str = Depends(get_current_user),
+               llm_service: EnhancedLLMService = Depends(get_llm_service)) -> ChatResponse:
     logging.info(f"Demande reçue pour chat : message={request.message}, session_id={request.session_id}")
     try:
         # Vérifiez si les champs nécessaires sont présents
@@ -82,24 +64,68 @@ async def chat(request: ChatRequestTP2, user: str = Depends(get_current_user)) -
     except Exception as e:
         logging.error(f"Erreur dans chat : {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la génération de la réponse : {e}")
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequestTP2, user: str = Depends(get_current_user),
+                      llm_service: EnhancedLLMService = Depends(get_llm_service)) -> StreamingResponse:
+    """
+    Variante de /chat qui transmet la réponse au fil de l'eau (Server-Sent Events).
+    Chaque événement `data` contient un fragment {"token": ...} ; un événement `done`
+    termine le flux une fois l'échange sauvegardé.
+    """
+    logging.info(f"Demande reçue pour chat_stream : message={request.message}, session_id={request.session_id}")
+    if not request.message or not request.session_id:
+        logging.error("Message ou session_id manquant")
+        raise HTTPException(status_code=400, detail="Message ou session_id manquant")
+    try:
+        tokens = await llm_service.stream_response(request.message, request.session_id, user_email=user)
+    except Exception as e:
+        logging.error(f"Erreur dans chat_stream : {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la génération de la réponse : {e}")
+
+    async def event_stream():
+        try:
+            async for token in tokens:
+                yield f"data: {json.dumps({'token': token}, ensure_ascii=False)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            logging.error(f"Erreur pendant le flux de chat_stream : {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 @router.get("/sessions")
-async def get_all_sessions(user: str = Depends(get_current_user)) -> List[str]:
-    """Récupération de toutes les sessions disponibles de l'utilisateur."""
-    logging.info(f"Requête reçue pour récupérer toutes les sessions de l'utilisateur : {user}")
+async def get_all_sessions(limit: Optional[int] = None, cursor: Optional[str] = None,
+                           user: str = Depends(get_current_user),
+                           llm_service: EnhancedLLMService = Depends(get_llm_service)) -> Dict:
+    """
+    Récupération des sessions de l'utilisateur, les plus récentes d'abord, par pages.
+    Retourne {"items": [...], "next_cursor": ...} ; `next_cursor` est à renvoyer pour la page suivante.
+    """
+    logging.info(f"Requête reçue pour récupérer les sessions de l'utilisateur : {user}")
+    position = decode_cursor(cursor, id=ObjectId)
     try:
-        sessions = await llm_service.get_all_sessions(user)
-        logging.info(f"Sessions trouvées : {sessions}")
+        sessions = await llm_service.get_all_sessions(user, page_limit(limit), position)
+        logging.info(f"Sessions trouvées : {len(sessions['items'])}")
         return sessions
     except Exception as e:
         logging.error(f"Erreur dans get_all_sessions : {e}")
         raise HTTPException(status_code=500, detail=f"Erreur interne : {e}")
 @router.get("/history/{session_id}")
-async def get_history(session_id: str, user: str = Depends(get_current_user)) -> List[Dict[str, str]]:
+async def get_history(session_id: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+                      user: str = Depends(get_current_user),
+                      llm_service: EnhancedLLMService = Depends(get_llm_service)) -> Dict:
+    """
+    Historique d'une session par pages : les messages les plus récents d'abord
+    (dans l'ordre chronologique), `next_cursor` donnant accès aux plus anciens.
+    """
     print(f"Requête reçue pour l'historique : session_id={session_id}, user={user}")
+    position = decode_cursor(cursor, **llm_service.mongo_service.history_cursor_fields)
     try:
-        # Récupérer l'historique de la conversation
-        history = await llm_service.get_conversation_history(session_id, user_email=user)
-        print(f"Historique brut récupéré : {history}")
+        # Récupérer une page de l'historique de la conversation
+        history = await llm_service.get_conversation_history(session_id, user, page_limit(limit), position)
 
         # Formater les timestamps en chaînes
         formatted_history = [
@@ -108,16 +134,16 @@ async def get_history(session_id: str, user: str = Depends(get_current_user)) ->
                 "content": message["content"],
                 "timestamp": format_datetime(message["timestamp"])  # Conversion ici
             }
-            for message in history
+            for message in history["items"]
         ]
-        print(f"Historique formaté : {formatted_history}")
-        return formatted_history
+        return {"items": formatted_history, "next_cursor": history["next_cursor"]}
 
     except Exception as e:
         print(f"Erreur dans get_history : {e}")
         raise HTTPException(status_code=500, detail=f"Erreur interne : {e}")
 @router.post("/create-session")
-async def create_session(user: str = Depends(get_current_user)) -> str:
+async def create_session(user: str = Depends(get_current_user),
+                         llm_service: EnhancedLLMService = Depends(get_llm_service)) -> str:
     """Crée une nouvelle session pour l'utilisateur."""
     logging.info(f"Endpoint /create-session appelé par l'utilisateur : {user}")
     try:
@@ -128,7 +154,8 @@ async def create_session(user: str = Depends(get_current_user)) -> str:
         logging.error(f"Erreur dans create_session : {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création de la session : {e}")
 @router.delete("/delete-session/{session_id}")
-async def delete_session(session_id: str, user: str = Depends(get_current_user)):
+async def delete_session(session_id: str, user: str = Depends(get_current_user),
+                         llm_service: EnhancedLLMService = Depends(get_llm_service)):
     """
     Supprime une session spécifique de l'utilisateur.
     """
@@ -142,7 +169,8 @@ async def delete_session(session_id: str, user: str = Depends(get_current_user))
         logging.error(f"Erreur dans delete_session : {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la suppression de la session : {e}")
 @router.put("/rename-session/{session_id}")
-async def rename_session(session_id: str, new_name: str = Body(..., embed=True), user: str = Depends(get_current_user)):
+async def rename_session(session_id: str, new_name: str = Body(..., embed=True), user: str = Depends(get_current_user),
+                         llm_service: EnhancedLLMService = Depends(get_llm_service)):
     """
     Renomme une session spécifique de l'utilisateur.
     """
@@ -0,0 +1,55 @@
+# app/api/endpoints/metrics.py
+"""
+Métriques de performance du processus, réservées aux administrateurs.
+"""
+from fastapi import APIRouter, Depends
+from models.user import User
+from services.user_service import get_current_admin_user, principal_cache
+from services.registry import get_vector_search_service
+from core.database import pool_stats
+from services.password_hasher import get_password_hasher
+from services.answer_cache import get_answer_cache
+from services.context_builder import get_context_builder
+
+router = APIRouter()
+
+
+@router.get("/metrics/retrieval")
+async def retrieval_metrics(current_user: User = Depends(get_current_admin_user)):
+    """
+    Statistiques de la recherche vectorielle : micro-lots d'embedding des requêtes,
+    caches d'embeddings et de résultats, cache sémantique des réponses et sélection
+    du contexte (tokens envoyés et économisés).
+    """
+    vector_search_service = get_vector_search_service()
+    answer_cache = get_answer_cache()
+    return {
+        "query_batching": vector_search_service.query_batcher.stats(),
+        **vector_search_service.cache_stats(),
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "context": get_context_builder().stats(),
+    }
+
+
+@router.get("/metrics/mongo")
+async def mongo_metrics(current_user: User = Depends(get_current_admin_user)):
+    """
+    État des pools de connexions MongoDB partagés (Motor et PyMongo).
+    """
+    return pool_stats()
+
+
+@router.get("/metrics/auth")
+async def auth_metrics(current_user: User = Depends(get_current_admin_user)):
+    """
+    Statistiques du cache des utilisateurs authentifiés.
+    """
+    return principal_cache.stats()
+
+
+@router.get("/metrics/password-hashing")
+async def password_hashing_metrics(current_user: User = Depends(get_current_admin_user)):
+    """
+    File d'attente et durées des opérations bcrypt.
+    """
+    return get_password_hasher().stats()
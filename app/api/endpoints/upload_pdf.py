@@ -1,91 +1,139 @@
 # Nouvelle route pour l'upload et traitement des PDF
 from fastapi import APIRouter, HTTPException, Depends, File, UploadFile
-from pymongo import MongoClient
-from sentence_transformers import SentenceTransformer
-import fitz  # PyMuPDF
+from bson import ObjectId
 import os
 from models.user import User
-from services.mongo_service import MongoService
 from services.user_service import get_current_admin_user
-from services.vector_search_service import VectorSearchService  # Importer VectorSearchService
+from services.registry import get_vector_search_service
+from services.vector_search_service import VectorSearchService
+from services.pdf_ingestion import spool_upload
+from services.ingestion_jobs import (
+    IngestionJobService, get_ingestion_job_service, get_ingestion_worker_pool
+)
 router = APIRouter()
-import asyncio
-
-# Charger le modèle pour la vectorisation
-model = SentenceTransformer('all-MiniLM-L6-v2')
 
 # Définir le répertoire pour les uploads
 UPLOAD_DIRECTORY = "uploads"
 if not os.path.exists(UPLOAD_DIRECTORY):
     os.makedirs(UPLOAD_DIRECTORY)
 
-# MongoService pour l'interaction avec MongoDB
-mongo_service = MongoService()
 
-# Initialiser le service de recherche vectorielle
-vector_search_service = VectorSearchService(
-    mongo_uri=os.getenv("MONGODB_URI"),
-    db_name=os.getenv("DATABASE_NAME"),
-    collection_name="pdf_chunks",
-    embedding_model_name="all-MiniLM-L6-v2"
-)
+def parse_job_id(job_id: str) -> ObjectId:
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=400, detail="Identifiant de travail invalide")
+    return ObjectId(job_id)
+
 
-@router.post("/upload-pdf")
+@router.post("/upload-pdf", status_code=202)
 async def upload_pdf(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: User = Depends(get_current_admin_user),
+    job_service: IngestionJobService = Depends(get_ingestion_job_service)
 ):
     """
-    Endpoint pour uploader un fichier PDF, l'extraire en chunks, vectoriser les textes
-    et stocker les chunks avec leurs vecteurs dans MongoDB.
+    Endpoint pour uploader un fichier PDF. Le fichier est enregistré puis un travail
+    d'ingestion (extraction, vectorisation, stockage et indexation) est mis en file ;
+    la réponse 202 contient l'identifiant du travail à suivre via /admin/ingestion-jobs/{job_id}.
     """
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="Seuls les fichiers PDF sont autorisés.")
 
-    # Sauvegarder le fichier localement
-    file_location = os.path.join(UPLOAD_DIRECTORY, file.filename)
+    # Sauvegarder le fichier localement, par morceaux ; un fichier par travail
+    job_id = ObjectId()
+    file_name = os.path.basename(file.filename)
+    file_location = os.path.join(UPLOAD_DIRECTORY, f"{job_id}-{file_name}")
     try:
-        with open(file_location, "wb") as f:
-            f.write(await file.read())
+        await spool_upload(file, file_location)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors du téléchargement : {e}")
 
-    # Extraction des chunks du PDF
     try:
-        doc = fitz.open(file_location)
-        chunks = []
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            text = page.get_text("text")
-            if text.strip():
-                chunks.append({"page_number": page_num + 1, "text": text.strip()})
+        job = await job_service.enqueue(job_id, file_name, file_location, current_user.email)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors de l'extraction des chunks : {e}")
+        os.remove(file_location)
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la création du travail d'ingestion : {e}")
+    get_ingestion_worker_pool().wake()
+    return {"message": "Document mis en file pour indexation", **job_service.to_response(job)}
 
-    # Vectorisation des chunks
-    try:
-        texts = [chunk["text"] for chunk in chunks]
-        vectors = model.encode(texts)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors de la vectorisation : {e}")
 
-    # Stockage dans MongoDB
-    try:
-        insertion_tasks = [
-            mongo_service.db["pdf_chunks"].insert_one({
-                "file_name": file.filename,
-                "page_number": chunk["page_number"],
-                "text": chunk["text"],
-                "vector": vector.tolist()
-            })
-            for chunk, vector in zip(chunks, vectors)
-        ]
-        await asyncio.gather(*insertion_tasks)  # Attendre la fin de toutes les insertions
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors du stockage dans MongoDB : {e}")
+@router.get("/ingestion-jobs")
+async def list_ingestion_jobs(
+    limit: int = 20,
+    current_user: User = Depends(get_current_admin_user),
+    job_service: IngestionJobService = Depends(get_ingestion_job_service)
+):
+    """
+    Travaux d'ingestion les plus récents.
+    """
+    jobs = await job_service.list_recent(max(1, min(limit, 100)))
+    return [job_service.to_response(job) for job in jobs]
+
 
-    # Recharger l'index FAISS
+@router.get("/ingestion-jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: str,
+    current_user: User = Depends(get_current_admin_user),
+    job_service: IngestionJobService = Depends(get_ingestion_job_service)
+):
+    """
+    État et avancement d'un travail : pages traitées, chunks vectorisés et stockés, débit.
+    """
+    job = await job_service.get(parse_job_id(job_id))
+    if not job:
+        raise HTTPException(status_code=404, detail="Travail non trouvé")
+    return job_service.to_response(job)
+
+
+@router.post("/ingestion-jobs/{job_id}/cancel")
+async def cancel_ingestion_job(
+    job_id: str,
+    current_user: User = Depends(get_current_admin_user),
+    job_service: IngestionJobService = Depends(get_ingestion_job_service)
+):
+    """
+    Annule un travail en attente ou en cours. Les chunks en attente et le fichier reçu
+    d'un travail annulé sont supprimés ; la version précédente du document reste en place.
+    """
+    object_id = parse_job_id(job_id)
+    job = await job_service.request_cancel(object_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Travail non trouvé")
+    get_ingestion_worker_pool().cancel_local(object_id)
+    return job_service.to_response(job)
+
+
+@router.post("/ingestion-jobs/{job_id}/retry", status_code=202)
+async def retry_ingestion_job(
+    job_id: str,
+    current_user: User = Depends(get_current_admin_user),
+    job_service: IngestionJobService = Depends(get_ingestion_job_service)
+):
+    """
+    Remet en file un travail échoué, tant que son fichier est conservé : le fichier
+    d'un travail terminé, annulé ou sans tentative restante est supprimé.
+    """
+    object_id = parse_job_id(job_id)
+    job = await job_service.retry(object_id)
+    if not job:
+        if not await job_service.get(object_id):
+            raise HTTPException(status_code=404, detail="Travail non trouvé")
+        raise HTTPException(status_code=409, detail="Seul un travail échoué avec des tentatives restantes peut être relancé")
+    get_ingestion_worker_pool().wake()
+    return job_service.to_response(job)
+
+@router.delete("/pdf/{file_name}")
+async def delete_pdf(
+    file_name: str,
+    current_user: User = Depends(get_current_admin_user),
+    vector_search_service: VectorSearchService = Depends(get_vector_search_service)
+):
+    """
+    Supprime les chunks d'un fichier PDF de MongoDB et de l'index FAISS.
+    """
     try:
-        vector_search_service.reload_index()
+        removed = vector_search_service.remove_document(file_name)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors du rechargement de l'index FAISS : {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la suppression du document : {e}")
+    if not removed:
+        raise HTTPException(status_code=404, detail="Document non trouvé")
+    return {"message": "Document supprimé avec succès", "file_name": file_name, "chunks": removed}
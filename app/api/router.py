@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from api.endpoints import chat, auth, upload_pdf  # Ajout de l'import
+from api.endpoints import chat, auth, upload_pdf, metrics  # Ajout de l'import
 from services.user_service import UserService, get_current_admin_user
 from models.user import UserResponse
 from typing import List
@@ -14,3 +14,6 @@ router.include_router(chat.router, prefix="/chat", tags=["chat"])
 
 # Inclusion de la route d'upload PDF
 router.include_router(upload_pdf.router, prefix="/admin", tags=["upload_pdf"])
+
+# Inclusion des métriques de performance
+router.include_router(metrics.router, prefix="/admin", tags=["metrics"])
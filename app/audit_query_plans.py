@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from core.config import settings
+from services.index_manager import ensure_indexes
+
+# Nombre de documents d'exemple insérés par collection (le planificateur choisit
+# un index dès qu'il en existe un adapté, même sur peu de documents)
+SAMPLE_SIZE = 200
+
+
+def query_shapes():
+    """
+    Formes des requêtes chaudes de l'application : (nom, collection, requête).
+    Une requête est soit un filtre `find` (avec tri optionnel), soit un pipeline d'agrégation.
+    """
+    now = datetime.utcnow()
+    return [
+        ("get_session", settings.collection_name,
+         {"filter": {"session_id": "session-7", "user_email": "user3@example.com"}}),
+        ("get_all_sessions", settings.collection_name,
+         {"filter": {"user_email": "user3@example.com"}, "sort": [("_id", -1)]}),
+        ("save_turn (conversation)", settings.collection_name,
+         {"filter": {"session_id": "session-7"}}),
+        ("get_recent_messages (buckets)", "message_buckets",
+         {"filter": {"session_id": "session-7"}, "sort": [("seq", -1)]}),
+        ("save_turn (recherche du dernier bucket)", "message_buckets",
+         {"pipeline": [{"$match": {"session_id": {"$in": ["session-7", "session-8"]}}},
+                       {"$sort": {"session_id": 1, "seq": -1}},
+                       {"$group": {"_id": "$session_id", "seq": {"$first": "$seq"}, "count": {"$first": "$count"}}}]}),
+        ("save_turn (dernier bucket)", "message_buckets",
+         {"filter": {"session_id": "session-7", "seq": 3, "count": {"$lte": settings.message_bucket_size - 2}}}),
+        ("get_user_by_email", "users",
+         {"filter": {"email": "user3@example.com"}}),
+        ("admin users", "users",
+         {"pipeline": [{"$match": {"role": {"$ne": "admin"}}}, {"$sort": {"_id": 1}}, {"$limit": 51},
+                       {"$project": {"email": 1, "first_name": 1, "last_name": 1, "role": 1, "is_blocked": 1}}]}),
+        ("get_user_stats", "users",
+         {"pipeline": [{"$match": {"created_at": {"$gte": now - timedelta(days=30), "$lte": now}}},
+                       {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                                   "count": {"$sum": 1}}}]}),
+        ("verify_admin_key", "admins",
+         {"filter": {"username": "admin"}}),
+        ("remove_document", settings.pdf_chunks_collection,
+         {"filter": {"file_name": "manual-3.pdf"}}),
+        ("index catch-up", settings.pdf_chunks_collection,
+         {"filter": {"_id": {"$gt": ObjectId.from_datetime(now - timedelta(days=1))}}}),
+    ]
+
+
+async def seed(db):
+    """
+    Insère des documents d'exemple dans la base d'audit.
+    """
+    now = datetime.utcnow()
+    await db["users"].insert_many([
+        {"email": f"user{i}@example.com", "first_name": "U", "last_name": str(i), "hashed_password": "x",
+         "role": "admin" if i == 0 else "user", "created_at": now - timedelta(days=i % 60)}
+        for i in range(SAMPLE_SIZE)
+    ])
+    await db[settings.collection_name].insert_many([
+        {"session_id": f"session-{i}", "user_email": f"user{i % 20}@example.com",
+         "messages": [], "created_at": now, "updated_at": now}
+        for i in range(SAMPLE_SIZE)
+    ])
+    await db["message_buckets"].insert_many([
+        {"session_id": f"session-{i % 50}", "seq": i // 50, "count": 10, "messages": [], "created_at": now}
+        for i in range(SAMPLE_SIZE)
+    ])
+    await db["admins"].insert_one({"username": "admin", "key_hash": "x", "role": "admin", "created_at": now})
+    await db[settings.pdf_chunks_collection].insert_many([
+        {"file_name": f"manual-{i % 10}.pdf", "page_number": i, "text": "texte", "vector": []}
+        for i in range(SAMPLE_SIZE)
+    ])
+
+
+def winning_plans(document):
+    """
+    Parcourt une sortie d'explain et retourne tous les plans gagnants (find et agrégations).
+    """
+    if isinstance(document, dict):
+        for key, value in document.items():
+            if key == "winningPlan":
+                yield value
+            else:
+                yield from winning_plans(value)
+    elif isinstance(document, list):
+        for item in document:
+            yield from winning_plans(item)
+
+
+def stages(plan):
+    """
+    Noms des étapes d'un plan d'exécution, récursivement.
+    """
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from stages(item)
+
+
+def find_key(document, key):
+    """
+    Valeurs associées à `key` dans une sortie d'explain, récursivement.
+    """
+    if isinstance(document, dict):
+        for k, value in document.items():
+            if k == key:
+                yield value
+            else:
+                yield from find_key(value, key)
+    elif isinstance(document, list):
+        for item in document:
+            yield from find_key(item, key)
+
+
+async def explain(db, collection_name: str, query: dict) -> dict:
+    collection = db[collection_name]
+    if "pipeline" in query:
+        return await db.command("explain", {"aggregate": collection_name, "pipeline": query["pipeline"], "cursor": {}},
+                                verbosity="executionStats")
+    cursor = collection.find(query["filter"])
+    if "sort" in query:
+        cursor = cursor.sort(query["sort"])
+    return await cursor.explain()
+
+
+async def audit(keep: bool = False) -> int:
+    """
+    Crée les index dans une base d'audit, y insère des données d'exemple puis vérifie
+    qu'aucune requête chaude n'est exécutée par un parcours complet (COLLSCAN).
+    Retourne le nombre de requêtes en échec.
+    """
+    client = AsyncIOMotorClient(settings.mongodb_uri)
+    db_name = f"{settings.database_name}_query_audit"
+    db = client[db_name]
+    await client.drop_database(db_name)
+    failures = 0
+    try:
+        await seed(db)
+        await ensure_indexes(db)
+        for name, collection_name, query in query_shapes():
+            result = await explain(db, collection_name, query)
+            plan_stages = sorted({stage for plan in winning_plans(result) for stage in stages(plan)})
+            millis = next(iter(find_key(result, "executionTimeMillis")), "?")
+            status = "OK"
+            if "COLLSCAN" in plan_stages:
+                status = "COLLSCAN"
+                failures += 1
+            print(f"{status:<9} {name:<32} {collection_name:<18} {millis!s:>5} ms  {', '.join(plan_stages)}")
+    finally:
+        if not keep:
+            await client.drop_database(db_name)
+        client.close()
+    print(f"{failures} requête(s) sans index.")
+    return failures
+
+
+# Exécuter l'audit : code de sortie non nul si une requête fait un COLLSCAN
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vérifie que les requêtes chaudes utilisent un index (mongod local).")
+    parser.add_argument("--keep", action="store_true", help="Conserver la base d'audit après exécution")
+    args = parser.parse_args()
+    sys.exit(1 if asyncio.run(audit(args.keep)) else 0)
@@ -0,0 +1,95 @@
+import argparse
+import time
+import faiss
+import numpy as np
+from pymongo import MongoClient
+from core.config import settings
+from services.vector_search_service import INDEX_TYPES, build_faiss_index, apply_search_params, min_training_size
+
+# Valeurs de nprobe / efSearch balayées pour chaque type d'index
+NPROBE_VALUES = [1, 4, 16, 64]
+EF_SEARCH_VALUES = [16, 32, 64, 128]
+
+
+def load_vectors(limit: int) -> np.ndarray:
+    """
+    Charge jusqu'à `limit` vecteurs depuis la collection des chunks PDF.
+    """
+    client = MongoClient(settings.mongodb_uri)
+    collection = client[settings.database_name][settings.pdf_chunks_collection]
+    cursor = collection.find({}, {"vector": 1, "_id": 0}, batch_size=settings.index_load_batch_size).limit(limit)
+    vectors = [chunk["vector"] for chunk in cursor if chunk.get("vector")]
+    client.close()
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, k: int):
+    """
+    Retourne (recall@k, latence p50 en ms, latence p99 en ms) en interrogeant une requête à la fois,
+    comme le fait le endpoint de chat.
+    """
+    latencies = []
+    found = 0
+    for row, query in enumerate(queries):
+        started = time.perf_counter()
+        _, labels = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found += len(set(labels[0]) & set(truth[row]))
+    latencies = np.asarray(latencies)
+    return found / (len(queries) * k), np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def run_benchmark(limit: int, n_queries: int, k: int, index_types):
+    """
+    Compare chaque type d'index à l'index exact (flat) : rappel, latence et taille mémoire.
+    """
+    vectors = load_vectors(limit + n_queries)
+    if len(vectors) <= n_queries:
+        print(f"Pas assez de vecteurs dans MongoDB ({len(vectors)}).")
+        return
+    queries, base = vectors[:n_queries], vectors[n_queries:]
+    ids = np.arange(len(base), dtype=np.int64)
+    dimension = base.shape[1]
+    print(f"Base : {len(base)} vecteurs de dimension {dimension}, {len(queries)} requêtes, k={k}")
+
+    # Vérité terrain : recherche exacte
+    exact = build_faiss_index("flat", dimension)
+    exact.add_with_ids(base, ids)
+    _, truth = exact.search(queries, k)
+
+    print(f"{'index':<10} {'paramètre':<14} {'recall@k':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'taille (Mo)':>12} {'build (s)':>10}")
+    for index_type in index_types:
+        if len(base) < min_training_size(index_type):
+            print(f"{index_type:<10} ignoré : {min_training_size(index_type)} vecteurs requis pour l'entraînement")
+            continue
+        started = time.perf_counter()
+        index = build_faiss_index(index_type, dimension, base[:settings.index_train_size])
+        index.add_with_ids(base, ids)
+        build_time = time.perf_counter() - started
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+
+        if index_type.startswith("ivf"):
+            sweep = [("nprobe", value) for value in NPROBE_VALUES]
+        elif index_type == "hnsw":
+            sweep = [("efSearch", value) for value in EF_SEARCH_VALUES]
+        else:
+            sweep = [("-", None)]
+        for name, value in sweep:
+            if name == "nprobe":
+                apply_search_params(index, nprobe=value)
+            elif name == "efSearch":
+                apply_search_params(index, ef_search=value)
+            recall, p50, p99 = measure(index, queries, truth, k)
+            label = f"{name}={value}" if value is not None else "exact"
+            print(f"{index_type:<10} {label:<14} {recall:>9.3f} {p50:>9.3f} {p99:>9.3f} {size_mb:>12.1f} {build_time:>10.1f}")
+
+
+# Exécuter le benchmark
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rappel et latence des index FAISS comparés à l'index exact.")
+    parser.add_argument("--limit", type=int, default=100000, help="Nombre maximal de vecteurs indexés")
+    parser.add_argument("--queries", type=int, default=500, help="Nombre de requêtes (retirées de la base)")
+    parser.add_argument("--k", type=int, default=5, help="Nombre de voisins recherchés")
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    args = parser.parse_args()
+    run_benchmark(args.limit, args.queries, args.k, args.types)
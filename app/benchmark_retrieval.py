@@ -0,0 +1,119 @@
+import argparse
+import random
+import re
+import time
+import numpy as np
+from pymongo import MongoClient
+from core.config import settings
+from services.encoders import load_encoder
+from services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from services.vector_search_service import build_faiss_index
+
+# Termes « techniques » : contiennent un chiffre ou un séparateur (codes d'erreur, options, versions)
+IDENTIFIER = re.compile(r"\S*(?:\d|\w[\-_./:]\w)\S*")
+
+
+def load_chunks(limit: int):
+    """
+    Charge jusqu'à `limit` chunks (texte et vecteur) depuis la collection des chunks PDF.
+    """
+    client = MongoClient(settings.mongodb_uri)
+    collection = client[settings.database_name][settings.pdf_chunks_collection]
+    cursor = collection.find({}, {"text": 1, "vector": 1, "_id": 0}, batch_size=settings.index_load_batch_size).limit(limit)
+    chunks = [chunk for chunk in cursor if chunk.get("vector") and chunk.get("text")]
+    client.close()
+    return chunks
+
+
+def make_queries(texts, n_queries: int, seed: int):
+    """
+    Requêtes tirées des chunks eux-mêmes, le chunk d'origine étant la réponse attendue :
+    - « phrase » : une suite de 8 mots du chunk ;
+    - « identifiants » : jusqu'à 3 termes techniques du chunk (s'il en contient).
+    """
+    rng = random.Random(seed)
+    queries = {"phrase": [], "identifiants": []}
+    for label in rng.sample(range(len(texts)), min(n_queries, len(texts))):
+        words = texts[label].split()
+        start = rng.randrange(max(1, len(words) - 8))
+        queries["phrase"].append((" ".join(words[start:start + 8]), label))
+        identifiers = sorted(set(IDENTIFIER.findall(texts[label])))
+        if identifiers:
+            queries["identifiants"].append((" ".join(rng.sample(identifiers, min(3, len(identifiers)))), label))
+    return queries
+
+
+def measure(search, queries, vectors, k: int):
+    """
+    Retourne (hit rate@k, latence p50 en ms, latence p99 en ms), une requête à la fois.
+    """
+    latencies = []
+    found = 0
+    for (text, label), vector in zip(queries, vectors):
+        started = time.perf_counter()
+        labels = search(text, vector, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found += label in labels
+    latencies = np.asarray(latencies)
+    return found / len(queries), np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def run_benchmark(limit: int, n_queries: int, k: int, candidates: int, seed: int):
+    """
+    Compare la recherche dense seule, BM25 seul et leur fusion (RRF) : taux de réponses
+    attendues dans les k premiers résultats et latence de la recherche (hors embedding).
+    """
+    chunks = load_chunks(limit)
+    if len(chunks) < k:
+        print(f"Pas assez de chunks dans MongoDB ({len(chunks)}).")
+        return
+    texts = [chunk["text"] for chunk in chunks]
+    base = np.asarray([chunk["vector"] for chunk in chunks], dtype=np.float32)
+    labels = np.arange(len(base), dtype=np.int64)
+
+    started = time.perf_counter()
+    dense_index = build_faiss_index("flat", base.shape[1])
+    dense_index.add_with_ids(base, labels)
+    dense_build = time.perf_counter() - started
+    started = time.perf_counter()
+    lexical_index = LexicalIndex()
+    lexical_index.add(labels.tolist(), texts)
+    lexical_build = time.perf_counter() - started
+    stats = lexical_index.stats()
+    print(f"Base : {len(base)} chunks ; FAISS construit en {dense_build:.1f}s, BM25 en {lexical_build:.1f}s "
+          f"({stats['terms']} termes, {stats['postings_bytes'] / 1e6:.1f} Mo de postings)")
+
+    def dense(text, vector, k):
+        _, found = dense_index.search(vector.reshape(1, -1), k)
+        return [int(label) for label in found[0] if label != -1]
+
+    def lexical(text, vector, k):
+        return [label for label, _ in lexical_index.search(text, k)]
+
+    def hybrid(text, vector, k):
+        return reciprocal_rank_fusion(
+            [dense(text, vector, max(k, candidates)), lexical(text, vector, max(k, candidates))], k, settings.rrf_k
+        )
+
+    model = load_encoder()
+    print(f"{'requêtes':<13} {'nombre':>7} {'recherche':<10} {'hit@k':>7} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for kind, queries in make_queries(texts, n_queries, seed).items():
+        if not queries:
+            print(f"{kind:<13} aucune requête")
+            continue
+        vectors = np.asarray(model.encode([text for text, _ in queries]), dtype=np.float32)
+        for name, search in (("dense", dense), ("bm25", lexical), ("hybride", hybrid)):
+            hit_rate, p50, p99 = measure(search, queries, vectors, k)
+            print(f"{kind:<13} {len(queries):>7} {name:<10} {hit_rate:>7.3f} {p50:>9.3f} {p99:>9.3f}")
+
+
+# Exécuter le benchmark
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Taux de réussite et latence de la recherche dense, BM25 et hybride.")
+    parser.add_argument("--limit", type=int, default=100000, help="Nombre maximal de chunks indexés")
+    parser.add_argument("--queries", type=int, default=500, help="Nombre de chunks dont sont tirées les requêtes")
+    parser.add_argument("--k", type=int, default=5, help="Nombre de résultats retournés")
+    parser.add_argument("--candidates", type=int, default=settings.hybrid_candidates, help="Candidats de chaque recherche avant fusion")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run_benchmark(args.limit, args.queries, args.k, args.candidates, args.seed)
@@ -1,5 +1,7 @@
 import os
 import bcrypt
+import threading
+from typing import Optional
 
 class Settings:
     mongodb_uri: str = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
@@ -7,10 +9,98 @@ class Settings:
     collection_name: str = os.getenv("COLLECTION_NAME", "conversations")
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "default_value_if_not_set")
     secret_key: str = os.getenv("SECRET_KEY", "default_secret_key")  # Ajout correct de la clé secrète
-    admin_key_hash: str = bcrypt.hashpw(
-        os.getenv("ADMIN_KEY", "default_admin_key").encode(), 
-        bcrypt.gensalt()
-    ).decode()  # Utilisation correcte pour générer un hash de la clé admin
+    mongo_max_pool_size: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))  # Connexions maximales par serveur
+    mongo_min_pool_size: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))  # Connexions maintenues ouvertes
+    mongo_max_idle_time_ms: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))  # Fermeture des connexions inactives
+    mongo_wait_queue_timeout_ms: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))  # Attente maximale d'une connexion
+    embedding_model_name: str = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")  # Modèle d'embedding partagé
+    encoder_backend: str = os.getenv("ENCODER_BACKEND", "torch")  # torch, onnx ou onnx-int8
+    encoder_onnx_dir: str = os.getenv("ENCODER_ONNX_DIR", "models/onnx")  # Modèles exportés par verify_encoder.py --export
+    encoder_threads: int = int(os.getenv("ENCODER_THREADS", "0"))  # Threads ONNX Runtime par encodeur (0 : automatique)
+    pdf_chunks_collection: str = os.getenv("PDF_CHUNKS_COLLECTION", "pdf_chunks")  # Collection des chunks PDF
+    pdf_chunks_staging_collection: str = os.getenv("PDF_CHUNKS_STAGING_COLLECTION", "pdf_chunks_staging")  # Chunks d'une ingestion en cours
+    pdf_chunk_deletions_collection: str = os.getenv("PDF_CHUNK_DELETIONS_COLLECTION", "pdf_chunk_deletions")  # Journal des chunks supprimés
+    chunk_deletions_retention_days: int = int(os.getenv("CHUNK_DELETIONS_RETENTION_DAYS", "7"))  # Conservation du journal des suppressions
+    index_load_batch_size: int = int(os.getenv("INDEX_LOAD_BATCH_SIZE", "8192"))  # Taille des lots lors de la construction de l'index
+    index_snapshot_dir: str = os.getenv("INDEX_SNAPSHOT_DIR", "index_snapshot")  # Répertoire du snapshot FAISS ("" pour désactiver)
+    index_snapshot_mmap: bool = os.getenv("INDEX_SNAPSHOT_MMAP", "true").lower() == "true"  # Mapper le snapshot en mémoire
+    vector_index_type: str = os.getenv("VECTOR_INDEX_TYPE", "flat")  # flat, ivf_flat, ivf_pq ou hnsw
+    ivf_nlist: int = int(os.getenv("IVF_NLIST", "1024"))  # Nombre de listes inversées (IVF)
+    ivf_nprobe: int = int(os.getenv("IVF_NPROBE", "16"))  # Listes visitées par requête (IVF)
+    pq_m: int = int(os.getenv("PQ_M", "48"))  # Sous-quantificateurs PQ (doit diviser la dimension)
+    pq_nbits: int = int(os.getenv("PQ_NBITS", "8"))  # Bits par code PQ
+    hnsw_m: int = int(os.getenv("HNSW_M", "32"))  # Voisins par nœud (HNSW)
+    hnsw_ef_construction: int = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+    hnsw_ef_search: int = int(os.getenv("HNSW_EF_SEARCH", "64"))
+    retrieval_workers: int = int(os.getenv("RETRIEVAL_WORKERS", "4"))  # Threads dédiés à l'embedding et à la recherche FAISS
+    embedding_batch_max_size: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))  # Requêtes encodées par lot
+    embedding_batch_max_wait_ms: float = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))  # Attente maximale avant encodage
+    embedding_cache_size: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))  # Embeddings de requêtes en cache
+    embedding_cache_ttl: float = float(os.getenv("EMBEDDING_CACHE_TTL", "3600"))  # Secondes
+    hybrid_search: bool = os.getenv("HYBRID_SEARCH", "true").lower() == "true"  # Fusionner recherche dense et BM25
+    hybrid_candidates: int = int(os.getenv("HYBRID_CANDIDATES", "20"))  # Candidats de chaque recherche avant fusion
+    rrf_k: int = int(os.getenv("RRF_K", "60"))  # Constante de la reciprocal rank fusion
+    context_candidates: int = int(os.getenv("CONTEXT_CANDIDATES", "10"))  # Chunks retrouvés avant sélection du contexte
+    context_max_chunks: int = int(os.getenv("CONTEXT_MAX_CHUNKS", "5"))  # Chunks maximum dans le contexte
+    context_token_budget: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))  # Tokens de contexte envoyés au LLM
+    context_min_similarity: float = float(os.getenv("CONTEXT_MIN_SIMILARITY", "0.2"))  # Similarité cosinus minimale avec la question
+    context_mmr_lambda: float = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))  # Pertinence (1) contre diversité (0)
+    context_duplicate_similarity: float = float(os.getenv("CONTEXT_DUPLICATE_SIMILARITY", "0.95"))  # Quasi-doublons écartés
+    result_cache_size: int = int(os.getenv("RESULT_CACHE_SIZE", "2048"))  # Résultats de recherche en cache
+    result_cache_ttl: float = float(os.getenv("RESULT_CACHE_TTL", "600"))  # Secondes
+    message_storage: str = os.getenv("MESSAGE_STORAGE", "embedded")  # embedded (tableau messages) ou buckets
+    message_bucket_size: int = int(os.getenv("MESSAGE_BUCKET_SIZE", "100"))  # Messages par bucket
+    turn_write_coalescing: bool = os.getenv("TURN_WRITE_COALESCING", "false").lower() == "true"  # Regrouper les écritures de tours
+    turn_write_max_batch: int = int(os.getenv("TURN_WRITE_MAX_BATCH", "100"))  # Tours par bulk_write
+    turn_write_max_wait_ms: float = float(os.getenv("TURN_WRITE_MAX_WAIT_MS", "5"))  # Attente maximale avant écriture
+    history_max_messages: int = int(os.getenv("HISTORY_MAX_MESSAGES", "50"))  # Messages lus par tour de chat
+    history_token_budget: int = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))  # Tokens d'historique envoyés au LLM
+    history_summary_enabled: bool = os.getenv("HISTORY_SUMMARY_ENABLED", "false").lower() == "true"  # Résumer les tours exclus
+    history_summary_max_tokens: int = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "300"))  # Taille maximale du résumé
+    auth_cache_size: int = int(os.getenv("AUTH_CACHE_SIZE", "10000"))  # Utilisateurs authentifiés en cache
+    auth_cache_ttl: float = float(os.getenv("AUTH_CACHE_TTL", "30"))  # Secondes avant relecture de l'utilisateur
+    auth_invalidation_poll_interval: float = float(os.getenv("AUTH_INVALIDATION_POLL_INTERVAL", "2"))  # Secondes entre deux relectures des invalidations (0 : désactivé)
+    ingestion_batch_size: int = int(os.getenv("INGESTION_BATCH_SIZE", "64"))  # Pages lues et chunks encodés par lot
+    chunk_target_tokens: int = int(os.getenv("CHUNK_TARGET_TOKENS", "300"))  # Taille visée d'un chunk
+    chunk_overlap_tokens: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))  # Recouvrement entre chunks consécutifs
+    ingestion_embed_workers: int = int(os.getenv("INGESTION_EMBED_WORKERS", "1"))  # Processus d'encodage des documents
+    ingestion_queue_size: int = int(os.getenv("INGESTION_QUEUE_SIZE", "4"))  # Lots en attente entre deux étapes
+    ingestion_spool_chunk_size: int = int(os.getenv("INGESTION_SPOOL_CHUNK_SIZE", str(1024 * 1024)))  # Octets lus par écriture sur disque
+    ingestion_job_workers: int = int(os.getenv("INGESTION_JOB_WORKERS", "1"))  # Workers d'ingestion du processus de l'API (0 : script dédié)
+    ingestion_job_poll_interval: float = float(os.getenv("INGESTION_JOB_POLL_INTERVAL", "1"))  # Secondes entre deux sondages / battements
+    ingestion_job_stale_after: float = float(os.getenv("INGESTION_JOB_STALE_AFTER", "60"))  # Battement expiré : travail repris
+    ingestion_job_max_attempts: int = int(os.getenv("INGESTION_JOB_MAX_ATTEMPTS", "3"))  # Reprises maximales d'un travail abandonné
+    ingestion_upload_retention_hours: float = float(os.getenv("INGESTION_UPLOAD_RETENTION_HOURS", "24"))  # Conservation du fichier d'un travail échoué relançable
+    ingestion_upload_sweep_interval: float = float(os.getenv("INGESTION_UPLOAD_SWEEP_INTERVAL", "600"))  # Secondes entre deux nettoyages des fichiers reçus (0 : désactivé)
+    index_refresh_interval: float = float(os.getenv("INDEX_REFRESH_INTERVAL", "30"))  # Rattrapage de l'index FAISS (0 : désactivé)
+    answer_cache_enabled: bool = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"  # Réutiliser les réponses des questions proches
+    answer_cache_size: int = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))  # Réponses en cache
+    answer_cache_ttl: float = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # Secondes
+    answer_cache_threshold: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # Similarité cosinus minimale
+    stats_backfill_on_startup: bool = os.getenv("STATS_BACKFILL_ON_STARTUP", "true").lower() == "true"  # Recalculer les statistiques au démarrage si elles sont vides
+    stats_compaction_interval: float = float(os.getenv("STATS_COMPACTION_INTERVAL", "0"))  # Heures entre deux recalculs des statistiques (0 : désactivé)
+    default_page_size: int = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))  # Éléments par page (sessions, historique, utilisateurs)
+    max_page_size: int = int(os.getenv("MAX_PAGE_SIZE", "200"))  # Taille de page maximale acceptée
+    index_train_size: int = int(os.getenv("INDEX_TRAIN_SIZE", "100000"))  # Vecteurs échantillonnés pour l'entraînement
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))  # Threads dédiés à bcrypt
+    password_hash_max_pending: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))  # Opérations bcrypt admises avant refus (503)
+    _admin_key_hash: Optional[str] = os.getenv("ADMIN_KEY_HASH") or None  # Hash bcrypt précalculé de la clé admin
+    _admin_key_lock = threading.Lock()
+
+    @property
+    def admin_key_hash(self) -> str:
+        """
+        Hash bcrypt de la clé admin : ADMIN_KEY_HASH s'il est fourni, sinon calculé
+        une seule fois à partir de ADMIN_KEY au premier usage (et non à l'import).
+        """
+        if self._admin_key_hash is None:
+            with self._admin_key_lock:
+                if self._admin_key_hash is None:
+                    self._admin_key_hash = bcrypt.hashpw(
+                        os.getenv("ADMIN_KEY", "default_admin_key").encode(),
+                        bcrypt.gensalt()
+                    ).decode()
+        return self._admin_key_hash
 
 # Crée une instance de la classe Settings après sa définition
 settings = Settings()
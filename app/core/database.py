@@ -0,0 +1,170 @@
+# app/core/database.py
+"""
+Clients MongoDB partagés par toute l'application.
+
+Un seul client Motor (asynchrone) et un seul client PyMongo (synchrone, pour la
+recherche vectorielle) existent par processus, avec des pools de connexions
+configurables. Ils sont créés par `connect()` au démarrage (lifespan FastAPI, début
+des scripts) et fermés par `close()` à l'arrêt ; les services qui les utilisent sont
+construits à la première requête, jamais à l'import des modules.
+"""
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import MongoClient, monitoring
+from collections import defaultdict
+from typing import Dict, Optional
+from core.config import settings
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Compteurs des pools de connexions, par client et par serveur.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._servers: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def _inc(self, event, counter: str, value: float = 1):
+        with self._lock:
+            self._servers[f"{event.address[0]}:{event.address[1]}"][counter] += value
+
+    def pool_created(self, event):
+        self._inc(event, "pools_created")
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._inc(event, "pools_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._inc(event, "connections_created")
+        self._inc(event, "open")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._inc(event, "connections_closed")
+        self._inc(event, "open", -1)
+
+    def connection_check_out_started(self, event):
+        self._inc(event, "waiting")
+
+    def connection_check_out_failed(self, event):
+        self._inc(event, "waiting", -1)
+        self._inc(event, "checkout_failures")
+
+    def connection_checked_out(self, event):
+        self._inc(event, "waiting", -1)
+        self._inc(event, "in_use")
+        self._inc(event, "checkouts")
+        # La durée d'attente n'est fournie que par les versions récentes de PyMongo
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            self._inc(event, "checkout_wait_ms", duration * 1000)
+
+    def connection_checked_in(self, event):
+        self._inc(event, "in_use", -1)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            servers = {}
+            for address, counters in self._servers.items():
+                server = dict(counters)
+                checkouts = server.get("checkouts", 0)
+                server["avg_checkout_wait_ms"] = server.get("checkout_wait_ms", 0) / checkouts if checkouts else 0.0
+                servers[address] = server
+        return {
+            "max_pool_size": settings.mongo_max_pool_size,
+            "min_pool_size": settings.mongo_min_pool_size,
+            "servers": servers,
+        }
+
+
+async_pool_metrics = PoolMetricsListener("motor")
+sync_pool_metrics = PoolMetricsListener("pymongo")
+
+_lock = threading.Lock()
+_client: Optional[AsyncIOMotorClient] = None
+_sync_client: Optional[MongoClient] = None
+
+
+def _pool_options() -> Dict:
+    return {
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": settings.mongo_min_pool_size,
+        "maxIdleTimeMS": settings.mongo_max_idle_time_ms,
+        "waitQueueTimeoutMS": settings.mongo_wait_queue_timeout_ms,
+    }
+
+
+def get_client() -> AsyncIOMotorClient:
+    """
+    Client Motor de l'application, ouvert par `connect()`.
+    """
+    if _client is None:
+        raise RuntimeError("Client MongoDB non ouvert : appeler database.connect() au démarrage.")
+    return _client
+
+
+def get_database() -> AsyncIOMotorDatabase:
+    """
+    Base de données de l'application (utilisable comme dépendance FastAPI).
+    """
+    return get_client()[settings.database_name]
+
+
+def get_sync_client() -> MongoClient:
+    """
+    Client PyMongo synchrone, utilisé par le code exécuté hors de la boucle d'événements.
+    """
+    if _sync_client is None:
+        raise RuntimeError("Client MongoDB non ouvert : appeler database.connect() au démarrage.")
+    return _sync_client
+
+
+async def connect():
+    """
+    Crée les clients partagés et vérifie la connexion (appelé au démarrage de l'application).
+    """
+    global _client, _sync_client
+    with _lock:
+        if _client is None:
+            _client = AsyncIOMotorClient(
+                settings.mongodb_uri, event_listeners=[async_pool_metrics], **_pool_options()
+            )
+        if _sync_client is None:
+            _sync_client = MongoClient(
+                settings.mongodb_uri, event_listeners=[sync_pool_metrics], **_pool_options()
+            )
+    await _client.admin.command("ping")
+    logger.info(f"Connexion MongoDB ouverte (pool : {settings.mongo_min_pool_size}-{settings.mongo_max_pool_size}).")
+
+
+def close():
+    """
+    Ferme les clients partagés (appelé à l'arrêt de l'application).
+    """
+    global _client, _sync_client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+
+def pool_stats() -> Dict:
+    return {
+        "motor": async_pool_metrics.stats(),
+        "pymongo": sync_pool_metrics.stats(),
+    }
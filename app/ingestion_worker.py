@@ -0,0 +1,29 @@
+import asyncio
+from core import database
+from core.config import settings
+from services.index_manager import ensure_indexes
+from services.embedding_worker import shutdown_embedding_pool
+from services.ingestion_jobs import IngestionWorkerPool, get_ingestion_job_service
+
+
+async def run_worker():
+    """
+    Script pour exécuter les travaux d'ingestion de PDF dans un processus dédié,
+    séparé de l'API (lancer l'API avec INGESTION_JOB_WORKERS=0). Les processus de
+    l'API récupèrent les chunks indexés ici grâce à leur rattrapage périodique
+    (INDEX_REFRESH_INTERVAL).
+    """
+    await database.connect()
+    await ensure_indexes(database.get_database())
+    workers = IngestionWorkerPool(get_ingestion_job_service(), max(1, settings.ingestion_job_workers))
+    workers.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await workers.stop()
+        shutdown_embedding_pool()
+        database.close()
+
+# Exécuter le worker
+if __name__ == "__main__":
+    asyncio.run(run_worker())
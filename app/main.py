@@ -1,42 +1,16 @@
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api.router import router as api_router
-from services.EnhancedLLMService import EnhancedLLMService
 import uvicorn
 from contextlib import asynccontextmanager
 from core.config import settings  # Importez les paramètres depuis config.py
+from core import database
+from services.index_manager import ensure_indexes, check_required_indexes
+from services.embedding_worker import shutdown_embedding_pool
+import asyncio
 
 load_dotenv()
 
-app = FastAPI(
-    title="Agent conversationnel",
-    description="API ",
-    version="1.0",
-)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],  # Spécifie explicitement l'origine du frontend
-    allow_credentials=True,
-    allow_methods=["*"],  # Autorise toutes les méthodes HTTP
-    allow_headers=["*"],  # Autorise tous les en-têtes
-)
-
-# Instance du service LLM
-llm_service = EnhancedLLMService(
-    mongo_uri=settings.mongodb_uri,          # Utilise l'URI MongoDB défini dans config.py
-    db_name=settings.database_name,          # Utilise le nom de la base de données
-    collection_name="pdf_chunks",            # Nom de la collection contenant les chunks
-    embedding_model_name="all-MiniLM-L6-v2"  # Nom du modèle d'embedding utilisé
-)
-
-# Inclure les routes
-app.include_router(api_router)
-
-for route in app.routes:
-    print(f"Route disponible : {route.path}")
-
 
 # Gestionnaire de lifespan avec personnalisation d'OpenAPI
 @asynccontextmanager
@@ -51,9 +25,77 @@ async def lifespan(app: FastAPI):
     }
     openapi_schema["security"] = [{"BearerAuth": []}]
     app.openapi_schema = openapi_schema
+
+    # Ouvrir le client MongoDB partagé et créer une seule fois les index nécessaires
+    await database.connect()
+    await ensure_indexes(database.get_database())
+    await check_required_indexes(database.get_database())
+
+    from services.ingestion_jobs import get_ingestion_worker_pool
+    from services.registry import get_vector_search_service
+    from services.stats_service import StatsService, maintain_stats
+
+    # Statistiques d'administration : rattrapage des données antérieures aux compteurs, compaction
+    stats_task = asyncio.create_task(maintain_stats(
+        StatsService(database.get_database()), settings.stats_backfill_on_startup, settings.stats_compaction_interval
+    ))
+
+    # Workers d'ingestion et rattrapage périodique des chunks indexés par d'autres processus
+    workers = get_ingestion_worker_pool()
+    if settings.ingestion_job_workers > 0:
+        # Les chunks enregistrés par les workers du processus sont indexés dès la fin du travail
+        vector_search_service = get_vector_search_service()
+        workers.on_completed = lambda: asyncio.to_thread(vector_search_service.refresh)
+        workers.start()
+    refresh_task = None
+    if settings.index_refresh_interval > 0:
+        refresh_task = asyncio.create_task(
+            get_vector_search_service().refresh_periodically(settings.index_refresh_interval)
+        )
+
     yield  # Lifespan continue normalement
 
-app.router.lifespan_context = lifespan
+    if refresh_task is not None:
+        refresh_task.cancel()
+    stats_task.cancel()
+    await workers.stop()
+    shutdown_embedding_pool()
+    database.close()
+
+
+def create_app() -> FastAPI:
+    """
+    Construit l'application : routes (et services qu'elles instancient), CORS et lifespan.
+    """
+    from api.router import router as api_router
+
+    app = FastAPI(
+        title="Agent conversationnel",
+        description="API ",
+        version="1.0",
+        lifespan=lifespan,
+    )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000"],  # Spécifie explicitement l'origine du frontend
+        allow_credentials=True,
+        allow_methods=["*"],  # Autorise toutes les méthodes HTTP
+        allow_headers=["*"],  # Autorise tous les en-têtes
+    )
+
+    # Inclure les routes
+    app.include_router(api_router)
+
+    for route in app.routes:
+        print(f"Route disponible : {route.path}")
+    return app
+
+
+# Les processus d'encodage (méthode « spawn ») réimportent ce module sous le nom
+# __mp_main__ lorsque l'API est lancée par `python main.py` : ils ne construisent pas l'application
+if __name__ != "__mp_main__":
+    app = create_app()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
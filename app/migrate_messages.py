@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+from datetime import datetime
+from core import database
+from services.mongo_service import MongoService
+
+
+async def number_buckets(mongo_service: MongoService, dry_run: bool = False) -> int:
+    """
+    Attribue un numéro de séquence (`seq`) aux buckets qui n'en ont pas, session par session,
+    dans l'ordre de leur _id et à la suite des buckets déjà numérotés.
+    """
+    numbered = 0
+    session_ids = await mongo_service.message_buckets.distinct("session_id", {"seq": {"$exists": False}})
+    for session_id in session_ids:
+        latest = await mongo_service.message_buckets.find_one(
+            {"session_id": session_id, "seq": {"$exists": True}}, {"seq": 1}, sort=[("seq", -1)]
+        )
+        seq = latest["seq"] + 1 if latest else 0
+        cursor = mongo_service.message_buckets.find(
+            {"session_id": session_id, "seq": {"$exists": False}}, {"_id": 1}
+        ).sort("_id", 1)
+        async for bucket in cursor:
+            if not dry_run:
+                await mongo_service.message_buckets.update_one({"_id": bucket["_id"]}, {"$set": {"seq": seq}})
+            seq += 1
+            numbered += 1
+    return numbered
+
+
+async def _migrate_messages(dry_run: bool):
+    mongo_service = MongoService()
+    bucket_size = mongo_service.bucket_size
+    migrated = 0
+    moved_messages = 0
+
+    numbered = await number_buckets(mongo_service, dry_run)
+    print(f"{numbered} buckets numérotés.")
+
+    cursor = mongo_service.conversations.find(
+        {"messages.0": {"$exists": True}}, {"session_id": 1, "messages": 1}
+    )
+    async for conversation in cursor:
+        session_id = conversation["session_id"]
+        messages = conversation["messages"]
+        now = datetime.utcnow()
+        buckets = [
+            {
+                "session_id": session_id,
+                "seq": start // bucket_size,
+                "count": len(messages[start:start + bucket_size]),
+                "messages": messages[start:start + bucket_size],
+                "created_at": now,
+                "updated_at": now,
+                "migrated": True
+            }
+            for start in range(0, len(messages), bucket_size)
+        ]
+        if dry_run:
+            print(f"{session_id} : {len(messages)} messages -> {len(buckets)} buckets")
+            continue
+
+        # Les buckets sont numérotés dans l'ordre chronologique : leur `seq` fixe l'ordre de lecture
+        await mongo_service.message_buckets.delete_many({"session_id": session_id, "migrated": True})
+        await mongo_service.message_buckets.insert_many(buckets, ordered=True)
+
+        # Le tableau n'est retiré que s'il n'a pas reçu de message entre-temps
+        result = await mongo_service.conversations.update_one(
+            {"_id": conversation["_id"], "messages": {"$size": len(messages)}},
+            {"$unset": {"messages": ""}, "$set": {"message_count": len(messages)}}
+        )
+        if result.modified_count == 0:
+            print(f"{session_id} : conversation modifiée pendant la migration, relancez le script.")
+            continue
+        migrated += 1
+        moved_messages += len(messages)
+
+    print(f"{migrated} conversations migrées, {moved_messages} messages déplacés.")
+
+
+async def migrate_messages(dry_run: bool = False):
+    """
+    Script pour déplacer les tableaux `messages` des conversations existantes
+    vers des buckets de taille fixe (collection `message_buckets`).
+    À lancer avant de passer MESSAGE_STORAGE à "buckets". Le script peut être relancé :
+    les buckets d'une conversation déjà migrée par une exécution interrompue sont recréés.
+    Les buckets créés sans numéro de séquence (`seq`) sont d'abord numérotés dans leur ordre d'insertion.
+    """
+    await database.connect()
+    try:
+        await _migrate_messages(dry_run)
+    finally:
+        database.close()
+
+
+# Exécuter le script
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migration des messages vers le stockage par buckets.")
+    parser.add_argument("--dry-run", action="store_true", help="Afficher la migration sans rien écrire")
+    args = parser.parse_args()
+    asyncio.run(migrate_messages(args.dry_run))
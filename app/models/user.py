@@ -1,7 +1,7 @@
 # app/models/user.py
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class User(BaseModel):
     id: Optional[str] = None
@@ -34,3 +34,10 @@ class UserResponse(BaseModel):
     last_name: str
     role: str  # Retourner le rôle dans la réponse
     is_blocked: bool = False
+
+class UserPage(BaseModel):
+    """
+    Page de la liste des utilisateurs (pagination par curseur).
+    """
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,26 @@
+import asyncio
+from core import database
+from services.stats_service import StatsService
+
+
+async def rebuild_stats():
+    """
+    Script pour recalculer les statistiques d'administration pré-agrégées
+    (collections `stats_daily` et `stats_users`) à partir des données existantes.
+    L'API le fait d'elle-même au démarrage si les compteurs sont vides
+    (STATS_BACKFILL_ON_STARTUP) et périodiquement si STATS_COMPACTION_INTERVAL est défini ;
+    ce script force un recalcul, par exemple pour corriger une dérive.
+    """
+    await database.connect()
+    try:
+        result = await StatsService().rebuild_if_needed(force=True)
+        if result is None:
+            print("Un recalcul des statistiques est déjà en cours.")
+        else:
+            print(f"Statistiques recalculées : {result['days']} jours, {result['users']} utilisateurs.")
+    finally:
+        database.close()
+
+# Exécuter le script
+if __name__ == "__main__":
+    asyncio.run(rebuild_stats())
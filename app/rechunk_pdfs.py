@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import os
+from core import database
+from core.config import settings
+from services.index_manager import ensure_indexes
+from services.embedding_worker import shutdown_embedding_pool
+from services.ingestion_jobs import COMPLETED
+from services.pdf_ingestion import ingest_pdf, ingest_pages
+
+
+async def rechunk_pdfs(all_documents: bool = False, dry_run: bool = False):
+    """
+    Script pour redécouper les documents déjà indexés avec le découpage actuel
+    (CHUNK_TARGET_TOKENS, CHUNK_OVERLAP_TOKENS). Par défaut, seuls les documents
+    indexés à raison d'un chunk par page sont traités ; avec --all, tous les documents
+    dont le PDF est encore dans le répertoire d'upload. Le PDF d'origine est relu s'il
+    est disponible, sinon le texte des pages stocké dans les anciens chunks est utilisé.
+    Les processus de l'API récupèrent les nouveaux chunks lors de leur rattrapage
+    périodique (INDEX_REFRESH_INTERVAL).
+    """
+    await database.connect()
+    db = database.get_database()
+    await ensure_indexes(db)
+    chunks = db[settings.pdf_chunks_collection]
+    legacy = {"chunk_index": {"$exists": False}}
+    try:
+        file_names = await chunks.distinct("file_name", {} if all_documents else legacy)
+        for file_name in sorted(name for name in file_names if name):
+            job = await db["ingestion_jobs"].find_one(
+                {"file_name": file_name, "status": COMPLETED}, sort=[("finished_at", -1)]
+            )
+            if job and os.path.exists(job["path"]):
+                print(f"{file_name} : redécoupage depuis {job['path']}")
+                if not dry_run:
+                    stored = await ingest_pdf(job["path"], file_name)
+                    print(f"{file_name} : {stored} chunks indexés")
+                continue
+
+            pages = await chunks.find(
+                {"file_name": file_name, **legacy}, {"page_number": 1, "text": 1}
+            ).sort("page_number", 1).to_list(length=None)
+            if not pages:
+                print(f"{file_name} : PDF introuvable et aucune page stockée, ignoré")
+                continue
+            print(f"{file_name} : redécoupage depuis {len(pages)} pages stockées")
+            if not dry_run:
+                stored = await ingest_pages(pages, file_name)
+                print(f"{file_name} : {stored} chunks indexés")
+    finally:
+        shutdown_embedding_pool()
+        database.close()
+
+# Exécuter le script
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Redécoupage des documents indexés.")
+    parser.add_argument("--all", action="store_true", help="Redécouper aussi les documents déjà découpés")
+    parser.add_argument("--dry-run", action="store_true", help="Afficher les documents à traiter sans les modifier")
+    args = parser.parse_args()
+    asyncio.run(rechunk_pdfs(all_documents=args.all, dry_run=args.dry_run))
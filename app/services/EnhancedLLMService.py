@@ -1,10 +1,16 @@
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, BaseMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from services.mongo_service import MongoService
-from services.vector_search_service import VectorSearchService  # Importer le service de recherche vectorielle
+from services.vector_search_service import VectorSearchService, Retrieval  # Importer le service de recherche vectorielle
+from services.registry import get_vector_search_service
+from services.tokens import split_history
+from services.answer_cache import get_answer_cache
+from services.context_builder import get_context_builder
+from core.config import settings
+import asyncio
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional, AsyncIterator, Tuple
 from datetime import datetime
 import logging
 
@@ -16,9 +22,9 @@ class EnhancedLLMService:
     """
     Service LLM avancé avec intégration de la recherche vectorielle et persistance MongoDB.
     """
-    def __init__(self, mongo_uri: str, db_name: str, collection_name: str, embedding_model_name: str):
-        # Initialiser le service de recherche vectorielle
-        self.vector_search_service = VectorSearchService(mongo_uri, db_name, collection_name, embedding_model_name)
+    def __init__(self, vector_search_service: Optional[VectorSearchService] = None):
+        # Utiliser le service de recherche vectorielle partagé du processus
+        self.vector_search_service = vector_search_service or get_vector_search_service()
 
         # Initialiser l'API OpenAI
         api_key = os.getenv("OPENAI_API_KEY")
@@ -41,41 +47,142 @@ class EnhancedLLMService:
         # Initialiser MongoDB
         self.mongo_service = MongoService()
 
+        # Résumés d'historique en cours de calcul, par session
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
+
+        # Cache sémantique des réponses (None si ANSWER_CACHE_ENABLED est désactivé)
+        self.answer_cache = get_answer_cache()
+
+    async def _retrieve(self, user_query: str) -> Optional[Retrieval]:
+        """
+        Recherche des chunks similaires ; une erreur de recherche donne une réponse sans contexte.
+        """
+        try:
+            return await self.vector_search_service.aretrieve(user_query, settings.context_candidates)
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche de chunks similaires : {e}")
+            return None
+
+    async def _prepare_messages(self, user_query: str, session_id: str,
+                                user_email: str) -> Tuple[List[BaseMessage], Optional[Retrieval]]:
+        """
+        Construit les messages LangChain : historique de la session et requête enrichie du contexte.
+        Retourne aussi la recherche effectuée si la réponse peut être servie par le cache
+        sémantique ou y être ajoutée, sinon None.
+        """
+        # Récupérer les chunks similaires et n'en garder que les plus utiles, dans le budget de tokens
+        retrieval = await self._retrieve(user_query)
+        context = get_context_builder().build(retrieval).text
+        logger.info(f"Contexte utilisé : {context}")
+
+        # Récupérer l'historique de la session
+        session = await self.mongo_service.get_session(session_id, user_email, include_messages=False)
+        if not session:
+            raise RuntimeError("Session non trouvée ou non autorisée")
+        history = await self.mongo_service.get_recent_messages(session_id, settings.history_max_messages)
+
+        # Ne conserver que les tours récents tenant dans le budget de tokens
+        older, recent = split_history(history, settings.history_token_budget)
+
+        # Préparer les messages pour LangChain
+        messages = [SystemMessage(content="Vous êtes un assistant utile et concis.")]
+        if settings.history_summary_enabled:
+            summary = session.get("summary")
+            if summary:
+                messages.append(SystemMessage(content=f"Résumé du début de la conversation : {summary}"))
+            self._schedule_summary(session, history, older, recent)
+        for msg in recent:
+            if msg["role"] == "user":
+                messages.append(HumanMessage(content=msg["content"]))
+            elif msg["role"] == "assistant":
+                messages.append(AIMessage(content=msg["content"]))
+
+        # Ajouter la nouvelle requête avec le contexte
+        messages.append(HumanMessage(content=f"Contexte : {context}\nQuestion : {user_query}"))
+
+        # Seules les questions sans historique (premier tour) ont une réponse indépendante de la session
+        cacheable = self.answer_cache is not None and retrieval is not None and not history
+        return messages, retrieval if cacheable else None
+
+    def _cached_answer(self, retrieval: Optional[Retrieval]) -> Optional[str]:
+        if retrieval is None:
+            return None
+        return self.answer_cache.lookup(retrieval.query_vector, retrieval.doc_ids, retrieval.index_version)
+
+    def _cache_answer(self, user_query: str, retrieval: Optional[Retrieval], answer: str):
+        if retrieval is not None:
+            self.answer_cache.store(user_query, retrieval.query_vector, retrieval.doc_ids,
+                                    retrieval.index_version, answer)
+
+    def _schedule_summary(self, session: Dict, history: List[Dict], older: List[Dict], recent: List[Dict]):
+        """
+        Lance en tâche de fond l'intégration au résumé de tous les messages qui précèdent les
+        tours envoyés au LLM et ne sont pas encore résumés, y compris ceux sortis de la fenêtre
+        de HISTORY_MAX_MESSAGES messages. Le tour courant utilise le résumé déjà stocké.
+        """
+        session_id = session["session_id"]
+        summary_until = session.get("summary_until")
+        # Fenêtre pleine : des messages plus anciens que la fenêtre n'ont peut-être pas été résumés
+        truncated = len(history) >= settings.history_max_messages
+        pending = any(summary_until is None or msg["timestamp"] > summary_until for msg in older) or (
+            truncated and (summary_until is None or history[0]["timestamp"] > summary_until)
+        )
+        if not pending or session_id in self._summary_tasks:
+            return
+        until = recent[0]["timestamp"] if recent else None
+        task = asyncio.create_task(self._update_summary(session_id, session.get("summary"), summary_until, until))
+        self._summary_tasks[session_id] = task
+        task.add_done_callback(lambda _: self._summary_tasks.pop(session_id, None))
+
+    async def _update_summary(self, session_id: str, summary: Optional[str],
+                              after: Optional[datetime], before: Optional[datetime]):
+        """
+        Met à jour le résumé courant de la conversation avec les messages postérieurs à `after`
+        et antérieurs à `before`, intégrés par lots de HISTORY_MAX_MESSAGES messages.
+        """
+        try:
+            pending = await self.mongo_service.get_messages_between(session_id, after, before)
+            for start in range(0, len(pending), settings.history_max_messages):
+                batch = pending[start:start + settings.history_max_messages]
+                transcript = "\n".join(f"{msg['role']} : {msg['content']}" for msg in batch)
+                prompt = [
+                    SystemMessage(content="Vous résumez des conversations de support de façon factuelle et concise."),
+                    HumanMessage(content=(
+                        f"Résumé actuel : {summary or '(aucun)'}\n\n"
+                        f"Nouveaux échanges :\n{transcript}\n\n"
+                        f"Rédigez le résumé mis à jour en moins de {settings.history_summary_max_tokens} tokens."
+                    ))
+                ]
+                response = await self.llm.ainvoke(prompt, max_tokens=settings.history_summary_max_tokens)
+                summary = response.content
+                await self.mongo_service.save_summary(session_id, summary, batch[-1]["timestamp"])
+            logger.info(f"Résumé de la session {session_id} mis à jour ({len(pending)} messages intégrés).")
+        except Exception as e:
+            # Le résumé est facultatif : l'échec est rattrapé au prochain tour
+            logger.warning(f"Impossible de mettre à jour le résumé de la session {session_id} : {e}")
+
     async def generate_response(self, user_query: str, session_id: str, user_email: str) -> str:
         """
         Génère une réponse en utilisant des chunks pertinents de la recherche vectorielle.
         """
         try:
-            # Récupérer les chunks similaires
             logger.info(f"Génération de réponse pour la requête : {user_query}")
-            similar_chunks = self.vector_search_service.search_similar_chunks(user_query)
-            context = "\n".join([chunk.page_content for chunk in similar_chunks])  # Utilisation de page_content
-            logger.info(f"Contexte utilisé : {context}")
-
-            # Récupérer l'historique de la session
-            session = await self.mongo_service.get_session(session_id, user_email)
-            if not session:
-                raise RuntimeError("Session non trouvée ou non autorisée")
-            history = session.get("messages", [])
-
-            # Préparer les messages pour LangChain
-            messages = [SystemMessage(content="Vous êtes un assistant utile et concis.")]
-            for msg in history:
-                if msg["role"] == "user":
-                    messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    messages.append(AIMessage(content=msg["content"]))
+            messages, retrieval = await self._prepare_messages(user_query, session_id, user_email)
 
-            # Ajouter la nouvelle requête avec le contexte
-            messages.append(HumanMessage(content=f"Contexte : {context}\nQuestion : {user_query}"))
+            cached = self._cached_answer(retrieval)
+            if cached is not None:
+                # L'échange est enregistré dans l'historique comme une réponse générée
+                logger.info("Réponse servie par le cache sémantique.")
+                await self.mongo_service.save_turn(session_id, user_query, cached, user_email)
+                return cached
 
             # Générer la réponse
             response = await self.llm.agenerate([messages])
             response_text = response.generations[0][0].text
 
             # Sauvegarder la réponse et la requête dans MongoDB
-            await self.mongo_service.save_message(session_id, "user", user_query)
-            await self.mongo_service.save_message(session_id, "assistant", response_text)
+            await self.mongo_service.save_turn(session_id, user_query, response_text, user_email)
+            self._cache_answer(user_query, retrieval, response_text)
 
             logger.info(f"Réponse générée : {response_text}")
             return response_text
@@ -83,23 +190,80 @@ class EnhancedLLMService:
             logger.error(f"Erreur lors de la génération de la réponse : {e}")
             raise RuntimeError(f"Erreur interne : {e}")
 
-    async def get_conversation_history(self, session_id: str, user_email: str) -> List[Dict[str, str]]:
+    async def stream_response(self, user_query: str, session_id: str, user_email: str) -> AsyncIterator[str]:
+        """
+        Prépare la requête puis retourne un itérateur asynchrone sur les fragments de la réponse.
+        Les erreurs de préparation (session inconnue...) sont levées avant le début du flux.
+        """
+        try:
+            logger.info(f"Génération de réponse en flux pour la requête : {user_query}")
+            messages, retrieval = await self._prepare_messages(user_query, session_id, user_email)
+        except Exception as e:
+            logger.error(f"Erreur lors de la préparation de la réponse : {e}")
+            raise RuntimeError(f"Erreur interne : {e}")
+        cached = self._cached_answer(retrieval)
+        if cached is not None:
+            logger.info("Réponse servie par le cache sémantique.")
+            return self._replay_and_save(cached, user_query, session_id, user_email)
+        return self._stream_and_save(messages, user_query, session_id, user_email, retrieval)
+
+    async def _replay_and_save(self, answer: str, user_query: str, session_id: str,
+                               user_email: str) -> AsyncIterator[str]:
+        """
+        Transmet une réponse du cache en un seul fragment puis sauvegarde l'échange.
+        """
+        yield answer
+        await self.mongo_service.save_turn(session_id, user_query, answer, user_email)
+
+    async def _stream_and_save(self, messages: List[BaseMessage], user_query: str, session_id: str,
+                               user_email: str, retrieval: Optional[Retrieval] = None) -> AsyncIterator[str]:
+        """
+        Transmet les fragments produits par le LLM et sauvegarde l'échange une fois le flux terminé.
+        Un flux interrompu (déconnexion du client) n'est pas sauvegardé.
+        """
+        parts = []
+        async for chunk in self.llm.astream(messages):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+
+        response_text = "".join(parts)
+        await self.mongo_service.save_turn(session_id, user_query, response_text, user_email)
+        self._cache_answer(user_query, retrieval, response_text)
+        logger.info(f"Réponse générée en flux : {response_text}")
+
+    async def get_conversation_history(self, session_id: str, user_email: str, limit: int,
+                                       cursor: Optional[Dict] = None) -> Dict:
         """
-        Récupère l'historique de la conversation spécifique.
+        Récupère une page de l'historique de la conversation spécifique.
         """
         try:
-            session = await self.mongo_service.get_session(session_id, user_email)
-            if not session:
+            history = await self.mongo_service.get_conversation_history(session_id, user_email, limit, cursor)
+            if history is None:
                 raise RuntimeError("Session non trouvée ou non autorisée")
-            return session.get("messages", [])
+            return history
         except Exception as e:
             raise RuntimeError(f"Erreur lors de la récupération de l'historique : {e}")
 
-    async def get_all_sessions(self, user_email: str) -> List[str]:
+    async def get_all_sessions(self, user_email: str, limit: int, cursor: Optional[Dict] = None) -> Dict:
         """
-        Récupère toutes les sessions d'un utilisateur.
+        Récupère une page des sessions d'un utilisateur.
         """
         try:
-            return await self.mongo_service.get_all_sessions(user_email)
+            return await self.mongo_service.get_all_sessions(user_email, limit, cursor)
         except Exception as e:
             raise RuntimeError(f"Erreur lors de la récupération des sessions : {e}")
+
+
+_llm_service: Optional[EnhancedLLMService] = None
+
+
+def get_llm_service() -> EnhancedLLMService:
+    """
+    Instance partagée d'EnhancedLLMService (dépendance FastAPI), construite à la première
+    requête, une fois le client MongoDB ouvert par le lifespan.
+    """
+    global _llm_service
+    if _llm_service is None:
+        _llm_service = EnhancedLLMService()
+    return _llm_service
@@ -0,0 +1,150 @@
+# app/services/answer_cache.py
+"""
+Cache sémantique des réponses du LLM.
+
+Une réponse est réutilisée pour une nouvelle question si les deux questions ont
+retrouvé exactement les mêmes chunks, dans la même version de l'index, et si
+leurs embeddings sont assez proches (similarité cosinus >= seuil). Le contexte
+envoyé au LLM serait donc identique, et la question quasiment la même.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Hashable, List, Optional, Tuple
+from core.config import settings
+import numpy as np
+import threading
+import time
+
+
+@dataclass
+class _Entry:
+    question: str
+    vector: np.ndarray  # Embedding normalisé de la question
+    group: Hashable  # (chunks retrouvés, version de l'index)
+    answer: str
+    expires_at: float
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+    last_hit_at: Optional[float] = None
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class SemanticAnswerCache:
+    """
+    Cache LRU de `maxsize` réponses expirant après `ttl` secondes.
+    """
+    def __init__(self, maxsize: int, ttl: float, threshold: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._groups: Dict[Hashable, List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def group_key(doc_ids: List[str], index_version: int) -> Tuple[FrozenSet[str], int]:
+        return frozenset(doc_ids), index_version
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        ids = self._groups.get(entry.group, [])
+        ids.remove(entry_id)
+        if not ids:
+            self._groups.pop(entry.group, None)
+
+    def lookup(self, vector, doc_ids: List[str], index_version: int) -> Optional[str]:
+        """
+        Retourne la réponse d'une question proche ayant retrouvé les mêmes chunks, ou None.
+        """
+        if not doc_ids:
+            return None
+        group = self.group_key(doc_ids, index_version)
+        query = _normalize(vector)
+        now = time.time()
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._groups.get(group, [])):
+                entry = self._entries[entry_id]
+                if entry.expires_at < now:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+                score = float(np.dot(query, entry.vector))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            entry = self._entries[best_id]
+            self._entries.move_to_end(best_id)
+            entry.hits += 1
+            entry.last_hit_at = now
+            self.hits += 1
+            return entry.answer
+
+    def store(self, question: str, vector, doc_ids: List[str], index_version: int, answer: str):
+        if self.maxsize <= 0 or not doc_ids or not answer:
+            return
+        group = self.group_key(doc_ids, index_version)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(question, _normalize(vector), group, answer, time.time() + self.ttl)
+            self._groups.setdefault(group, []).append(entry_id)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def stats(self, top: int = 10) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            most_used = sorted(self._entries.values(), key=lambda entry: entry.hits, reverse=True)[:top]
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "top_entries": [
+                    {"question": entry.question, "hits": entry.hits, "last_hit_at": entry.last_hit_at}
+                    for entry in most_used if entry.hits
+                ],
+            }
+
+
+_answer_cache: Optional[SemanticAnswerCache] = None
+_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """
+    Cache de réponses partagé du processus, ou None si ANSWER_CACHE_ENABLED est désactivé.
+    """
+    global _answer_cache
+    if not settings.answer_cache_enabled:
+        return None
+    if _answer_cache is None:
+        with _lock:
+            if _answer_cache is None:
+                _answer_cache = SemanticAnswerCache(
+                    settings.answer_cache_size, settings.answer_cache_ttl, settings.answer_cache_threshold
+                )
+    return _answer_cache
@@ -0,0 +1,142 @@
+# app/services/chunker.py
+"""
+Découpage du texte des pages en chunks d'environ CHUNK_TARGET_TOKENS tokens.
+
+Le texte est d'abord séparé en titres, paragraphes et phrases ; les chunks sont
+formés de phrases entières, un titre commence un nouveau chunk, et chaque chunk
+reprend les dernières phrases du précédent (jusqu'à CHUNK_OVERLAP_TOKENS tokens)
+pour ne pas couper une idée en deux. Une phrase plus longue qu'un chunk est coupée
+entre deux mots. Les positions (char_start, char_end) renvoient au texte de la page.
+"""
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from core.config import settings
+from services.tokens import count_tokens
+import re
+
+# Ligne de titre : « # Titre », « 2.1 Titre » ou ligne courte en majuscules, sans ponctuation finale
+_HEADING = re.compile(
+    r"^[ \t]*(?:#{1,6}[ \t]+\S[^\n]*"
+    r"|\d+(?:\.\d+)*\.?[ \t]+[A-ZÀ-Ý][^\n]{0,80}"
+    r"|[A-ZÀ-Ý][A-ZÀ-Ý0-9 \t'’,\-]{3,80})(?<![.;,:])[ \t]*$",
+    re.MULTILINE
+)
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?…])\s+")
+_WORD = re.compile(r"\S+")
+
+
+class _Unit(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+    heading: bool
+
+
+def _spans(text: str, start: int, end: int, separator: re.Pattern) -> Iterator[Tuple[int, int]]:
+    """
+    Portions non vides de text[start:end] entre deux séparateurs, sans les espaces de bord.
+    """
+    position = start
+    for match in list(separator.finditer(text, start, end)) + [None]:
+        stop = match.start() if match else end
+        while position < stop and text[position].isspace():
+            position += 1
+        last = stop
+        while last > position and text[last - 1].isspace():
+            last -= 1
+        if last > position:
+            yield position, last
+        if match:
+            position = match.end()
+
+
+def _split_words(text: str, start: int, end: int, target_tokens: int) -> Iterator[_Unit]:
+    """
+    Coupe une phrase trop longue en morceaux d'au plus `target_tokens` tokens, entre deux mots.
+    """
+    piece_start, used, last_end = None, 0, start
+    for word in _WORD.finditer(text, start, end):
+        tokens = count_tokens(word.group())
+        if piece_start is not None and used + tokens > target_tokens:
+            yield _Unit(piece_start, last_end, used, False)
+            piece_start, used = None, 0
+        if piece_start is None:
+            piece_start = word.start()
+        used += tokens
+        last_end = word.end()
+    if piece_start is not None:
+        yield _Unit(piece_start, last_end, used, False)
+
+
+def _units(text: str, target_tokens: int) -> Iterator[_Unit]:
+    """
+    Titres et phrases de `text`, dans l'ordre.
+    """
+    def sentences(start: int, end: int) -> Iterator[_Unit]:
+        for paragraph_start, paragraph_end in _spans(text, start, end, _PARAGRAPH_BREAK):
+            for sentence_start, sentence_end in _spans(text, paragraph_start, paragraph_end, _SENTENCE_BREAK):
+                tokens = count_tokens(text[sentence_start:sentence_end])
+                if tokens > target_tokens:
+                    yield from _split_words(text, sentence_start, sentence_end, target_tokens)
+                else:
+                    yield _Unit(sentence_start, sentence_end, tokens, False)
+
+    position = 0
+    for match in _HEADING.finditer(text):
+        yield from sentences(position, match.start())
+        for heading_start, heading_end in _spans(text, match.start(), match.end(), _PARAGRAPH_BREAK):
+            yield _Unit(heading_start, heading_end, count_tokens(text[heading_start:heading_end]), True)
+        position = match.end()
+    yield from sentences(position, len(text))
+
+
+def split_text(text: str, target_tokens: int, overlap_tokens: int) -> List[Tuple[int, int]]:
+    """
+    Positions (début, fin) des chunks de `text`.
+    """
+    spans: List[Tuple[int, int]] = []
+    current: List[_Unit] = []
+    used = 0
+    for unit in _units(text, target_tokens):
+        # Un titre ouvre un nouveau chunk, sauf s'il suit un chunk encore trop court
+        new_section = unit.heading and used >= target_tokens // 4
+        if current and (used + unit.tokens > target_tokens or new_section):
+            spans.append((current[0].start, current[-1].end))
+            carried: List[_Unit] = []
+            if not new_section:
+                # Recouvrement : dernières phrases du chunk précédent
+                carried_tokens = 0
+                for previous in reversed(current):
+                    if carried_tokens + previous.tokens > overlap_tokens \
+                            or carried_tokens + previous.tokens + unit.tokens > target_tokens:
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous.tokens
+            current = carried
+            used = sum(previous.tokens for previous in carried)
+        current.append(unit)
+        used += unit.tokens
+    if current:
+        spans.append((current[0].start, current[-1].end))
+    return spans
+
+
+def chunk_page(page_number: int, text: str, target_tokens: Optional[int] = None,
+               overlap_tokens: Optional[int] = None) -> List[Dict]:
+    """
+    Chunks d'une page, avec leurs métadonnées de position.
+    """
+    target_tokens = target_tokens or settings.chunk_target_tokens
+    overlap_tokens = settings.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+    chunks = []
+    for chunk_index, (start, end) in enumerate(split_text(text, target_tokens, overlap_tokens)):
+        chunk_text = text[start:end]
+        chunks.append({
+            "page_number": page_number,
+            "chunk_index": chunk_index,
+            "char_start": start,
+            "char_end": end,
+            "token_count": count_tokens(chunk_text),
+            "text": chunk_text,
+        })
+    return chunks
@@ -0,0 +1,147 @@
+# app/services/context_builder.py
+"""
+Assemblage du contexte envoyé au LLM à partir des chunks retrouvés.
+
+Les chunks trop éloignés de la question (similarité cosinus < CONTEXT_MIN_SIMILARITY)
+sont écartés ; les autres sont choisis par MMR (maximal marginal relevance), qui
+pénalise les chunks redondants avec ceux déjà retenus, et les quasi-doublons
+(similarité >= CONTEXT_DUPLICATE_SIMILARITY) sont ignorés. Les chunks sont ajoutés
+tant qu'ils tiennent dans CONTEXT_TOKEN_BUDGET tokens, dans la limite de CONTEXT_MAX_CHUNKS.
+"""
+from typing import Dict, List, NamedTuple, Optional
+from core.config import settings
+from services.tokens import count_tokens
+from services.vector_search_service import Retrieval
+import numpy as np
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Ancien comportement : les 5 premiers chunks, joints tels quels
+BASELINE_CHUNKS = 5
+
+
+class Context(NamedTuple):
+    text: str
+    chunks: int
+    tokens: int
+    baseline_tokens: int  # Tokens du contexte sans sélection (5 premiers chunks)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+class ContextBuilder:
+
+    def __init__(self, token_budget: int, max_chunks: int, min_similarity: float,
+                 mmr_lambda: float, duplicate_similarity: float):
+        self.token_budget = token_budget
+        self.max_chunks = max_chunks
+        self.min_similarity = min_similarity
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_similarity = duplicate_similarity
+        self._lock = threading.Lock()
+        self.contexts = 0
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+        self.below_threshold = 0
+        self.duplicates = 0
+        self.over_budget = 0
+
+    def _select(self, retrieval: Retrieval, token_counts: List[int]) -> List[int]:
+        """
+        Positions des chunks retenus, dans l'ordre de sélection MMR.
+        """
+        vectors = _normalize(np.asarray(retrieval.vectors, dtype=np.float32))
+        similarities = vectors @ _normalize(np.asarray(retrieval.query_vector, dtype=np.float32).ravel())
+        pairwise = vectors @ vectors.T
+
+        remaining = [row for row in range(len(vectors)) if similarities[row] >= self.min_similarity]
+        below_threshold = len(vectors) - len(remaining)
+        duplicates = over_budget = 0
+        selected: List[int] = []
+        used = 0
+        while remaining and len(selected) < self.max_chunks:
+            if selected:
+                redundancy = pairwise[np.ix_(remaining, selected)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            scores = self.mmr_lambda * similarities[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = remaining.pop(int(np.argmax(scores)))
+            if selected and pairwise[best, selected].max() >= self.duplicate_similarity:
+                duplicates += 1
+                continue
+            if used + token_counts[best] > self.token_budget:
+                # Un chunk plus court, moins bien classé, peut encore tenir dans le budget
+                over_budget += 1
+                continue
+            selected.append(best)
+            used += token_counts[best]
+
+        with self._lock:
+            self.below_threshold += below_threshold
+            self.duplicates += duplicates
+            self.over_budget += over_budget
+        return selected
+
+    def build(self, retrieval: Optional[Retrieval]) -> Context:
+        if retrieval is None or not retrieval.documents:
+            return Context("", 0, 0, 0)
+        texts = [document.page_content for document in retrieval.documents]
+        token_counts = [count_tokens(text) for text in texts]
+        selected = self._select(retrieval, token_counts)
+
+        text = "\n".join(texts[row] for row in selected)
+        context = Context(
+            text,
+            len(selected),
+            count_tokens(text),
+            count_tokens("\n".join(texts[:BASELINE_CHUNKS]))
+        )
+        with self._lock:
+            self.contexts += 1
+            self.tokens_sent += context.tokens
+            self.tokens_saved += context.baseline_tokens - context.tokens
+        logger.info(
+            f"Contexte : {context.chunks}/{len(texts)} chunks, {context.tokens} tokens "
+            f"({context.baseline_tokens - context.tokens} économisés)"
+        )
+        return context
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "token_budget": self.token_budget,
+                "contexts": self.contexts,
+                "tokens_sent": self.tokens_sent,
+                "tokens_saved": self.tokens_saved,
+                "average_tokens": self.tokens_sent / self.contexts if self.contexts else 0.0,
+                "dropped_below_threshold": self.below_threshold,
+                "dropped_duplicates": self.duplicates,
+                "dropped_over_budget": self.over_budget,
+            }
+
+
+_context_builder: Optional[ContextBuilder] = None
+_lock = threading.Lock()
+
+
+def get_context_builder() -> ContextBuilder:
+    """
+    Instance partagée de ContextBuilder, configurée par les variables CONTEXT_*.
+    """
+    global _context_builder
+    if _context_builder is None:
+        with _lock:
+            if _context_builder is None:
+                _context_builder = ContextBuilder(
+                    token_budget=settings.context_token_budget,
+                    max_chunks=settings.context_max_chunks,
+                    min_similarity=settings.context_min_similarity,
+                    mmr_lambda=settings.context_mmr_lambda,
+                    duplicate_similarity=settings.context_duplicate_similarity
+                )
+    return _context_builder
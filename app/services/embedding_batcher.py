@@ -0,0 +1,116 @@
+# app/services/embedding_batcher.py
+"""
+Regroupement des embeddings de requêtes concurrentes en micro-lots.
+"""
+from concurrent.futures import Executor
+from collections import Counter, deque
+from typing import Callable, List, Optional, Dict
+import numpy as np
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class QueryEmbeddingBatcher:
+    """
+    Collecte les requêtes arrivant en même temps pendant quelques millisecondes
+    (ou jusqu'à `max_batch_size` requêtes) et les encode en un seul appel.
+    Chaque appelant reçoit le vecteur de sa propre requête.
+    """
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], executor: Executor,
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self._encode = encode
+        self._executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Statistiques
+        self._batches = 0
+        self._queries = 0
+        self._batch_sizes: Counter = Counter()
+        self._total_wait = 0.0
+        self._total_encode = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    def _ensure_started(self):
+        """
+        Démarre la tâche de traitement sur la boucle d'événements courante.
+        """
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def encode(self, text: str) -> np.ndarray:
+        """
+        Retourne le vecteur de `text`, encodé avec les autres requêtes en attente.
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def _collect_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            started = time.perf_counter()
+            waits = [started - enqueued for _, _, enqueued in batch]
+            texts = [text for text, _, _ in batch]
+            try:
+                vectors = await self._loop.run_in_executor(self._executor, self._encode, texts)
+            except Exception as e:
+                logger.error(f"Erreur lors de l'encodage d'un lot de {len(texts)} requêtes : {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._record(len(batch), waits, time.perf_counter() - started)
+            for (_, future, _), vector in zip(batch, vectors):
+                # L'appelant a pu être annulé pendant l'encodage
+                if not future.done():
+                    future.set_result(vector)
+
+    def _record(self, size: int, waits: List[float], encode_time: float):
+        self._batches += 1
+        self._queries += size
+        self._batch_sizes[size] += 1
+        self._total_wait += sum(waits)
+        self._total_encode += encode_time
+        self._recent_waits.extend(waits)
+
+    def stats(self) -> Dict:
+        """
+        Tailles de lots et temps d'attente dans la file depuis le démarrage.
+        """
+        recent = np.asarray(self._recent_waits) * 1000 if self._recent_waits else np.zeros(1)
+        return {
+            "batches": self._batches,
+            "queries": self._queries,
+            "avg_batch_size": self._queries / self._batches if self._batches else 0.0,
+            "max_batch_size": max(self._batch_sizes, default=0),
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            "avg_queue_wait_ms": self._total_wait * 1000 / self._queries if self._queries else 0.0,
+            "p95_queue_wait_ms": float(np.percentile(recent, 95)),
+            "avg_encode_ms": self._total_encode * 1000 / self._batches if self._batches else 0.0,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+        }
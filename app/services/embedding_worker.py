@@ -0,0 +1,56 @@
+# app/services/embedding_worker.py
+"""
+Encodage de textes dans des processus dédiés (ingestion de documents).
+
+Le module n'importe que le strict nécessaire : il est rechargé par chaque
+processus du pool (méthode « spawn »), qui charge son propre modèle une fois.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import multiprocessing
+import threading
+import numpy as np
+
+# Modèle du processus de travail, chargé par `_init_worker`
+_model = None
+
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _init_worker(model_name: str, backend: str):
+    global _model
+    from services.encoders import load_encoder
+    _model = load_encoder(backend, model_name)
+
+
+def encode_texts(texts: List[str]) -> np.ndarray:
+    """
+    Encode un lot de textes (exécuté dans un processus du pool).
+    """
+    return np.asarray(_model.encode(texts), dtype=np.float32)
+
+
+def get_embedding_pool(model_name: str, workers: int, backend: str = "torch") -> ProcessPoolExecutor:
+    """
+    Pool de processus d'encodage partagé, créé au premier appel.
+    """
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(model_name, backend)
+                )
+    return _pool
+
+
+def shutdown_embedding_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
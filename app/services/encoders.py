@@ -0,0 +1,168 @@
+# app/services/encoders.py
+"""
+Encodeurs de texte interchangeables (ENCODER_BACKEND) :
+- « torch » : SentenceTransformer (PyTorch), la référence ;
+- « onnx » : le même modèle exporté en ONNX, exécuté par ONNX Runtime ;
+- « onnx-int8 » : le modèle ONNX quantifié en int8 (poids), plus rapide sur CPU.
+
+Les encodeurs ONNX n'importent ni torch ni sentence_transformers : seuls onnxruntime
+et tokenizers sont chargés. Les fichiers sont produits une fois par `export_onnx`
+(script verify_encoder.py --export) dans ENCODER_ONNX_DIR/<modèle>. Tous les encodeurs
+exposent l'interface de SentenceTransformer utilisée par l'application :
+`encode` et `get_sentence_embedding_dimension`.
+"""
+from typing import List, Optional, Union
+from core.config import settings
+import numpy as np
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model-int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+CONFIG_FILE = "encoder.json"
+
+
+def onnx_directory(model_name: str) -> str:
+    return os.path.join(settings.encoder_onnx_dir, model_name.replace("/", "__"))
+
+
+class OnnxEncoder:
+    """
+    Encodeur ONNX Runtime reproduisant le pipeline SentenceTransformer :
+    tokenisation, transformer, pooling (moyenne ou CLS) puis normalisation L2 éventuelle.
+    """
+    def __init__(self, directory: str, quantized: bool = False, threads: int = 0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(directory, CONFIG_FILE)) as f:
+            self.config = json.load(f)
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_token_id"])
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        model_file = ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(directory, model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dimension"]
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.asarray([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.asarray([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.asarray([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+        if self.config["pooling"] == "cls":
+            embeddings = hidden[:, 0]
+        else:
+            mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+            embeddings = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config["normalize"]:
+            embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype(np.float32)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Même contrat que SentenceTransformer.encode : un vecteur pour une chaîne,
+        une matrice pour une liste. Les textes sont regroupés par longueur pour limiter le padding.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda position: len(texts[position]))
+        embeddings = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        batch_size = max(1, batch_size)
+        for start in range(0, len(texts), batch_size):
+            positions = order[start:start + batch_size]
+            embeddings[positions] = self._encode_batch([texts[position] for position in positions])
+        return embeddings[0] if single else embeddings
+
+
+def export_onnx(model_name: str, directory: Optional[str] = None) -> str:
+    """
+    Exporte le modèle SentenceTransformer en ONNX, puis en ONNX quantifié int8
+    (quantification dynamique des poids). Nécessite torch, sentence_transformers et onnxruntime.
+    Retourne le répertoire des fichiers produits.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    directory = directory or onnx_directory(model_name)
+    os.makedirs(directory, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0]
+    pooling = next((module for module in model if hasattr(module, "pooling_mode_cls_token")), None)
+    tokenizer = transformer.tokenizer
+
+    inputs = tokenizer(["exemple d'export"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in inputs]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    transformer.auto_model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer.auto_model,
+            tuple(inputs[name] for name in input_names),
+            os.path.join(directory, ONNX_MODEL_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    quantize_dynamic(
+        os.path.join(directory, ONNX_MODEL_FILE),
+        os.path.join(directory, ONNX_INT8_MODEL_FILE),
+        weight_type=QuantType.QInt8
+    )
+
+    tokenizer.backend_tokenizer.save(os.path.join(directory, TOKENIZER_FILE))
+    config = {
+        "model": model_name,
+        "dimension": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "pad_token_id": tokenizer.pad_token_id or 0,
+        "pooling": "cls" if pooling is not None and pooling.pooling_mode_cls_token else "mean",
+        "normalize": any(type(module).__name__ == "Normalize" for module in model),
+    }
+    with open(os.path.join(directory, CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+    logger.info(f"Modèle {model_name} exporté en ONNX dans {directory}.")
+    return directory
+
+
+def load_encoder(backend: Optional[str] = None, model_name: Optional[str] = None):
+    """
+    Charge l'encodeur du backend demandé (ENCODER_BACKEND par défaut).
+    """
+    backend = backend or settings.encoder_backend
+    model_name = model_name or settings.embedding_model_name
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        directory = onnx_directory(model_name)
+        if not os.path.exists(os.path.join(directory, CONFIG_FILE)):
+            raise RuntimeError(
+                f"Modèle ONNX introuvable dans {directory} : lancer `python verify_encoder.py --export`."
+            )
+        return OnnxEncoder(directory, quantized=backend == "onnx-int8", threads=settings.encoder_threads)
+    raise ValueError(f"Backend d'encodage inconnu : {backend} (attendu : {', '.join(ENCODER_BACKENDS)})")
+
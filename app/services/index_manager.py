@@ -0,0 +1,98 @@
+# app/services/index_manager.py
+"""
+Déclaration et création des index MongoDB nécessaires aux requêtes de l'application.
+"""
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from typing import Dict, List
+from core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def declared_indexes() -> Dict[str, List[IndexModel]]:
+    """
+    Index attendus, par collection. Chaque index correspond à une forme de requête
+    de MongoService, UserService ou VectorSearchService.
+    """
+    return {
+        # get_session, save_turn, rename_session, delete_conversation
+        settings.collection_name: [
+            IndexModel([("session_id", ASCENDING)], name="session_id_unique", unique=True),
+            # get_all_sessions (pages des sessions d'un utilisateur, plus récentes d'abord)
+            IndexModel([("user_email", ASCENDING), ("_id", DESCENDING)], name="user_email_id"),
+        ],
+        # Lectures en mode buckets et recherche du dernier bucket ; l'unicité rejette
+        # l'écriture concurrente d'un bucket déjà créé (MongoService._bucket_operation)
+        "message_buckets": [
+            IndexModel([("session_id", ASCENDING), ("seq", DESCENDING)], name="session_id_seq", unique=True),
+        ],
+        "users": [
+            # get_user_by_email (à chaque requête authentifiée), unicité des comptes
+            IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+            # Liste des utilisateurs côté administration
+            IndexModel([("role", ASCENDING)], name="role"),
+            # get_user_stats
+            IndexModel([("created_at", ASCENDING)], name="created_at"),
+        ],
+        "admins": [
+            IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        ],
+        # Relecture des invalidations du cache d'authentification (user_service.sync_invalidations) ;
+        # une invalidation n'est plus utile une fois les entrées du cache qu'elle vise expirées
+        "auth_invalidations": [
+            IndexModel([("at", ASCENDING)], name="at_ttl",
+                       expireAfterSeconds=int(settings.auth_cache_ttl + settings.auth_invalidation_poll_interval) + 60),
+        ],
+        # Réservation du prochain travail d'ingestion (IngestionJobService.claim)
+        "ingestion_jobs": [
+            IndexModel([("status", ASCENDING), ("queued_at", ASCENDING)], name="status_queued_at"),
+        ],
+        # remove_document
+        settings.pdf_chunks_collection: [
+            IndexModel([("file_name", ASCENDING)], name="file_name"),
+        ],
+        # Publication et nettoyage des chunks d'une ingestion (pdf_ingestion._publish)
+        settings.pdf_chunks_staging_collection: [
+            IndexModel([("ingestion_id", ASCENDING), ("_id", ASCENDING)], name="ingestion_id"),
+        ],
+        # Journal des suppressions relu par _id (VectorSearchService.refresh) ; un index plus
+        # ancien que la rétention est reconstruit au chargement plutôt que rattrapé
+        settings.pdf_chunk_deletions_collection: [
+            IndexModel([("at", ASCENDING)], name="at_ttl",
+                       expireAfterSeconds=settings.chunk_deletions_retention_days * 86400),
+        ],
+    }
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """
+    Crée les index déclarés s'ils n'existent pas (opération idempotente, à lancer au démarrage).
+    Un échec sur une collection (doublons empêchant un index unique...) est journalisé
+    sans bloquer le démarrage, sauf pour les index indispensables (check_required_indexes).
+    """
+    created = {}
+    for collection_name, indexes in declared_indexes().items():
+        try:
+            created[collection_name] = await db[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error(f"Impossible de créer les index de la collection {collection_name} : {e}")
+    logger.info(f"Index MongoDB vérifiés : {created}")
+    return created
+
+
+async def check_required_indexes(db):
+    """
+    Vérifie la présence des index dont dépend la cohérence des écritures (et non
+    seulement les performances) ; lève RuntimeError pour empêcher le démarrage sinon.
+    En mode buckets, l'index unique (session_id, seq) est ce qui fait échouer l'écriture
+    concurrente d'un bucket déjà créé : sans lui, deux buckets porteraient le même numéro.
+    """
+    if settings.message_storage == "buckets":
+        indexes = await db["message_buckets"].index_information()
+        if "session_id_seq" not in indexes:
+            raise RuntimeError(
+                "MESSAGE_STORAGE=buckets requiert l'index unique session_id_seq sur message_buckets "
+                "(voir les erreurs de création d'index ci-dessus), ou MESSAGE_STORAGE=embedded."
+            )
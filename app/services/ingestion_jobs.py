@@ -0,0 +1,366 @@
+# app/services/ingestion_jobs.py
+"""
+File de travaux d'ingestion de PDF, stockée dans MongoDB (collection `ingestion_jobs`).
+
+L'upload enregistre le fichier et crée un travail `queued` ; des workers (tâches
+asyncio du processus de l'API ou du script ingestion_worker.py) réservent les
+travaux un par un de manière atomique et les exécutent avec le pipeline de
+services/pdf_ingestion.py. L'avancement est enregistré régulièrement dans le
+document du travail, qui sert aussi de battement de cœur : un travail dont le
+worker a disparu est repris par un autre.
+
+Le fichier reçu n'est conservé que tant que le travail peut encore être exécuté :
+il est supprimé dès que le travail est terminé ou annulé, ou qu'il a échoué après
+INGESTION_JOB_MAX_ATTEMPTS tentatives. Un nettoyage périodique supprime aussi ceux
+des travaux échoués non relancés depuis INGESTION_UPLOAD_RETENTION_HOURS.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from core.config import settings
+from core.database import get_database
+from services.pdf_ingestion import IngestionProgress, ingest_pdf
+import asyncio
+import os
+import socket
+import logging
+
+logger = logging.getLogger(__name__)
+
+# États d'un travail
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class IngestionJobService:
+
+    def __init__(self, db: Optional[AsyncIOMotorDatabase] = None):
+        self.db = db if db is not None else get_database()
+        self.jobs = self.db["ingestion_jobs"]
+
+    @staticmethod
+    def to_response(job: Dict) -> Dict:
+        """
+        Représentation d'un travail renvoyée par l'API.
+        """
+        def fmt(dt):
+            return dt.isoformat() if dt else None
+        return {
+            "job_id": str(job["_id"]),
+            "file_name": job["file_name"],
+            "status": job["status"],
+            "progress": job.get("progress", {}),
+            "error": job.get("error"),
+            "attempts": job.get("attempts", 0),
+            "cancel_requested": job.get("cancel_requested", False),
+            "created_by": job.get("created_by"),
+            "created_at": fmt(job.get("created_at")),
+            "started_at": fmt(job.get("started_at")),
+            "finished_at": fmt(job.get("finished_at")),
+        }
+
+    async def enqueue(self, job_id: ObjectId, file_name: str, path: str, created_by: str) -> Dict:
+        now = datetime.utcnow()
+        job = {
+            "_id": job_id,
+            "file_name": file_name,
+            "path": path,
+            "status": QUEUED,
+            "progress": {},
+            "attempts": 0,
+            "cancel_requested": False,
+            "created_by": created_by,
+            "created_at": now,
+            "queued_at": now,
+        }
+        await self.jobs.insert_one(job)
+        return job
+
+    async def get(self, job_id: ObjectId) -> Optional[Dict]:
+        return await self.jobs.find_one({"_id": job_id})
+
+    async def list_recent(self, limit: int) -> List[Dict]:
+        return await self.jobs.find().sort("_id", -1).limit(limit).to_list(length=limit)
+
+    async def claim(self, worker: str) -> Optional[Dict]:
+        """
+        Réserve atomiquement le plus ancien travail en attente, ou un travail en cours
+        dont le worker ne donne plus signe de vie (dans la limite des tentatives).
+        """
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=settings.ingestion_job_stale_after)
+        # Travaux abandonnés trop souvent : ils ne sont plus repris
+        await self.jobs.update_many(
+            {"status": RUNNING, "heartbeat_at": {"$lt": stale},
+             "attempts": {"$gte": settings.ingestion_job_max_attempts}},
+            {"$set": {"status": FAILED, "error": "Worker perdu à chaque tentative", "finished_at": now}}
+        )
+        return await self.jobs.find_one_and_update(
+            {"$or": [
+                {"status": QUEUED},
+                {"status": RUNNING, "heartbeat_at": {"$lt": stale},
+                 "attempts": {"$lt": settings.ingestion_job_max_attempts}},
+            ]},
+            {
+                "$set": {"status": RUNNING, "worker": worker, "started_at": now, "heartbeat_at": now,
+                         "error": None, "progress": {}},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("queued_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def heartbeat(self, job_id: ObjectId, progress: Dict) -> bool:
+        """
+        Enregistre l'avancement ; retourne True si une annulation a été demandée.
+        """
+        job = await self.jobs.find_one_and_update(
+            {"_id": job_id},
+            {"$set": {"progress": progress, "heartbeat_at": datetime.utcnow()}},
+            projection={"cancel_requested": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return bool(job and job.get("cancel_requested"))
+
+    async def finish(self, job_id: ObjectId, status: str, progress: Optional[Dict], error: Optional[str] = None):
+        """
+        Termine un travail ; l'avancement enregistré est conservé si `progress` vaut None.
+        """
+        update = {"status": status, "error": error, "finished_at": datetime.utcnow()}
+        if progress is not None:
+            update["progress"] = progress
+        await self.jobs.update_one({"_id": job_id}, {"$set": update})
+
+    async def requeue(self, job_id: ObjectId):
+        await self.jobs.update_one(
+            {"_id": job_id, "status": RUNNING},
+            {"$set": {"status": QUEUED, "queued_at": datetime.utcnow()}, "$inc": {"attempts": -1}}
+        )
+
+    async def discard_upload(self, job: Dict):
+        """
+        Supprime le fichier reçu d'un travail qui ne sera plus exécuté.
+        """
+        path = job.get("path")
+        if path:
+            try:
+                await asyncio.to_thread(os.remove, path)
+            except FileNotFoundError:
+                pass
+        await self.jobs.update_one({"_id": job["_id"]}, {"$unset": {"path": ""}})
+
+    async def sweep_uploads(self) -> int:
+        """
+        Supprime les fichiers reçus des travaux terminés ou abandonnés : travaux terminés
+        ou annulés, échoués sans tentative restante, ou échoués et non relancés depuis
+        INGESTION_UPLOAD_RETENTION_HOURS. Retourne le nombre de fichiers supprimés.
+        """
+        expired = datetime.utcnow() - timedelta(hours=settings.ingestion_upload_retention_hours)
+        cursor = self.jobs.find(
+            {"path": {"$ne": None}, "$or": [
+                {"status": {"$in": [COMPLETED, CANCELLED]}},
+                {"status": FAILED, "attempts": {"$gte": settings.ingestion_job_max_attempts}},
+                {"status": FAILED, "finished_at": {"$lt": expired}},
+            ]},
+            {"path": 1}
+        )
+        count = 0
+        async for job in cursor:
+            await self.discard_upload(job)
+            count += 1
+        return count
+
+    async def request_cancel(self, job_id: ObjectId) -> Optional[Dict]:
+        """
+        Annule un travail en attente immédiatement ; pour un travail en cours,
+        l'annulation est prise en compte par son worker au battement suivant.
+        """
+        job = await self.jobs.find_one_and_update(
+            {"_id": job_id, "status": QUEUED},
+            {"$set": {"status": CANCELLED, "cancel_requested": True, "finished_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is not None:
+            await self.discard_upload(job)
+            return job
+        return await self.jobs.find_one_and_update(
+            {"_id": job_id, "status": RUNNING},
+            {"$set": {"cancel_requested": True}},
+            return_document=ReturnDocument.AFTER
+        ) or await self.get(job_id)
+
+    async def retry(self, job_id: ObjectId) -> Optional[Dict]:
+        """
+        Remet en file un travail échoué dont le fichier reçu est conservé (tentatives restantes,
+        rétention non écoulée). Retourne None si ce n'est pas possible.
+        """
+        return await self.jobs.find_one_and_update(
+            {"_id": job_id, "status": FAILED, "path": {"$ne": None},
+             "attempts": {"$lt": settings.ingestion_job_max_attempts}},
+            {"$set": {"status": QUEUED, "cancel_requested": False, "error": None, "progress": {},
+                      "queued_at": datetime.utcnow()},
+             "$unset": {"started_at": "", "finished_at": "", "worker": ""}},
+            return_document=ReturnDocument.AFTER
+        )
+
+
+class IngestionWorkerPool:
+    """
+    `size` tâches asyncio qui exécutent les travaux d'ingestion l'un après l'autre.
+    L'encodage a lieu dans le pool de processus d'encodage, l'extraction dans un
+    thread : les requêtes de chat servies par le même processus ne sont pas bloquées.
+    `on_completed` est appelé après chaque travail terminé (rattrapage de l'index du processus).
+    """
+    def __init__(self, job_service: IngestionJobService, size: int,
+                 on_completed: Optional[Callable[[], Awaitable[None]]] = None):
+        self.job_service = job_service
+        self.size = size
+        self.on_completed = on_completed
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running: Dict[ObjectId, asyncio.Task] = {}
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.size)]
+        if settings.ingestion_upload_sweep_interval > 0:
+            self._tasks.append(asyncio.create_task(self._sweep(settings.ingestion_upload_sweep_interval)))
+        logger.info(f"{self.size} worker(s) d'ingestion démarré(s) ({self.name}).")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self):
+        """
+        Signale qu'un travail vient d'être ajouté (évite d'attendre le prochain sondage).
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel_local(self, job_id: ObjectId):
+        """
+        Annule immédiatement un travail s'il est exécuté par ce processus.
+        """
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+
+    async def _worker(self, number: int):
+        worker = f"{self.name}#{number}"
+        while True:
+            try:
+                job = await self.job_service.claim(worker)
+            except Exception as e:
+                logger.error(f"Erreur lors de la réservation d'un travail d'ingestion : {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.ingestion_job_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Erreur MongoDB pendant le suivi du travail : le worker continue avec le suivant
+                logger.error(f"Erreur lors de l'exécution du travail d'ingestion {job['_id']} : {e}")
+                try:
+                    await self.job_service.finish(job["_id"], FAILED, None, str(e))
+                except Exception as finish_error:
+                    # Le travail sera repris une fois son battement de cœur expiré
+                    logger.error(f"Impossible de marquer le travail {job['_id']} en échec : {finish_error}")
+
+    async def _sweep(self, interval: float):
+        """
+        Nettoyage périodique des fichiers reçus des travaux terminés ou abandonnés.
+        """
+        while True:
+            try:
+                removed = await self.job_service.sweep_uploads()
+                if removed:
+                    logger.info(f"{removed} fichier(s) reçu(s) supprimé(s).")
+            except Exception as e:
+                logger.error(f"Erreur lors du nettoyage des fichiers reçus : {e}")
+            await asyncio.sleep(interval)
+
+    async def _run(self, job: Dict):
+        job_id = job["_id"]
+        progress = IngestionProgress()
+        task = asyncio.create_task(ingest_pdf(job["path"], job["file_name"], progress, ingestion_id=str(job_id)))
+        self._running[job_id] = task
+        logger.info(f"Travail d'ingestion {job_id} démarré : {job['file_name']} (tentative {job['attempts']}).")
+        try:
+            # Battement de cœur : avancement enregistré et annulation demandée vérifiée régulièrement
+            while not task.done():
+                done, _ = await asyncio.wait({task}, timeout=settings.ingestion_job_poll_interval)
+                if not done and await self.job_service.heartbeat(job_id, progress.as_dict()):
+                    task.cancel()
+            try:
+                await task
+                await self.job_service.finish(job_id, COMPLETED, progress.as_dict())
+                logger.info(f"Travail d'ingestion {job_id} terminé : {progress.as_dict()}")
+                await self.job_service.discard_upload(job)
+                if self.on_completed is not None:
+                    try:
+                        await self.on_completed()
+                    except Exception as e:
+                        logger.error(f"Erreur lors du rattrapage de l'index après le travail {job_id} : {e}")
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+                await self.job_service.finish(job_id, CANCELLED, progress.as_dict())
+                logger.info(f"Travail d'ingestion {job_id} annulé.")
+                await self.job_service.discard_upload(job)
+            except Exception as e:
+                await self.job_service.finish(job_id, FAILED, progress.as_dict(), str(e))
+                logger.error(f"Travail d'ingestion {job_id} en échec : {e}")
+                # Le fichier est conservé tant que le travail peut être relancé
+                if job["attempts"] >= settings.ingestion_job_max_attempts:
+                    await self.job_service.discard_upload(job)
+        except asyncio.CancelledError:
+            # Arrêt du worker : le travail est remis en file pour être repris par un autre worker
+            task.cancel()
+            await self.job_service.requeue(job_id)
+            raise
+        finally:
+            # Une erreur du suivi (battement, fin) ne doit pas laisser l'ingestion tourner sans worker
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            self._running.pop(job_id, None)
+
+
+_job_service: Optional[IngestionJobService] = None
+_worker_pool: Optional[IngestionWorkerPool] = None
+
+
+def get_ingestion_job_service() -> IngestionJobService:
+    """
+    Instance partagée de IngestionJobService (dépendance FastAPI).
+    """
+    global _job_service
+    if _job_service is None:
+        _job_service = IngestionJobService()
+    return _job_service
+
+
+def get_ingestion_worker_pool() -> IngestionWorkerPool:
+    """
+    Pool de workers d'ingestion du processus (démarré par le lifespan ou par ingestion_worker.py).
+    """
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = IngestionWorkerPool(get_ingestion_job_service(), settings.ingestion_job_workers)
+    return _worker_pool
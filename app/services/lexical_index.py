@@ -0,0 +1,172 @@
+# app/services/lexical_index.py
+"""
+Index lexical BM25 des chunks, complémentaire de l'index FAISS.
+
+La recherche dense retrouve mal les termes exacts (codes d'erreur, noms de produits,
+options de ligne de commande) : l'index inversé les retrouve, et les deux classements
+sont fusionnés par reciprocal rank fusion. Les documents sont identifiés par leur
+identifiant FAISS (entiers consécutifs) ; les postings de chaque terme sont deux
+tableaux compacts d'entiers (documents, fréquences) allongés à chaque ajout. Les
+documents supprimés sont masqués, puis purgés des postings quand ils deviennent nombreux.
+"""
+from array import array
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple
+import numpy as np
+import math
+import re
+import threading
+import unicodedata
+
+# Mots composés conservés entiers (« err-404 », « v2.1 », « dry-run ») en plus de leurs parties
+_TOKEN = re.compile(r"\w+(?:[\-./:]\w+)*")
+_PART = re.compile(r"[^\W_]+")
+
+# Paramètres BM25 usuels
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Proportion de documents supprimés au-delà de laquelle les postings sont purgés
+COMPACT_RATIO = 0.2
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Termes d'un texte : minuscules, sans accents ; un mot composé donne aussi ses parties.
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    terms = []
+    for match in _TOKEN.finditer(text):
+        token = match.group()
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(_PART.findall(token))
+    return terms
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], limit: int, rrf_k: int = 60) -> List[Hashable]:
+    """
+    Fusionne des classements (du meilleur au moins bon) : chaque document reçoit
+    la somme des 1 / (rrf_k + rang) ; retourne les `limit` meilleurs.
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+
+class LexicalIndex:
+
+    def __init__(self):
+        self._postings: Dict[str, Tuple[array, array]] = {}  # terme -> (documents, fréquences)
+        self._lengths = array("i")  # Nombre de termes par document (-1 : supprimé)
+        self._live = 0
+        self._removed = 0
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add(self, labels: Iterable[int], texts: Iterable[str]):
+        """
+        Indexe des documents ; les identifiants doivent être croissants et jamais réutilisés.
+        """
+        with self._lock:
+            for label, text in zip(labels, texts):
+                counts = Counter(tokenize(text))
+                if label >= len(self._lengths):
+                    self._lengths.extend([-1] * (label + 1 - len(self._lengths)))
+                length = sum(counts.values())
+                self._lengths[label] = length
+                self._live += 1
+                self._total_length += length
+                for term, frequency in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("i"), array("i"))
+                    postings[0].append(label)
+                    postings[1].append(frequency)
+
+    def remove(self, labels: Iterable[int]):
+        with self._lock:
+            for label in labels:
+                if 0 <= label < len(self._lengths) and self._lengths[label] >= 0:
+                    self._total_length -= self._lengths[label]
+                    self._lengths[label] = -1
+                    self._live -= 1
+                    self._removed += 1
+            if self._removed > COMPACT_RATIO * max(self._live, 1):
+                self._compact()
+
+    def _compact(self):
+        """
+        Retire des postings les documents supprimés.
+        """
+        lengths = np.frombuffer(self._lengths, dtype=np.int32)
+        for term in list(self._postings):
+            documents, frequencies = self._postings[term]
+            docs = np.frombuffer(documents, dtype=np.int32)
+            keep = lengths[docs] >= 0
+            if keep.all():
+                continue
+            if not keep.any():
+                del self._postings[term]
+                continue
+            self._postings[term] = (array("i", docs[keep].tobytes()),
+                                    array("i", np.frombuffer(frequencies, dtype=np.int32)[keep].tobytes()))
+        self._removed = 0
+
+    def _scores(self, terms: Iterable[str]) -> np.ndarray:
+        """
+        Scores BM25 de tous les documents (appelé sous le verrou). Les vues numpy sur les
+        tableaux de postings disparaissent au retour : un tableau exposé ne peut pas être allongé.
+        """
+        lengths = np.frombuffer(self._lengths, dtype=np.int32)
+        average_length = self._total_length / self._live
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * np.maximum(lengths, 0) / average_length)
+        scores = np.zeros(len(lengths), dtype=np.float32)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings[0], dtype=np.int32)
+            frequencies = np.frombuffer(postings[1], dtype=np.int32).astype(np.float32)
+            idf = math.log(1 + (self._live - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * frequencies * (BM25_K1 + 1) / (frequencies + norms[docs])
+        scores[lengths < 0] = 0
+        return scores
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """
+        Les `k` documents de meilleur score BM25 pour la requête : couples (identifiant, score).
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._live:
+                return []
+            scores = self._scores(terms)
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(label), float(scores[label])) for label in candidates]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            postings = sum(len(documents) for documents, _ in self._postings.values())
+            return {
+                "documents": self._live,
+                "terms": len(self._postings),
+                "postings": postings,
+                "removed_pending": self._removed,
+                "postings_bytes": postings * 8 + len(self._lengths) * 4,
+            }
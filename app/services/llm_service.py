@@ -80,8 +80,7 @@ class LLMService:
             response_text = response.generations[0][0].text
 
             # Sauvegarde des messages dans MongoDB
-            await self.mongo_service.save_message(session_id, "user", message)
-            await self.mongo_service.save_message(session_id, "assistant", response_text)
+            await self.mongo_service.save_turn(session_id, message, response_text, user_email)
 
             return response_text
         except Exception as e:
@@ -99,11 +98,11 @@ class LLMService:
         except Exception as e:
             raise RuntimeError(f"Erreur lors de la récupération de l'historique : {e}")
 
-    async def get_all_sessions(self, user_email: str) -> List[str]:
+    async def get_all_sessions(self, user_email: str, limit: int, cursor: Optional[Dict] = None) -> Dict:
         """
-        Récupère tous les IDs de session d'un utilisateur.
+        Récupère une page des sessions d'un utilisateur.
         """
         try:
-            return await self.mongo_service.get_all_sessions(user_email)
+            return await self.mongo_service.get_all_sessions(user_email, limit, cursor)
         except Exception as e:
             raise RuntimeError(f"Erreur lors de la récupération des sessions : {e}")
@@ -1,22 +1,60 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from models.conversation import Conversation, Message
 from models.response_models import ConversationResponse, MessageResponse
 from core.config import settings
-from bcrypt import hashpw, gensalt, checkpw
+from core.database import get_database
+from services.write_coalescer import TurnWriteCoalescer
+from services.password_hasher import get_password_hasher
+from services.pagination import page
+from services.stats_service import StatsService
+import asyncio
 import logging
 
+# Modes de stockage des messages (MESSAGE_STORAGE)
+EMBEDDED_STORAGE = "embedded"  # Tableau `messages` dans le document de conversation
+BUCKET_STORAGE = "buckets"  # Buckets de taille fixe dans la collection `message_buckets`
+
+DUPLICATE_KEY_ERROR = 11000
+BUCKET_APPEND_ATTEMPTS = 5  # Tentatives d'ajout au dernier bucket en cas d'écritures concurrentes
 
 
 class MongoService:
 
-    def __init__(self):
-        # Initialisation du client MongoDB et des collections
-        self.client = AsyncIOMotorClient(settings.mongodb_uri)
-        self.db = self.client[settings.database_name]
+    def __init__(self, db: Optional[AsyncIOMotorDatabase] = None):
+        # Collections sur le client MongoDB partagé de l'application
+        self.db = db if db is not None else get_database()
+        self.client = self.db.client
         self.conversations = self.db[settings.collection_name]
         self.admins = self.db["admins"]  # Nouvelle collection pour les administrateurs
+        self.message_buckets = self.db["message_buckets"]
+        self.bucket_size = settings.message_bucket_size
+        self.stats = StatsService(self.db)
+
+        # Regroupement optionnel des écritures de tours entre sessions concurrentes
+        self.turn_writer: Optional[TurnWriteCoalescer] = None
+        if settings.turn_write_coalescing:
+            self.turn_writer = TurnWriteCoalescer(
+                self.write_coalesced_turns,
+                max_batch_size=settings.turn_write_max_batch,
+                max_wait_ms=settings.turn_write_max_wait_ms
+            )
+
+    @property
+    def uses_buckets(self) -> bool:
+        return settings.message_storage == BUCKET_STORAGE
+
+    @property
+    def history_cursor_fields(self) -> Dict:
+        """
+        Champs du curseur de get_conversation_history et leurs conversions, selon le mode de stockage.
+        """
+        if self.uses_buckets:
+            return {"bucket": int, "offset": int}
+        return {"index": int}
 
     async def save_admin_key(self, admin_key: str) -> bool:
         """
@@ -29,12 +67,12 @@ class MongoService:
             return False
 
         # Hacher la clé administrateur
-        hashed_key = hashpw(admin_key.encode('utf-8'), gensalt())
+        hashed_key = await get_password_hasher().hash_key(admin_key)
 
         # Insérer l'administrateur dans la base de données
         admin_document = {
             "username": "admin",
-            "key_hash": hashed_key.decode('utf-8'),  # Stocker le hash de la clé
+            "key_hash": hashed_key,  # Stocker le hash de la clé
             "role": "admin",
             "created_at": datetime.utcnow()
         }
@@ -47,8 +85,7 @@ class MongoService:
         """
         admin = await self.admins.find_one({"username": "admin"})
         if admin:
-            stored_hash = admin["key_hash"].encode('utf-8')
-            return checkpw(admin_key.encode('utf-8'), stored_hash)
+            return await get_password_hasher().check_key(admin_key, admin["key_hash"])
         return False
 
     async def save_message(self, session_id: str, role: str, content: str) -> bool:
@@ -56,63 +93,349 @@ class MongoService:
         Sauvegarde un nouveau message dans une conversation existante ou crée une nouvelle conversation si elle n'existe pas.
         """
         message = Message(role=role, content=content)
+        return await self._append_messages(session_id, [message.model_dump()])
 
-        result = await self.conversations.update_one(
+    def _conversation_operation(self, session_id: str, messages: List[Dict], now: datetime) -> UpdateOne:
+        """
+        Écriture du document de conversation pour l'ajout de `messages` : les messages eux-mêmes
+        en mode embedded, seulement le compteur et la date de mise à jour en mode buckets.
+        """
+        if not self.uses_buckets:
+            return UpdateOne(
+                {"session_id": session_id},
+                {
+                    "$push": {"messages": {"$each": messages}},
+                    "$set": {"updated_at": now},
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
+            )
+        return UpdateOne(
             {"session_id": session_id},
             {
-                "$push": {"messages": message.model_dump()},
-                "$set": {"updated_at": datetime.utcnow()},
-                "$setOnInsert": {"created_at": datetime.utcnow()}
+                "$inc": {"message_count": len(messages)},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {"created_at": now}
             },
             upsert=True
         )
 
-        return result.modified_count > 0 or result.upserted_id is not None
+    def _bucket_operation(self, session_id: str, messages: List[Dict], now: datetime,
+                          latest: Optional[Tuple[int, int]]) -> UpdateOne:
+        """
+        Ajout de `messages` au dernier bucket de la session, `latest` = (seq, count), ou à un
+        nouveau bucket (seq + 1) s'il n'a plus assez de place. Si ce bucket a été rempli entre-temps
+        par une autre écriture, l'upsert viole l'index unique (session_id, seq) au lieu d'écrire
+        dans un bucket plus ancien.
+        """
+        seq, count = latest if latest is not None else (-1, self.bucket_size)
+        if count + len(messages) > self.bucket_size:
+            seq += 1
+        return UpdateOne(
+            {"session_id": session_id, "seq": seq, "count": {"$lte": self.bucket_size - len(messages)}},
+            {
+                "$push": {"messages": {"$each": messages}},
+                "$inc": {"count": len(messages)},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {"created_at": now}
+            },
+            upsert=True
+        )
 
-    async def get_conversation_history(self, session_id: str, user_email: str) -> List[Dict]:
-        conversation = await self.conversations.find_one({"session_id": session_id, "user_email": user_email})
-        if conversation:
-            # Convertir les timestamps en chaînes
-            for message in conversation.get("messages", []):
-                message["timestamp"] = self.format_datetime(message.get("timestamp"))
-            conversation["created_at"] = self.format_datetime(conversation.get("created_at"))
-            conversation["updated_at"] = self.format_datetime(conversation.get("updated_at"))
-            return conversation.get("messages", [])
-        return []
+    async def _latest_buckets(self, session_ids: List[str]) -> Dict[str, Tuple[int, int]]:
+        """
+        Numéro et remplissage du dernier bucket de chaque session qui en a un.
+        """
+        pipeline = [
+            {"$match": {"session_id": {"$in": session_ids}}},
+            {"$sort": {"session_id": 1, "seq": -1}},
+            {"$group": {"_id": "$session_id", "seq": {"$first": "$seq"}, "count": {"$first": "$count"}}},
+        ]
+        return {
+            bucket["_id"]: (bucket["seq"], bucket["count"])
+            async for bucket in self.message_buckets.aggregate(pipeline)
+        }
+
+    async def _write_buckets(self, appends: Dict[str, List[Dict]], now: datetime):
+        """
+        Ajoute les messages de chaque session à son dernier bucket, en un bulk_write. Les ajouts
+        rejetés parce qu'une écriture concurrente a rempli ou créé le bucket visé sont rejoués.
+        """
+        pending = appends
+        for _ in range(BUCKET_APPEND_ATTEMPTS):
+            latest = await self._latest_buckets(list(pending))
+            session_ids = list(pending)
+            operations = [
+                self._bucket_operation(session_id, pending[session_id], now, latest.get(session_id))
+                for session_id in session_ids
+            ]
+            try:
+                await self.message_buckets.bulk_write(operations, ordered=False)
+                return
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if not errors or any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                    raise
+                pending = {session_ids[error["index"]]: pending[session_ids[error["index"]]] for error in errors}
+        raise RuntimeError(f"Ajout des messages impossible après {BUCKET_APPEND_ATTEMPTS} tentatives : {list(pending)}")
+
+    async def _write_appends(self, appends: Dict[str, List[Dict]]) -> bool:
+        """
+        Ajoute des messages à plusieurs conversations ({session_id: messages}), en un
+        bulk_write par collection. En mode buckets, les messages sont écrits avant les
+        métadonnées des conversations : un échec entre les deux laisse des messages
+        sans mise à jour de updated_at, jamais une conversation datée d'un message absent.
+        """
+        now = datetime.utcnow()
+        if self.uses_buckets:
+            await self._write_buckets(appends, now)
+        operations = [self._conversation_operation(session_id, messages, now) for session_id, messages in appends.items()]
+        result = await self.conversations.bulk_write(operations, ordered=False)
+        return result.modified_count > 0 or result.upserted_count > 0
+
+    async def _append_messages(self, session_id: str, messages: List[Dict]) -> bool:
+        """
+        Ajoute des messages à une conversation selon le mode de stockage configuré.
+        En mode buckets, le document de conversation ne conserve que des métadonnées
+        et le coût d'un ajout ne dépend pas de la longueur de la conversation.
+        """
+        return await self._write_appends({session_id: messages})
+
+    async def save_turn(self, session_id: str, user_content: str, assistant_content: str,
+                        user_email: Optional[str] = None) -> bool:
+        """
+        Sauvegarde un tour de conversation (question et réponse) en une seule écriture :
+        les deux messages sont ajoutés ensemble ou pas du tout.
+        Si TURN_WRITE_COALESCING est activé, l'écriture est regroupée avec celles des autres sessions.
+        Les compteurs de statistiques (messages, tokens) sont incrémentés en parallèle.
+        """
+        messages = [
+            Message(role="user", content=user_content).model_dump(),
+            Message(role="assistant", content=assistant_content).model_dump()
+        ]
+        if self.turn_writer is not None:
+            write = self.turn_writer.append(session_id, messages)
+        else:
+            write = self._append_messages(session_id, messages)
+        saved, _ = await asyncio.gather(write, self.stats.record_turn(user_email, messages))
+        return saved
+
+    async def write_coalesced_turns(self, turns: List[Tuple[str, List[Dict]]]):
+        """
+        Écrit en un seul bulk_write par collection les tours de plusieurs sessions.
+        Les tours d'une même session sont fusionnés pour préserver leur ordre.
+        """
+        merged: Dict[str, List[Dict]] = {}
+        for session_id, messages in turns:
+            merged.setdefault(session_id, []).extend(messages)
+        await self._write_appends(merged)
+
+    async def get_recent_messages(self, session_id: str, limit: int) -> List[Dict]:
+        """
+        Retourne les `limit` derniers messages d'une conversation, dans l'ordre chronologique,
+        sans lire le reste de l'historique.
+        """
+        if not self.uses_buckets:
+            conversation = await self.conversations.find_one(
+                {"session_id": session_id}, {"messages": {"$slice": -limit}}
+            )
+            return conversation.get("messages", []) if conversation else []
+
+        # Un bucket supplémentaire couvre un bucket courant partiellement rempli
+        bucket_count = -(-limit // self.bucket_size) + 1
+        cursor = self.message_buckets.find({"session_id": session_id}, {"messages": 1}) \
+            .sort("seq", -1).limit(bucket_count)
+        buckets = await cursor.to_list(length=bucket_count)
+        messages = [message for bucket in reversed(buckets) for message in bucket.get("messages", [])]
+        messages.sort(key=lambda message: message["timestamp"])
+        return messages[-limit:]
+
+    async def get_messages(self, session_id: str) -> List[Dict]:
+        """
+        Retourne tous les messages d'une conversation, dans l'ordre chronologique.
+        """
+        if not self.uses_buckets:
+            conversation = await self.conversations.find_one({"session_id": session_id}, {"messages": 1})
+            return conversation.get("messages", []) if conversation else []
+
+        cursor = self.message_buckets.find({"session_id": session_id}, {"messages": 1}).sort("seq", 1)
+        messages = [message async for bucket in cursor for message in bucket.get("messages", [])]
+        messages.sort(key=lambda message: message["timestamp"])
+        return messages
+
+    async def get_messages_between(self, session_id: str, after: Optional[datetime],
+                                   before: Optional[datetime]) -> List[Dict]:
+        """
+        Retourne, dans l'ordre chronologique, les messages d'une conversation postérieurs à
+        `after` et antérieurs à `before` (bornes exclues, absentes si None).
+        """
+        if not self.uses_buckets:
+            conditions = []
+            if after is not None:
+                conditions.append({"$gt": ["$$message.timestamp", after]})
+            if before is not None:
+                conditions.append({"$lt": ["$$message.timestamp", before]})
+            pipeline = [
+                {"$match": {"session_id": session_id}},
+                {"$project": {"_id": 0, "messages": {"$filter": {
+                    "input": {"$ifNull": ["$messages", []]}, "as": "message", "cond": {"$and": conditions}
+                }}}},
+            ]
+            result = await self.conversations.aggregate(pipeline).to_list(length=1)
+            return result[0]["messages"] if result else []
+
+        # Un bucket modifié avant `after` ne contient que des messages déjà antérieurs
+        query = {"session_id": session_id}
+        if after is not None:
+            query["updated_at"] = {"$gt": after}
+        cursor = self.message_buckets.find(query, {"messages": 1}).sort("seq", 1)
+        messages = [
+            message async for bucket in cursor for message in bucket.get("messages", [])
+            if (after is None or message["timestamp"] > after) and (before is None or message["timestamp"] < before)
+        ]
+        messages.sort(key=lambda message: message["timestamp"])
+        return messages
+
+    async def save_summary(self, session_id: str, summary: str, summary_until: datetime) -> bool:
+        """
+        Enregistre le résumé courant d'une conversation et l'horodatage du dernier message résumé.
+        """
+        result = await self.conversations.update_one(
+            {"session_id": session_id},
+            {"$set": {"summary": summary, "summary_until": summary_until}}
+        )
+        return result.modified_count > 0
+
+    async def get_messages_page(self, session_id: str, limit: int, before: Optional[Dict] = None) -> Tuple[List[Dict], Optional[Dict]]:
+        """
+        Retourne au plus `limit` messages, dans l'ordre chronologique, précédant la
+        position `before` (les plus récents si `before` est absent), ainsi que la
+        position à utiliser pour la page plus ancienne (None au début de la conversation).
+        """
+        if not self.uses_buckets:
+            # Les messages ne sont jamais retirés du tableau : leur index est une clé stable
+            if before is None:
+                messages = {"$slice": ["$messages", -limit]}
+            else:
+                start = max(0, before["index"] - limit)
+                messages = {"$slice": ["$messages", start, max(1, before["index"] - start)]}
+            pipeline = [
+                {"$match": {"session_id": session_id}},
+                {"$project": {"_id": 0, "total": {"$size": {"$ifNull": ["$messages", []]}}, "messages": messages}},
+            ]
+            result = await self.conversations.aggregate(pipeline).to_list(length=1)
+            if not result:
+                return [], None
+            end = result[0]["total"] if before is None else min(before["index"], result[0]["total"])
+            window = (result[0].get("messages") or []) if end > 0 else []
+            first_index = end - len(window)
+            return window, ({"index": first_index} if first_index > 0 else None)
+
+        # Mode buckets : position = (numéro du bucket, nombre de messages restant à lire dans ce bucket)
+        query = {"session_id": session_id}
+        if before is not None:
+            query["seq"] = {"$lte": before["bucket"]}
+        batch = -(-limit // max(self.bucket_size - 1, 1)) + 2
+        cursor = self.message_buckets.find(query, {"seq": 1, "messages": 1}).sort("seq", -1).batch_size(batch)
+        window: List[Dict] = []
+        next_position = None
+        async for bucket in cursor:
+            messages = bucket.get("messages", [])
+            if len(window) >= limit:
+                # Page complète : la suite commence à la fin de ce bucket plus ancien
+                next_position = {"bucket": bucket["seq"], "offset": len(messages)}
+                break
+            end = before["offset"] if before is not None and bucket["seq"] == before["bucket"] else len(messages)
+            start = max(0, end - (limit - len(window)))
+            window[:0] = messages[start:end]
+            if start > 0:
+                next_position = {"bucket": bucket["seq"], "offset": start}
+                break
+        return window, next_position
+
+    async def get_conversation_history(self, session_id: str, user_email: str, limit: int,
+                                       cursor: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Page de l'historique d'une conversation appartenant à l'utilisateur : les messages
+        les plus récents d'abord, le curseur renvoyé donnant accès aux messages plus anciens.
+        Retourne None si la session n'existe pas.
+        """
+        session = await self.get_session(session_id, user_email, include_messages=False)
+        if not session:
+            return None
+        messages, before = await self.get_messages_page(session_id, limit, cursor)
+        return page(messages, before)
 
     async def delete_conversation(self, session_id: str, user_email: str) -> bool:
         """
         Supprime une conversation appartenant à un utilisateur.
         """
         result = await self.conversations.delete_one({"session_id": session_id, "user_email": user_email})
+        if result.deleted_count > 0:
+            await asyncio.gather(
+                self.message_buckets.delete_many({"session_id": session_id}),
+                self.stats.record_session_deleted(user_email)
+            )
         return result.deleted_count > 0
 
-    async def get_all_sessions(self, user_email: str) -> List[str]:
+    async def get_all_sessions(self, user_email: str, limit: int, cursor: Optional[Dict] = None) -> Dict:
         """
-        Récupère tous les IDs de session d'un utilisateur.
+        Page des sessions d'un utilisateur, les plus récemment créées d'abord
+        (identifiant, nom et dates), suivant l'_id du curseur. La clé de tri est immuable :
+        trier sur updated_at ferait sauter ou répéter entre deux pages une session
+        modifiée pendant le parcours (et les anciennes sessions n'ont pas toutes ce champ).
         """
-        cursor = self.conversations.find({"user_email": user_email}, {"session_id": 1})
-        sessions = await cursor.to_list(length=None)
-        return [session["session_id"] for session in sessions]
+        query: Dict = {"user_email": user_email}
+        if cursor:
+            query["_id"] = {"$lt": cursor["id"]}
+        projection = {"session_id": 1, "session_name": 1, "created_at": 1, "updated_at": 1}
+        sessions = await self.conversations.find(query, projection) \
+            .sort("_id", -1).limit(limit + 1).to_list(length=limit + 1)
+
+        next_cursor = None
+        if len(sessions) > limit:
+            sessions = sessions[:limit]
+            last = sessions[-1]
+            next_cursor = {"id": str(last["_id"])}
+        items = [
+            {
+                "session_id": session["session_id"],
+                "session_name": session.get("session_name"),
+                "created_at": self.format_datetime(session.get("created_at")),
+                "updated_at": self.format_datetime(session.get("updated_at")),
+            }
+            for session in sessions
+        ]
+        return page(items, next_cursor)
 
-    async def get_session(self, session_id: str, user_email: str) -> Optional[Dict]:
+    async def get_session(self, session_id: str, user_email: str, include_messages: bool = True) -> Optional[Dict]:
         """
         Récupère une session spécifique si elle appartient à l'utilisateur.
+        Avec `include_messages=False`, seules les métadonnées de la session sont lues.
         """
-        return await self.conversations.find_one({"session_id": session_id, "user_email": user_email})
+        projection = None if include_messages and not self.uses_buckets else {"messages": 0}
+        session = await self.conversations.find_one({"session_id": session_id, "user_email": user_email}, projection)
+        if session and include_messages and self.uses_buckets:
+            session["messages"] = await self.get_messages(session_id)
+        return session
 
     async def create_new_session(self, session_id: str, user_email: str) -> bool:
         """
         Crée une nouvelle session pour l'utilisateur.
         """
         try:
-            result = await self.conversations.insert_one({
+            session = {
                 "session_id": session_id,
                 "user_email": user_email,
-                "messages": [],
                 "created_at": datetime.utcnow(),
                 "updated_at": datetime.utcnow()
-            })
+            }
+            if self.uses_buckets:
+                session["message_count"] = 0
+            else:
+                session["messages"] = []
+            result = await self.conversations.insert_one(session)
+            await self.stats.record_session_created(user_email, session["created_at"])
             return result.inserted_id is not None
         except Exception as e:
             raise RuntimeError(f"Erreur lors de la création de la session : {e}")
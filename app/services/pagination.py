@@ -0,0 +1,52 @@
+# app/services/pagination.py
+"""
+Pagination par clé (keyset) : les pages sont repérées par un curseur opaque
+contenant la clé de tri du dernier élément renvoyé, et non par un décalage.
+"""
+from typing import Any, Callable, Dict, List, Optional
+from fastapi import HTTPException
+from core.config import settings
+import base64
+import json
+
+
+def page_limit(limit: Optional[int]) -> int:
+    """
+    Taille de page demandée, bornée à [1, MAX_PAGE_SIZE].
+    """
+    if limit is None:
+        return settings.default_page_size
+    return max(1, min(limit, settings.max_page_size))
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """
+    Encode la position d'une page (valeurs JSON) en un curseur opaque.
+    """
+    data = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], **fields: Callable[[Any], Any]) -> Optional[Dict[str, Any]]:
+    """
+    Décode un curseur reçu d'un client ; chaque champ attendu est converti par la
+    fonction associée (ObjectId, datetime.fromisoformat...). Lève une 400 si le
+    curseur est invalide.
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return {name: convert(values[name]) for name, convert in fields.items()}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page(items: List[Any], next_cursor: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Réponse paginée : les éléments et le curseur de la page suivante (None à la fin).
+    """
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(next_cursor) if next_cursor else None,
+    }
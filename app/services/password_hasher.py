@@ -0,0 +1,128 @@
+# app/services/password_hasher.py
+"""
+Hachage et vérification bcrypt hors de la boucle d'événements.
+
+bcrypt coûte volontairement plusieurs centaines de millisecondes de CPU : les
+appels sont exécutés par un pool de threads borné, et le nombre d'opérations en
+attente est limité pour qu'une rafale de connexions ne sature pas le processus.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from core.config import settings
+import asyncio
+import bcrypt
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Contexte passlib utilisé pour les mots de passe des utilisateurs
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasher:
+    """
+    Exécute les opérations bcrypt dans `max_workers` threads, avec au plus
+    `max_pending` opérations admises (en cours ou en file d'attente).
+    """
+    def __init__(self, max_workers: int = 2, max_pending: int = 64):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    def _timed(self, func: Callable[..., T], submitted_at: float, *args) -> T:
+        started_at = time.perf_counter()
+        with self._lock:
+            self.running += 1
+            wait = started_at - submitted_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.total_run += time.perf_counter() - started_at
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """
+        Exécute `func(*args)` dans le pool. Lève une 503 si trop d'opérations sont déjà en attente.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                logger.warning(f"File bcrypt pleine ({self.pending} opérations), requête refusée.")
+                raise HTTPException(status_code=503, detail="Server busy, please retry")
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, func, time.perf_counter(), *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self.run(pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(pwd_context.verify, plain_password, hashed_password)
+
+    async def hash_key(self, key: str) -> str:
+        """
+        Hash bcrypt brut d'une clé (clés administrateur).
+        """
+        return await self.run(lambda: bcrypt.hashpw(key.encode("utf-8"), bcrypt.gensalt()).decode("utf-8"))
+
+    async def check_key(self, key: str, key_hash: str) -> bool:
+        return await self.run(lambda: bcrypt.checkpw(key.encode("utf-8"), key_hash.encode("utf-8")))
+
+    async def verify_admin_key(self, admin_key: str) -> bool:
+        """
+        Compare une clé à la clé administrateur de la configuration ; le hash
+        éventuellement calculé au premier appel l'est aussi dans le pool.
+        """
+        return await self.run(
+            lambda: bcrypt.checkpw(admin_key.encode("utf-8"), settings.admin_key_hash.encode("utf-8"))
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": self.total_wait / self.completed * 1000 if self.completed else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+                "avg_run_ms": self.total_run / self.completed * 1000 if self.completed else 0.0,
+            }
+
+
+_password_hasher: Optional[PasswordHasher] = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    """
+    Pool bcrypt partagé du processus.
+    """
+    global _password_hasher
+    if _password_hasher is None:
+        _password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_max_pending)
+    return _password_hasher
@@ -0,0 +1,266 @@
+# app/services/pdf_ingestion.py
+"""
+Ingestion de PDF en flux, à mémoire bornée.
+
+Le fichier reçu est écrit sur disque par morceaux, puis trois étapes s'enchaînent
+par des files bornées (une étape rapide attend que la suivante ait consommé) :
+1. extraction des pages par lots, dans un thread dédié (PyMuPDF), et découpage
+   en chunks de CHUNK_TARGET_TOKENS tokens (services/chunker.py) ;
+2. encodage des textes par lots de taille fixe, dans un processus du pool d'encodage ;
+3. écriture des chunks dans MongoDB par insert_many.
+Seuls quelques lots sont en mémoire à un instant donné, quelle que soit la taille du PDF.
+Les chunks sont d'abord écrits dans une collection d'attente (PDF_CHUNKS_STAGING_COLLECTION),
+marqués par l'identifiant de l'ingestion ; ils ne remplacent la version précédente du
+document qu'une fois l'ingestion terminée. Un échec ou une annulation laisse donc
+l'ancienne version en place.
+L'ingestion ne charge pas l'index FAISS : les processus de l'API indexent les nouveaux
+chunks, et retirent ceux inscrits au journal des suppressions (PDF_CHUNK_DELETIONS_COLLECTION),
+lors de leur rattrapage (VectorSearchService.refresh).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+from fastapi import UploadFile
+from core.config import settings
+from services.chunker import chunk_page
+from services.embedding_worker import encode_texts, get_embedding_pool
+from core.database import get_database
+from bson import ObjectId
+from datetime import datetime
+import asyncio
+import fitz  # PyMuPDF
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Marque la fin d'une file
+_DONE = object()
+
+
+@dataclass
+class IngestionProgress:
+    """
+    Avancement d'une ingestion, mis à jour par les étapes du pipeline.
+    """
+    total_pages: Optional[int] = None
+    pages_done: int = 0
+    chunks_embedded: int = 0
+    chunks_stored: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def as_dict(self) -> Dict:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "total_pages": self.total_pages,
+            "pages_done": self.pages_done,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_stored": self.chunks_stored,
+            "elapsed_s": round(elapsed, 2),
+            "chunks_per_s": round(self.chunks_embedded / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+async def spool_upload(file: UploadFile, destination: str) -> int:
+    """
+    Écrit le fichier reçu sur disque par morceaux de INGESTION_SPOOL_CHUNK_SIZE octets.
+    Le fichier n'apparaît à `destination` qu'une fois complet. Retourne sa taille.
+    """
+    partial = f"{destination}.part"
+    size = 0
+    try:
+        with open(partial, "wb") as f:
+            while True:
+                data = await file.read(settings.ingestion_spool_chunk_size)
+                if not data:
+                    break
+                await asyncio.to_thread(f.write, data)
+                size += len(data)
+        os.replace(partial, destination)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return size
+
+
+def _read_pages(document, start: int, count: int) -> List[Dict]:
+    """
+    Extrait et découpe le texte des pages [start, start + count) ; les pages vides sont ignorées.
+    """
+    chunks = []
+    for page_number in range(start, min(start + count, len(document))):
+        chunks.extend(chunk_page(page_number + 1, document.load_page(page_number).get_text("text")))
+    return chunks
+
+
+async def _run_stages(*stages):
+    """
+    Exécute les étapes en parallèle ; si l'une échoue (ou si l'appelant est annulé),
+    les autres sont annulées.
+    """
+    tasks = [asyncio.create_task(stage) for stage in stages]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _publish(database, file_name: str, ingestion_id: str):
+    """
+    Remplace les chunks du document par ceux de l'ingestion `ingestion_id`. Les nouveaux
+    chunks sont d'abord copiés par lots depuis la collection d'attente, avec de nouveaux `_id`
+    supérieurs au dernier chunk indexé ; les anciens ne sont retirés qu'ensuite, par `_id` :
+    le document reste toujours consultable. Chaque lot retiré est inscrit au journal des
+    suppressions avant de quitter MongoDB, et les processus de l'API l'appliquent à leur
+    index lors du rattrapage (VectorSearchService.refresh), sans reconstruction complète.
+    """
+    chunks_collection = database[settings.pdf_chunks_collection]
+    staging_collection = database[settings.pdf_chunks_staging_collection]
+    deletions_collection = database[settings.pdf_chunk_deletions_collection]
+    old_ids = [chunk["_id"] async for chunk in chunks_collection.find({"file_name": file_name}, {"_id": 1})]
+
+    batch: List[Dict] = []
+    cursor = staging_collection.find(
+        {"ingestion_id": ingestion_id}, {"_id": 0, "ingestion_id": 0}, batch_size=settings.ingestion_batch_size
+    ).sort("_id", 1)
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= settings.ingestion_batch_size:
+            await chunks_collection.insert_many(batch)
+            batch = []
+    if batch:
+        await chunks_collection.insert_many(batch)
+
+    for start in range(0, len(old_ids), settings.index_load_batch_size):
+        chunk_ids = old_ids[start:start + settings.index_load_batch_size]
+        await deletions_collection.insert_one({"file_name": file_name, "chunk_ids": chunk_ids, "at": datetime.utcnow()})
+        await chunks_collection.delete_many({"_id": {"$in": chunk_ids}})
+    await staging_collection.delete_many({"ingestion_id": ingestion_id})
+
+
+async def _ingest(file_name: str, ingestion_id: str, read_chunks: Callable[..., Awaitable[None]],
+                  progress: Optional[IngestionProgress], on_progress: Optional[Callable[[IngestionProgress], None]]) -> int:
+    """
+    Pipeline commun : `read_chunks(put, progress, notify)` transmet les chunks par lots
+    de INGESTION_BATCH_SIZE à `put`, qui attend que l'encodage suive. Les chunks sont
+    écrits dans la collection d'attente sous `ingestion_id`, puis publiés en cas de succès.
+    """
+    progress = progress or IngestionProgress()
+    loop = asyncio.get_running_loop()
+    database = get_database()
+    staging_collection = database[settings.pdf_chunks_staging_collection]
+    embedding_pool = get_embedding_pool(
+        settings.embedding_model_name, settings.ingestion_embed_workers, settings.encoder_backend
+    )
+    texts_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.ingestion_queue_size)
+    documents_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.ingestion_queue_size)
+
+    def notify():
+        if on_progress is not None:
+            on_progress(progress)
+
+    # Une tentative précédente du même travail a pu laisser des chunks en attente
+    await staging_collection.delete_many({"ingestion_id": ingestion_id})
+
+    async def extract():
+        await read_chunks(texts_queue.put, progress, notify)
+        await texts_queue.put(_DONE)
+
+    async def embed():
+        while (chunks := await texts_queue.get()) is not _DONE:
+            vectors = await loop.run_in_executor(embedding_pool, encode_texts, [chunk["text"] for chunk in chunks])
+            documents = [
+                {"file_name": file_name, **chunk, "vector": vector.tolist(), "ingestion_id": ingestion_id}
+                for chunk, vector in zip(chunks, vectors)
+            ]
+            progress.chunks_embedded += len(documents)
+            notify()
+            await documents_queue.put(documents)
+        await documents_queue.put(_DONE)
+
+    async def store():
+        while (documents := await documents_queue.get()) is not _DONE:
+            result = await staging_collection.insert_many(documents, ordered=False)
+            progress.chunks_stored += len(result.inserted_ids)
+            notify()
+
+    try:
+        await _run_stages(extract(), embed(), store())
+    except BaseException:
+        # La version précédente du document reste en place
+        try:
+            await asyncio.shield(staging_collection.delete_many({"ingestion_id": ingestion_id}))
+        except BaseException as e:
+            logger.warning(f"Chunks en attente de {file_name} non supprimés : {e}")
+        raise
+    # Une fois commencée, la publication va à son terme même si l'ingestion est annulée
+    await asyncio.shield(_publish(database, file_name, ingestion_id))
+    logger.info(f"Document {file_name} enregistré : {progress.as_dict()}")
+    return progress.chunks_stored
+
+
+async def ingest_pdf(path: str, file_name: str, progress: Optional[IngestionProgress] = None,
+                     on_progress: Optional[Callable[[IngestionProgress], None]] = None,
+                     ingestion_id: Optional[str] = None) -> int:
+    """
+    Extrait, découpe, vectorise et enregistre un PDF déjà présent sur disque. Les chunks d'une
+    version précédente du fichier ne sont remplacés qu'en cas de succès. `ingestion_id`
+    (un nouvel identifiant par défaut) marque les chunks en attente. Retourne le nombre de chunks enregistrés.
+    """
+    loop = asyncio.get_running_loop()
+    batch_size = settings.ingestion_batch_size
+
+    async def read_chunks(put, progress: IngestionProgress, notify):
+        # PyMuPDF n'est pas thread-safe : toutes les lectures passent par le même thread
+        reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-reader")
+        try:
+            document = await loop.run_in_executor(reader, fitz.open, path)
+            try:
+                progress.total_pages = len(document)
+                pending: List[Dict] = []
+                for start in range(0, progress.total_pages, batch_size):
+                    pending.extend(await loop.run_in_executor(reader, _read_pages, document, start, batch_size))
+                    progress.pages_done = min(start + batch_size, progress.total_pages)
+                    while len(pending) >= batch_size:
+                        await put(pending[:batch_size])
+                        pending = pending[batch_size:]
+                    notify()
+                if pending:
+                    await put(pending)
+            finally:
+                await loop.run_in_executor(reader, document.close)
+        finally:
+            # Sans attendre : une annulation ne doit pas bloquer la boucle d'événements
+            reader.shutdown(wait=False)
+
+    return await _ingest(file_name, ingestion_id or str(ObjectId()), read_chunks, progress, on_progress)
+
+
+async def ingest_pages(pages: List[Dict], file_name: str, progress: Optional[IngestionProgress] = None,
+                       ingestion_id: Optional[str] = None) -> int:
+    """
+    Redécoupe et réindexe un document à partir du texte de ses pages
+    ({"page_number", "text"}), lorsque le PDF d'origine n'est plus disponible.
+    """
+    batch_size = settings.ingestion_batch_size
+
+    async def read_chunks(put, progress: IngestionProgress, notify):
+        progress.total_pages = len(pages)
+        pending: List[Dict] = []
+        for page in pages:
+            pending.extend(await asyncio.to_thread(chunk_page, page["page_number"], page["text"]))
+            progress.pages_done += 1
+            while len(pending) >= batch_size:
+                await put(pending[:batch_size])
+                pending = pending[batch_size:]
+        if pending:
+            await put(pending)
+        notify()
+
+    return await _ingest(file_name, ingestion_id or str(ObjectId()), read_chunks, progress, None)
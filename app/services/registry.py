@@ -0,0 +1,55 @@
+# app/services/registry.py
+"""
+Registre des ressources partagées à l'échelle du processus.
+
+Le modèle d'embedding et l'index vectoriel sont coûteux à charger : une seule
+instance de chaque est créée par processus et réutilisée par tous les routers.
+"""
+import threading
+import logging
+from typing import Optional
+from core.config import settings
+from core.database import get_sync_client
+from services.encoders import load_encoder
+from services.vector_search_service import VectorSearchService
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_embedding_model = None
+_vector_search_service: Optional[VectorSearchService] = None
+
+
+def get_embedding_model():
+    """
+    Retourne l'encodeur partagé (backend ENCODER_BACKEND), chargé au premier appel.
+    """
+    global _embedding_model
+    if _embedding_model is None:
+        with _lock:
+            if _embedding_model is None:
+                logger.info(
+                    f"Chargement du modèle d'embedding partagé : {settings.embedding_model_name} ({settings.encoder_backend})"
+                )
+                _embedding_model = load_encoder()
+    return _embedding_model
+
+
+def get_vector_search_service() -> VectorSearchService:
+    """
+    Retourne le service de recherche vectorielle partagé, construit au premier appel.
+    """
+    global _vector_search_service
+    if _vector_search_service is None:
+        embeddings = get_embedding_model()
+        with _lock:
+            if _vector_search_service is None:
+                _vector_search_service = VectorSearchService(
+                    mongo_uri=settings.mongodb_uri,
+                    db_name=settings.database_name,
+                    collection_name=settings.pdf_chunks_collection,
+                    embedding_model_name=settings.embedding_model_name,
+                    embeddings=embeddings,
+                    client=get_sync_client()
+                )
+    return _vector_search_service
@@ -0,0 +1,217 @@
+# app/services/stats_service.py
+"""
+Statistiques d'administration pré-agrégées.
+
+Les compteurs sont incrémentés au fil des événements (inscription, création ou
+suppression de session, tour de conversation) dans deux petites collections :
+- `stats_daily` : un document par jour (inscriptions, sessions, messages, tokens) ;
+- `stats_users` : un document par utilisateur (sessions existantes, messages, tokens).
+Les tableaux de bord lisent ces compteurs au lieu d'agréger `users` et `conversations`.
+`rebuild` les recalcule entièrement (script rebuild_stats.py) ; `maintain_stats`, lancé
+par le lifespan, le fait au démarrage si les compteurs sont vides (données antérieures
+aux compteurs) puis, si STATS_COMPACTION_INTERVAL est défini, périodiquement.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from core.config import settings
+from core.database import get_database
+from services.tokens import count_tokens
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("signups", "sessions", "messages", "tokens")
+
+# Durée maximale d'un recalcul : un seul processus recalcule à la fois
+REBUILD_LEASE = timedelta(hours=1)
+
+
+def day_key(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d")
+
+
+class StatsService:
+
+    def __init__(self, db: Optional[AsyncIOMotorDatabase] = None):
+        self.db = db if db is not None else get_database()
+        self.daily = self.db["stats_daily"]
+        self.users = self.db["stats_users"]
+        self.meta = self.db["stats_meta"]
+
+    async def _increment(self, when: datetime, daily: Dict[str, int], user_email: Optional[str] = None,
+                         per_user: Optional[Dict[str, int]] = None):
+        """
+        Incrémente les compteurs du jour et, le cas échéant, ceux de l'utilisateur.
+        Un échec est journalisé sans faire échouer l'opération à l'origine de l'événement.
+        """
+        writes = []
+        if daily:
+            writes.append(self.daily.update_one({"_id": day_key(when)}, {"$inc": daily}, upsert=True))
+        if user_email and per_user:
+            writes.append(self.users.update_one(
+                {"_id": user_email}, {"$inc": per_user, "$set": {"updated_at": when}}, upsert=True
+            ))
+        try:
+            await asyncio.gather(*writes)
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise à jour des statistiques : {e}")
+
+    async def record_signup(self, created_at: datetime):
+        await self._increment(created_at, {"signups": 1})
+
+    async def record_session_created(self, user_email: str, created_at: datetime):
+        await self._increment(created_at, {"sessions": 1}, user_email, {"sessions": 1})
+
+    async def record_session_deleted(self, user_email: str):
+        # Les sessions créées dans la journée restent comptées ; seul le total par utilisateur diminue
+        await self._increment(datetime.utcnow(), {}, user_email, {"sessions": -1})
+
+    async def record_turn(self, user_email: Optional[str], messages: List[Dict]):
+        # Le comptage des tokens (tokenizer) est fait hors de la boucle d'événements
+        tokens = await asyncio.to_thread(lambda: sum(count_tokens(message["content"]) for message in messages))
+        counters = {"messages": len(messages), "tokens": tokens}
+        await self._increment(messages[-1]["timestamp"], counters, user_email, counters)
+
+    async def get_daily(self, counter: str, days: int) -> List[Dict]:
+        """
+        Valeurs non nulles de `counter` pour les `days` derniers jours, par date croissante.
+        """
+        start = day_key(datetime.utcnow() - timedelta(days=days))
+        cursor = self.daily.find({"_id": {"$gte": start}, counter: {"$gt": 0}}, {counter: 1}).sort("_id", 1)
+        return [{"date": stat["_id"], "count": stat[counter]} async for stat in cursor]
+
+    async def get_activity(self, days: int) -> List[Dict]:
+        """
+        Tous les compteurs des `days` derniers jours, par date croissante.
+        """
+        start = day_key(datetime.utcnow() - timedelta(days=days))
+        cursor = self.daily.find({"_id": {"$gte": start}}).sort("_id", 1)
+        return [
+            {"date": stat["_id"], **{counter: stat.get(counter, 0) for counter in COUNTERS}}
+            async for stat in cursor
+        ]
+
+    async def get_per_user(self, counter: str) -> List[Dict]:
+        """
+        Valeurs non nulles de `counter` par utilisateur, triées par email.
+        """
+        cursor = self.users.find({counter: {"$gt": 0}}, {counter: 1}).sort("_id", 1)
+        return [{"user_email": stat["_id"], "count": stat[counter]} async for stat in cursor]
+
+    async def rebuild(self) -> Dict[str, int]:
+        """
+        Recalcule tous les compteurs à partir de `users`, des conversations et des buckets
+        de messages, dans des collections temporaires qui remplacent ensuite les collections
+        de statistiques. Les événements survenus pendant le recalcul peuvent être perdus :
+        à lancer en période creuse.
+        """
+        daily: Dict[str, Dict[str, int]] = {}
+        per_user: Dict[str, Dict[str, int]] = {}
+
+        def add(table, key, counter, value):
+            if key:
+                entry = table.setdefault(key, dict.fromkeys(COUNTERS, 0))
+                entry[counter] += value
+
+        async for user in self.db["users"].find({"created_at": {"$exists": True}}, {"created_at": 1}):
+            add(daily, day_key(user["created_at"]), "signups", 1)
+
+        owners: Dict[str, str] = {}
+        conversations = self.db[settings.collection_name]
+        async for conversation in conversations.find({}, {"session_id": 1, "user_email": 1, "created_at": 1, "messages": 1}):
+            user_email = conversation.get("user_email")
+            owners[conversation["session_id"]] = user_email
+            if user_email and conversation.get("created_at"):
+                add(daily, day_key(conversation["created_at"]), "sessions", 1)
+                add(per_user, user_email, "sessions", 1)
+            if conversation.get("messages"):
+                await asyncio.to_thread(
+                    self._add_messages, add, daily, per_user, user_email, conversation["messages"]
+                )
+
+        async for bucket in self.db["message_buckets"].find({}, {"session_id": 1, "messages": 1}):
+            if bucket.get("messages"):
+                await asyncio.to_thread(
+                    self._add_messages, add, daily, per_user, owners.get(bucket["session_id"]), bucket["messages"]
+                )
+
+        await self._replace(self.daily, daily)
+        await self._replace(self.users, per_user)
+        logger.info(f"Statistiques recalculées : {len(daily)} jours, {len(per_user)} utilisateurs.")
+        return {"days": len(daily), "users": len(per_user)}
+
+    @staticmethod
+    def _add_messages(add, daily, per_user, user_email, messages):
+        for message in messages:
+            tokens = count_tokens(message.get("content", ""))
+            if message.get("timestamp"):
+                add(daily, day_key(message["timestamp"]), "messages", 1)
+                add(daily, day_key(message["timestamp"]), "tokens", tokens)
+            add(per_user, user_email, "messages", 1)
+            add(per_user, user_email, "tokens", tokens)
+
+    async def _acquire_rebuild(self) -> bool:
+        """
+        Réserve le recalcul pour REBUILD_LEASE ; False si un autre processus le fait déjà.
+        """
+        now = datetime.utcnow()
+        try:
+            await self.meta.update_one(
+                {"_id": "rebuild", "until": {"$lt": now}}, {"$set": {"until": now + REBUILD_LEASE}}, upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def _release_rebuild(self):
+        await self.meta.delete_one({"_id": "rebuild"})
+
+    async def rebuild_if_needed(self, force: bool = False) -> Optional[Dict[str, int]]:
+        """
+        Recalcule les compteurs s'ils sont vides (ou si `force`), sauf si un autre
+        processus est déjà en train de le faire. Retourne None si rien n'a été recalculé.
+        """
+        if not force and await self.daily.find_one({}, {"_id": 1}) is not None:
+            return None
+        if not await self._acquire_rebuild():
+            return None
+        try:
+            return await self.rebuild()
+        finally:
+            await self._release_rebuild()
+
+    async def _replace(self, collection, counters: Dict[str, Dict[str, int]]):
+        """
+        Écrit les compteurs dans une collection temporaire puis la renomme à la place de `collection`.
+        """
+        staging = self.db[f"{collection.name}_rebuild"]
+        await staging.drop()
+        operations = [ReplaceOne({"_id": key}, values, upsert=True) for key, values in counters.items()]
+        for start in range(0, len(operations), 1000):
+            await staging.bulk_write(operations[start:start + 1000], ordered=False)
+        if operations:
+            await staging.rename(collection.name, dropTarget=True)
+        else:
+            await collection.drop()
+
+
+async def maintain_stats(stats: StatsService, backfill: bool, interval_hours: float):
+    """
+    Tâche de fond du lifespan : recalcul des compteurs au démarrage s'ils sont vides,
+    puis toutes les `interval_hours` heures (compaction) si l'intervalle est positif.
+    """
+    force = False
+    while True:
+        if backfill or force:
+            try:
+                await stats.rebuild_if_needed(force=force)
+            except Exception as e:
+                logger.error(f"Erreur lors du recalcul des statistiques : {e}")
+        if interval_hours <= 0:
+            return
+        await asyncio.sleep(interval_hours * 3600)
+        force = True
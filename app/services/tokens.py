@@ -0,0 +1,50 @@
+# app/services/tokens.py
+"""
+Comptage approximatif des tokens pour le budget des prompts.
+"""
+from functools import lru_cache
+from typing import Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Surcoût de formatage d'un message de chat (rôle, séparateurs)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken indisponible, estimation approximative des tokens : {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Nombre de tokens de `text` (encodage cl100k_base, ou estimation à 4 caractères par token).
+    """
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_history(history: List[Dict], budget: int):
+    """
+    Sépare l'historique en (messages plus anciens, messages récents tenant dans `budget` tokens).
+    Les messages récents sont conservés dans l'ordre chronologique.
+    """
+    used = 0
+    start = len(history)
+    for position in range(len(history) - 1, -1, -1):
+        cost = count_tokens(history[position].get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+        if used + cost > budget:
+            break
+        used += cost
+        start = position
+    return history[:start], history[start:]
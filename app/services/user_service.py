@@ -1,40 +1,53 @@
 # app/services/user_service.py
-from motor.motor_asyncio import AsyncIOMotorClient
-from passlib.context import CryptContext
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.user import User, UserCreate
 from core.config import settings
-from datetime import datetime, timedelta
-from typing import Optional
-from typing import Optional, List, Dict  # Ajout de l'importation manquante
+from core.database import get_database
+from services.cache import TTLCache, MISSING
+from services.password_hasher import get_password_hasher
+from services.stats_service import StatsService
+from datetime import datetime
+from typing import Optional, List, Dict
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from typing import List
+import time
 import logging
 
-# Initialisation du contexte de hachage
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Configuration de l'OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Utilisateurs résolus à partir des tokens, relus en base après `auth_cache_ttl` secondes
+principal_cache = TTLCache(settings.auth_cache_size, settings.auth_cache_ttl)
+
+# Le cache est propre à chaque processus : un blocage ou une suppression est aussi enregistré
+# dans la collection `auth_invalidations`, relue par chaque processus au plus toutes les
+# AUTH_INVALIDATION_POLL_INTERVAL secondes. Les invalidations sont relues avec une marge
+# couvrant le décalage d'horloge entre serveurs (retirer deux fois un utilisateur est sans effet).
+INVALIDATION_CLOCK_MARGIN = 5.0
+_invalidations_checked_at = 0.0  # time.monotonic() de la dernière relecture
+_invalidations_since = time.time()  # Horodatage à partir duquel relire les invalidations
+
 # Configuration du logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class UserService:
-    def __init__(self):
-        self.client = AsyncIOMotorClient(settings.mongodb_uri)
-        self.db = self.client[settings.database_name]
+    def __init__(self, db: Optional[AsyncIOMotorDatabase] = None):
+        # Collections sur le client MongoDB partagé de l'application
+        self.db = db if db is not None else get_database()
+        self.client = self.db.client
         self.users = self.db["users"]  # Collection "users" correcte
+        self.invalidations = self.db["auth_invalidations"]
+        self.stats = StatsService(self.db)
 
-    def hash_password(self, password: str) -> str:
-        """Hache le mot de passe en utilisant bcrypt."""
-        return pwd_context.hash(password)
+    async def hash_password(self, password: str) -> str:
+        """Hache le mot de passe en utilisant bcrypt (dans le pool dédié)."""
+        return await get_password_hasher().hash(password)
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Vérifie que le mot de passe correspond au hachage."""
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Vérifie que le mot de passe correspond au hachage (dans le pool dédié)."""
+        return await get_password_hasher().verify(plain_password, hashed_password)
 
     async def create_user(self, user_data: UserCreate) -> User:
         """
@@ -42,7 +55,7 @@ class UserService:
         Si aucun rôle n'est fourni, il est défini comme `user` par défaut.
         """
         # Hacher le mot de passe
-        hashed_password = self.hash_password(user_data.password)
+        hashed_password = await self.hash_password(user_data.password)
 
         # Préparer les données utilisateur pour l'insertion
         user_dict = {
@@ -56,6 +69,7 @@ class UserService:
 
         # Insérer l'utilisateur dans la base de données
         result = await self.users.insert_one(user_dict)
+        await self.stats.record_signup(user_dict["created_at"])
 
         # Récupérer l'ID inséré et retourner un objet User
         return User(id=str(result.inserted_id), **user_dict)
@@ -67,103 +81,146 @@ class UserService:
             return User(**user)
         return None
     async def get_user_stats(self, days: int) -> List[Dict[str, int]]:
+        """
+        Inscriptions par jour sur les `days` derniers jours, lues dans les compteurs pré-agrégés.
+        """
         try:
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=days)
-            
-            # Log des dates utilisées
             logger.info(f"Calcul des statistiques pour les {days} derniers jours.")
-            logger.info(f"Date de début : {start_date}, date de fin : {end_date}")
-
-            pipeline = [
-                {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
-                {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}, "count": {"$sum": 1}}},
-                {"$sort": {"_id": 1}}
-            ]
-            
-            # Log du pipeline
-            logger.info(f"Pipeline utilisé : {pipeline}")
-            
-            stats = await self.users.aggregate(pipeline).to_list(length=None)
-            
-            # Log des statistiques récupérées
-            logger.info(f"Statistiques récupérées : {stats}")
-            
-            return [{"date": stat["_id"], "count": stat["count"]} for stat in stats]
+            return await self.stats.get_daily("signups", days)
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des statistiques des utilisateurs : {e}")
             raise HTTPException(status_code=500, detail=f"Erreur : {str(e)}")
+
     async def get_sessions_per_user(self) -> List[Dict[str, int]]:
+        """
+        Nombre de sessions de chaque utilisateur, lu dans les compteurs pré-agrégés.
+        """
         try:
-            pipeline = [
-                # Grouper les conversations par email de l'utilisateur
-                {"$group": {"_id": "$user_email", "count": {"$sum": 1}}},
-                # Projet pour renvoyer les emails et les nombres de sessions
-                {"$project": {"user_email": "$_id", "count": 1, "_id": 0}},
-                {"$sort": {"user_email": 1}}  # Trier par email pour plus de lisibilité
-            ]
-            
-            # Exécuter le pipeline
-            sessions_stats = await self.db["conversations"].aggregate(pipeline).to_list(length=None)
-            logger.info(f"Statistiques des sessions par utilisateur : {sessions_stats}")
-            return sessions_stats
+            return await self.stats.get_per_user("sessions")
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des sessions par utilisateur : {e}")
             raise HTTPException(status_code=500, detail="Erreur lors de la récupération des sessions")
 
+    async def get_activity_stats(self, days: int) -> List[Dict]:
+        """
+        Compteurs quotidiens d'activité (inscriptions, sessions, messages, tokens).
+        """
+        try:
+            return await self.stats.get_activity(days)
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération de l'activité : {e}")
+            raise HTTPException(status_code=500, detail=f"Erreur : {str(e)}")
+
 
 
-# Fonction pour récupérer l'utilisateur courant
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+_user_service: Optional[UserService] = None
+
+
+def get_user_service() -> UserService:
+    """
+    Instance partagée de UserService (dépendance FastAPI) : aucun client n'est créé par requête.
+    """
+    global _user_service
+    if _user_service is None:
+        _user_service = UserService()
+    return _user_service
+
+
+def decode_access_token(token: str) -> Dict:
+    """
+    Vérifie localement la signature et l'expiration du JWT et retourne ses claims.
+    """
     try:
-        print(f"Token reçu dans get_current_user : {token}")  # Log du token brut
         payload = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
-        print(f"Token décodé : {payload}")  # Log du contenu du token
-        if 'exp' in payload:
-            print(f"Expiration du token : {datetime.utcfromtimestamp(payload['exp'])}")
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        user_service = UserService()
+    except JWTError as e:
+        logger.warning(f"Token JWT rejeté : {e}")
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    return payload
+
+
+async def sync_invalidations(user_service: UserService):
+    """
+    Retire du cache les utilisateurs invalidés par les autres processus depuis la dernière
+    relecture (une requête MongoDB au plus par AUTH_INVALIDATION_POLL_INTERVAL secondes).
+    """
+    global _invalidations_checked_at, _invalidations_since
+    interval = settings.auth_invalidation_poll_interval
+    if interval <= 0 or time.monotonic() - _invalidations_checked_at < interval:
+        return
+    _invalidations_checked_at = time.monotonic()
+    started = time.time()
+    since = datetime.utcfromtimestamp(_invalidations_since - INVALIDATION_CLOCK_MARGIN)
+    try:
+        async for invalidation in user_service.invalidations.find({"at": {"$gte": since}}, {"email": 1}):
+            principal_cache.pop(invalidation["email"])
+    except Exception as e:
+        # Les entrées du cache expirent de toute façon après AUTH_CACHE_TTL secondes
+        logger.warning(f"Impossible de relire les invalidations d'utilisateurs : {e}")
+        return
+    _invalidations_since = started
+
+
+async def resolve_user(email: str, user_service: UserService) -> User:
+    """
+    Retourne l'utilisateur correspondant à l'email, depuis le cache si possible.
+    Un utilisateur bloqué est refusé.
+    """
+    await sync_invalidations(user_service)
+    user = principal_cache.get(email)
+    if user is MISSING:
         user = await user_service.get_user_by_email(email)
         if user is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        return user
-    except JWTError as e:
-        print(f"Erreur de JWT : {e}")  # Log de l'erreur
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+        principal_cache.set(email, user)
+    if user.is_blocked:
+        raise HTTPException(status_code=403, detail="This account has been blocked")
+    return user
+
+
+async def invalidate_user(email: str, user_service: UserService):
+    """
+    Retire un utilisateur du cache (blocage, suppression...) : la modification s'applique
+    dès la requête suivante dans ce processus, et dans les autres après au plus
+    AUTH_INVALIDATION_POLL_INTERVAL secondes.
+    """
+    principal_cache.pop(email)
+    await user_service.invalidations.insert_one({"email": email, "at": datetime.utcnow()})
+
+
+# Fonction pour récupérer l'utilisateur courant
+async def get_current_user(token: str = Depends(oauth2_scheme),
+                           user_service: UserService = Depends(get_user_service)) -> User:
+    payload = decode_access_token(token)
+    return await resolve_user(payload["sub"], user_service)
+
+
+async def get_current_user_email(user: User = Depends(get_current_user)) -> str:
+    """
+    Email de l'utilisateur courant (identifiant utilisé par les routes de chat).
+    """
+    return user.email
 
 
 # Fonction pour vérifier si l'utilisateur est administrateur
-async def get_current_admin_user(token: str = Depends(oauth2_scheme)) -> User:
-    try:
-        print(f"Token received in get_current_admin_user: {token}")  # Debug log
-        payload = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
-        email = payload.get("sub")
-        role = payload.get("role")
-        
-        if not email or role != "admin":
-            raise HTTPException(
-                status_code=403,
-                detail="Not authorized. Admin access required."
-            )
-            
-        user_service = UserService()
-        user = await user_service.get_user_by_email(email)
-        
-        if not user or user.role != "admin":
-            raise HTTPException(
-                status_code=403,
-                detail="Not authorized. Admin access required."
-            )
-            
-        return user
-    except JWTError as e:
-        print(f"JWT Error: {e}")  # Debug log
+async def get_current_admin_user(token: str = Depends(oauth2_scheme),
+                                 user_service: UserService = Depends(get_user_service)) -> User:
+    payload = decode_access_token(token)
+    # Le rôle est d'abord vérifié dans les claims, sans accès à la base
+    if payload.get("role") != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Not authorized. Admin access required."
+        )
+
+    user = await resolve_user(payload["sub"], user_service)
+    if user.role != "admin":
         raise HTTPException(
-            status_code=401,
-            detail="Invalid authentication credentials"
+            status_code=403,
+            detail="Not authorized. Admin access required."
         )
+    return user
 
 async def get_all_users(self) -> List[User]:
     users_cursor = self.users.find({"role": {"$ne": "admin"}})  # Exclure les admins
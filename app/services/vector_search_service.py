@@ -1,9 +1,23 @@
 from langchain_community.vectorstores import FAISS
-from sentence_transformers import SentenceTransformer
 from langchain_community.docstore.in_memory import InMemoryDocstore
-from faiss import IndexFlatL2
+from langchain_core.documents import Document
 from pymongo import MongoClient
-import uuid
+from bson import ObjectId
+from typing import Optional, List, Dict, NamedTuple, Set, Tuple
+from datetime import datetime, timedelta
+from core.config import settings
+from services.embedding_batcher import QueryEmbeddingBatcher
+from services.cache import TTLCache, MISSING, normalize_query
+from services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from services.encoders import load_encoder
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import numpy as np
+import faiss
+import os
+import pickle
+import threading
+import time
 import logging
 
 
@@ -11,98 +25,722 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Champs nécessaires à la construction de l'index (le reste du document reste côté MongoDB)
+CHUNK_PROJECTION = {"text": 1, "vector": 1, "file_name": 1, "page_number": 1}
+
+# Fichiers du snapshot local de l'index
+SNAPSHOT_INDEX_FILE = "index.faiss"
+SNAPSHOT_META_FILE = "index.pkl"
+SNAPSHOT_VERSION = 4
+
+# Une reconstruction complète relit aussi les entrées du journal des suppressions écrites
+# peu avant : un chunk est inscrit au journal avant de quitter MongoDB, et les horloges
+# des serveurs peuvent différer
+DELETIONS_REPLAY_MARGIN = timedelta(minutes=5)
+
+# Types d'index FAISS disponibles (VECTOR_INDEX_TYPE)
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+
+def index_factory_string(index_type: str) -> str:
+    """
+    Chaîne index_factory FAISS correspondant au type d'index configuré.
+    Les identifiants sont toujours explicites (IDMap2) pour permettre les suppressions.
+    """
+    if index_type == "flat":
+        return "IDMap2,Flat"
+    if index_type == "ivf_flat":
+        return f"IDMap2,IVF{settings.ivf_nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IDMap2,IVF{settings.ivf_nlist},PQ{settings.pq_m}x{settings.pq_nbits}"
+    if index_type == "hnsw":
+        return f"IDMap2,HNSW{settings.hnsw_m},Flat"
+    raise ValueError(f"Type d'index inconnu : {index_type} (attendu : {', '.join(INDEX_TYPES)})")
+
+
+def min_training_size(index_type: str) -> int:
+    """
+    Nombre minimal de vecteurs pour entraîner l'index (0 si aucun entraînement n'est requis).
+    """
+    if index_type == "ivf_flat":
+        return settings.ivf_nlist * 39
+    if index_type == "ivf_pq":
+        return max(settings.ivf_nlist, 2 ** settings.pq_nbits) * 39
+    return 0
+
+
+def apply_search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """
+    Règle les paramètres de recherche (nprobe pour IVF, efSearch pour HNSW).
+    """
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = nprobe or settings.ivf_nprobe
+    elif isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search or settings.hnsw_ef_search
+
+
+def build_faiss_index(index_type: str, dimension: int, training_vectors: Optional[np.ndarray] = None):
+    """
+    Construit un index FAISS vide du type demandé, entraîné si nécessaire.
+    """
+    index = faiss.index_factory(dimension, index_factory_string(index_type), faiss.METRIC_L2)
+    if index_type == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efConstruction = settings.hnsw_ef_construction
+    if not index.is_trained:
+        started = time.perf_counter()
+        index.train(training_vectors)
+        logger.info(f"Index {index_type} entraîné sur {len(training_vectors)} vecteurs en {time.perf_counter() - started:.2f}s.")
+    inner = faiss.downcast_index(index.index)
+    if isinstance(inner, faiss.IndexIVF):
+        # Table directe : les vecteurs restent reconstructibles (sélection du contexte) malgré les suppressions
+        inner.set_direct_map_type(faiss.DirectMap.Hashtable)
+    apply_search_params(index)
+    return index
+
+
+def index_spec() -> str:
+    """
+    Configuration d'index demandée ; un snapshot construit avec une autre configuration est reconstruit.
+    """
+    if settings.vector_index_type == "flat":
+        return "flat"
+    return f"{settings.vector_index_type}:{index_factory_string(settings.vector_index_type)}"
+
+
+class Retrieval(NamedTuple):
+    """
+    Résultat d'une recherche : embedding de la requête, chunks retrouvés (identifiants,
+    documents et vecteurs, dans le même ordre) et version de l'index.
+    """
+    query_vector: np.ndarray
+    doc_ids: List[str]
+    documents: List[Document]
+    index_version: int
+    vectors: np.ndarray
+
+
+class _Candidates(NamedTuple):
+    """
+    Résultat mis en cache d'une recherche : identifiants docstore et FAISS des chunks retenus.
+    Les identifiants FAISS ne sont valables que pour la version de l'index interrogée.
+    """
+    doc_ids: List[str]
+    labels: List[int]
+
+
+class _IndexState:
+    """
+    Vectorstore FAISS, index lexical et tables de correspondance associées.
+    L'ensemble est remplacé d'un bloc lors d'un rechargement.
+    """
+    def __init__(self, store: FAISS, index_type: str = "flat"):
+        self.store = store
+        self.index_type = index_type  # Type effectif (flat si le corpus est trop petit pour l'entraînement)
+        self.index_spec = index_spec()  # Configuration demandée lors de la construction
+        self.file_labels: Dict[str, List[int]] = {}  # file_name -> identifiants FAISS
+        self.lexical = LexicalIndex()  # Index BM25 des mêmes chunks, par identifiant FAISS
+        self.next_label = 0  # Prochain identifiant FAISS libre
+        self.skipped_ids: Set[ObjectId] = set()  # Chunks MongoDB ignorés (vecteur invalide)
+        self.high_water_mark: Optional[ObjectId] = None  # Plus grand _id MongoDB lu
+        self.deletions_seen: Optional[ObjectId] = None  # Dernière entrée appliquée du journal des suppressions
+        self.mapped = False  # Index mappé en mémoire (lecture seule)
+
+
 class VectorSearchService:
-    def __init__(self, mongo_uri: str, db_name: str, collection_name: str, embedding_model_name: str):
+    def __init__(self, mongo_uri: str, db_name: str, collection_name: str, embedding_model_name: str,
+                 embeddings=None, client: Optional[MongoClient] = None):
         """
         Initialise le service de recherche vectorielle avec FAISS et MongoDB.
+        Un encodeur (services/encoders.py) et un client MongoDB existants peuvent être
+        fournis pour éviter d'en créer des copies.
         """
         try:
             # Initialisation MongoDB
-            self.client = MongoClient(mongo_uri)
+            self.client = client if client is not None else MongoClient(mongo_uri)
             self.db = self.client[db_name]
             self.collection = self.db[collection_name]
+            # Journal des chunks supprimés, appliqué à l'index lors du rattrapage
+            self.deletions = self.db[settings.pdf_chunk_deletions_collection]
 
             # Initialisation du modèle d'embedding
-            self.embeddings = SentenceTransformer(embedding_model_name)
-            vector_dimension = self.embeddings.get_sentence_embedding_dimension()
+            self.embeddings = embeddings if embeddings is not None else load_encoder(model_name=embedding_model_name)
+            self.vector_dimension = self.embeddings.get_sentence_embedding_dimension()
 
-            # Initialisation de FAISS
-            index = IndexFlatL2(vector_dimension)  # Index basé sur la distance L2
-            docstore = InMemoryDocstore({})
-            self.index = FAISS(
-                index=index,
-                docstore=docstore,
-                index_to_docstore_id={},
-                embedding_function=self.embeddings.encode
+            # FAISS n'autorise pas de recherche pendant une modification de l'index ; ce verrou
+            # n'est pris que le temps d'appliquer une modification ou de substituer l'état
+            self._lock = threading.RLock()
+            # Sérialise toutes les écritures de ce processus (ajouts, suppressions, rattrapage,
+            # rechargement, snapshot) : les étapes longues se font sous ce seul verrou,
+            # sans bloquer les recherches
+            self._write_lock = threading.RLock()
+
+            # Pool borné pour exécuter l'embedding et la recherche hors de la boucle d'événements
+            self._executor = ThreadPoolExecutor(max_workers=settings.retrieval_workers, thread_name_prefix="retrieval")
+
+            # Les requêtes concurrentes sont encodées par micro-lots
+            self.query_batcher = QueryEmbeddingBatcher(
+                self._encode_batch,
+                self._executor,
+                max_batch_size=settings.embedding_batch_max_size,
+                max_wait_ms=settings.embedding_batch_max_wait_ms
             )
 
-            # Charger les chunks existants
+            # Caches des embeddings de requêtes et des résultats de recherche.
+            # Les résultats sont indexés par version de l'index, incrémentée à chaque modification.
+            self.index_version = 0
+            self.embedding_cache = TTLCache(settings.embedding_cache_size, settings.embedding_cache_ttl)
+            self.result_cache = TTLCache(settings.result_cache_size, settings.result_cache_ttl)
+
+            # Initialisation de FAISS et chargement des chunks existants
+            self._state: Optional[_IndexState] = None
             self._load_chunks_into_index()
 
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation du service de recherche vectorielle : {e}")
             raise
 
+    @property
+    def index(self) -> FAISS:
+        """Vectorstore FAISS actuellement servi."""
+        return self._state.store
+
+    @property
+    def high_water_mark(self) -> Optional[ObjectId]:
+        return self._state.high_water_mark
+
+    def _training_vectors(self, size: int) -> np.ndarray:
+        """
+        Échantillonne des vecteurs de `pdf_chunks` pour l'entraînement de l'index.
+        """
+        cursor = self.collection.aggregate([{"$sample": {"size": size}}, {"$project": {"vector": 1}}])
+        vectors = [chunk["vector"] for chunk in cursor if len(chunk.get("vector") or []) == self.vector_dimension]
+        return np.asarray(vectors, dtype=np.float32).reshape(-1, self.vector_dimension)
+
+    def _new_state(self) -> _IndexState:
+        """
+        Crée un état vide : index L2 du type configuré, entraîné sur les vecteurs existants
+        si nécessaire, et docstore en mémoire.
+        """
+        index_type = settings.vector_index_type
+        training = None
+        required = min_training_size(index_type)
+        if required:
+            available = self.collection.estimated_document_count()
+            if available >= required:
+                training = self._training_vectors(max(required, min(settings.index_train_size, available)))
+            if training is None or len(training) < required:
+                logger.warning(
+                    f"Pas assez de vecteurs pour entraîner l'index {index_type} ({required} requis) : index flat utilisé."
+                )
+                index_type = "flat"
+
+        store = FAISS(
+            index=build_faiss_index(index_type, self.vector_dimension, training),  # Index basé sur la distance L2
+            docstore=InMemoryDocstore({}),
+            index_to_docstore_id={},
+            embedding_function=self.embeddings.encode
+        )
+        return _IndexState(store, index_type)
+
+    def _add_batch(self, state: _IndexState, chunks: List[Dict]) -> int:
+        """
+        Ajoute un lot de chunks à l'index en un seul appel FAISS.
+        Les vecteurs sont copiés dans une matrice float32 contiguë.
+        """
+        store = state.store
+        matrix = np.empty((len(chunks), self.vector_dimension), dtype=np.float32)
+        labels = np.arange(state.next_label, state.next_label + len(chunks), dtype=np.int64)
+        documents = {}
+        for row, chunk in enumerate(chunks):
+            matrix[row] = chunk["vector"]
+            doc_id = str(chunk["_id"])
+            label = int(labels[row])
+            documents[doc_id] = Document(
+                page_content=chunk["text"],
+                metadata={"file_name": chunk.get("file_name"), "page_number": chunk.get("page_number")}
+            )
+            store.index_to_docstore_id[label] = doc_id
+            state.file_labels.setdefault(chunk.get("file_name"), []).append(label)
+
+        store.index.add_with_ids(matrix, labels)
+        store.docstore.add(documents)
+        state.lexical.add(labels.tolist(), [chunk["text"] for chunk in chunks])
+        state.next_label += len(chunks)
+        return len(chunks)
+
+    def _is_valid_chunk(self, chunk: Dict) -> bool:
+        vector = chunk.get("vector")
+        return bool(vector) and len(vector) == self.vector_dimension and "text" in chunk
+
+    def _bulk_load(self, state: _IndexState, since: Optional[ObjectId] = None) -> int:
+        """
+        Lit les chunks MongoDB par lots et les ajoute à l'index FAISS.
+        Si `since` est fourni, seuls les chunks d'_id supérieur sont lus.
+        Retourne le nombre de chunks chargés.
+        """
+        batch_size = settings.index_load_batch_size
+        started = time.perf_counter()
+        if since is None:
+            state.deletions_seen = ObjectId.from_datetime(datetime.utcnow() - DELETIONS_REPLAY_MARGIN)
+        query = {"_id": {"$gt": since}} if since is not None else {}
+        cursor = self.collection.find(query, CHUNK_PROJECTION, batch_size=batch_size)
+        count = 0
+        skipped = 0
+        batch = []
+
+        for chunk in cursor:
+            if state.high_water_mark is None or chunk["_id"] > state.high_water_mark:
+                state.high_water_mark = chunk["_id"]
+            if not self._is_valid_chunk(chunk):
+                logger.debug(f"Chunk ignoré : vecteur invalide ou manquant (ID : {chunk.get('_id')})")
+                state.skipped_ids.add(chunk["_id"])
+                skipped += 1
+                continue
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                count += self._add_batch(state, batch)
+                batch = []
+        if batch:
+            count += self._add_batch(state, batch)
+
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else float(count)
+        if skipped:
+            logger.warning(f"{skipped} chunks ignorés : vecteur invalide ou manquant.")
+        logger.info(f"{count} chunks chargés dans l'index FAISS en {elapsed:.2f}s ({rate:.0f} chunks/s).")
+        return count
+
     def _load_chunks_into_index(self):
         """
-        Charge les chunks MongoDB dans l'index FAISS.
+        Charge les chunks dans l'index FAISS : depuis le snapshot local s'il est
+        utilisable (avec rattrapage des chunks insérés depuis), sinon depuis MongoDB.
         """
         try:
+            if self._load_snapshot():
+                return
             logger.info("Chargement des chunks depuis MongoDB...")
-            chunks = self.collection.find()
-            count = 0
-
-            for chunk in chunks:
-                vector = chunk.get("vector")
-                if vector and len(vector) == self.index.index.d:
-                    doc_id = str(uuid.uuid4())
-                    self.index.add_texts(
-                        [chunk["text"]],
-                        embeddings=[vector],
-                        metadatas=[{"vector": vector}],
-                        ids=[doc_id]
-                    )
-                    count += 1
-                else:
-                    logger.warning(f"Chunk ignoré : vecteur invalide ou manquant (ID : {chunk.get('_id')})")
-
-            logger.info(f"{count} chunks chargés dans l'index FAISS.")
+            state = self._new_state()
+            self._bulk_load(state)
+            self._apply_deletions(state, self._pending_deletions(state))
+            self._state = state
+            self.save_snapshot()
         except Exception as e:
             logger.error(f"Erreur lors du chargement des chunks dans FAISS : {e}")
             raise
 
+    def _snapshot_paths(self) -> Tuple[str, str]:
+        directory = settings.index_snapshot_dir
+        return os.path.join(directory, SNAPSHOT_INDEX_FILE), os.path.join(directory, SNAPSHOT_META_FILE)
+
+    def save_snapshot(self):
+        """
+        Sauvegarde l'index FAISS et son docstore dans le répertoire de snapshot.
+        Les fichiers sont écrits à part puis renommés, un autre worker ne lit donc
+        jamais un snapshot partiellement écrit.
+        """
+        if not settings.index_snapshot_dir:
+            return
+        try:
+            index_path, meta_path = self._snapshot_paths()
+            os.makedirs(settings.index_snapshot_dir, exist_ok=True)
+            suffix = f".{os.getpid()}.tmp"
+            # `_write_lock` suffit à figer l'état pendant l'écriture : les recherches continuent
+            with self._write_lock:
+                with self._lock:
+                    state = self._state
+                store = state.store
+                meta = {
+                    "version": SNAPSHOT_VERSION,
+                    "model": settings.embedding_model_name,
+                    "dimension": self.vector_dimension,
+                    "index_spec": state.index_spec,
+                    "index_type": state.index_type,
+                    "ntotal": store.index.ntotal,
+                    "skipped_ids": state.skipped_ids,
+                    "high_water_mark": state.high_water_mark,
+                    "deletions_seen": state.deletions_seen,
+                    "next_label": state.next_label,
+                    "file_labels": state.file_labels,
+                    "lexical": state.lexical,
+                    "docstore": store.docstore,
+                    "index_to_docstore_id": store.index_to_docstore_id,
+                }
+                faiss.write_index(store.index, index_path + suffix)
+                with open(meta_path + suffix, "wb") as f:
+                    pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(index_path + suffix, index_path)
+            os.replace(meta_path + suffix, meta_path)
+            logger.info(f"Snapshot de l'index sauvegardé ({meta['ntotal']} vecteurs) dans {settings.index_snapshot_dir}.")
+        except Exception as e:
+            # Le snapshot n'est qu'une accélération du démarrage : son échec n'est pas bloquant
+            logger.warning(f"Impossible de sauvegarder le snapshot de l'index : {e}")
+
+    def _read_index(self, path: str, mmap: bool):
+        """
+        Lit un index FAISS, mappé en mémoire si demandé : plusieurs workers de la même
+        machine partagent alors les pages du fichier au lieu d'en garder chacun une copie.
+        """
+        if mmap:
+            flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+            try:
+                return faiss.read_index(path, flags), True
+            except Exception as e:
+                logger.warning(f"Mapping mémoire du snapshot impossible, lecture complète : {e}")
+        return faiss.read_index(path), False
+
+    def _load_snapshot(self) -> bool:
+        """
+        Charge le snapshot local puis rattrape les chunks insérés depuis son high-water mark.
+        Retourne False si aucun snapshot utilisable n'existe.
+        """
+        if not settings.index_snapshot_dir:
+            return False
+        index_path, meta_path = self._snapshot_paths()
+        if not (os.path.exists(index_path) and os.path.exists(meta_path)):
+            return False
+        try:
+            started = time.perf_counter()
+            with open(meta_path, "rb") as f:
+                meta = pickle.load(f)
+            if (meta.get("version") != SNAPSHOT_VERSION
+                    or meta.get("model") != settings.embedding_model_name
+                    or meta.get("dimension") != self.vector_dimension
+                    or meta.get("index_spec") != index_spec()):
+                logger.info("Snapshot de l'index incompatible avec la configuration actuelle, reconstruction.")
+                return False
+
+            deletions_seen = meta["deletions_seen"]
+            retention = timedelta(days=settings.chunk_deletions_retention_days)
+            if deletions_seen is None or deletions_seen.generation_time.replace(tzinfo=None) < datetime.utcnow() - retention:
+                # Les suppressions faites depuis ont pu quitter le journal
+                logger.info("Snapshot de l'index plus ancien que le journal des suppressions, reconstruction.")
+                return False
+            high_water_mark = meta["high_water_mark"]
+            new_chunks = self.collection.count_documents({"_id": {"$gt": high_water_mark}}) if high_water_mark else 0
+            deletions = list(self.deletions.find({"_id": {"$gt": deletions_seen}}).sort("_id", 1))
+
+            # Un index mappé est en lecture seule : on ne le mappe que s'il n'y a rien à rattraper
+            index, mapped = self._read_index(
+                index_path, mmap=settings.index_snapshot_mmap and new_chunks == 0 and not deletions
+            )
+            if index.ntotal != meta["ntotal"]:
+                logger.warning("Snapshot de l'index incohérent avec ses métadonnées, reconstruction.")
+                return False
+
+            apply_search_params(index)
+            state = _IndexState(FAISS(
+                index=index,
+                docstore=meta["docstore"],
+                index_to_docstore_id=meta["index_to_docstore_id"],
+                embedding_function=self.embeddings.encode
+            ), meta["index_type"])
+            state.file_labels = meta["file_labels"]
+            state.lexical = meta["lexical"]
+            state.next_label = meta["next_label"]
+            state.skipped_ids = meta["skipped_ids"]
+            state.high_water_mark = high_water_mark
+            state.deletions_seen = deletions_seen
+            state.mapped = mapped
+            if new_chunks:
+                self._bulk_load(state, since=high_water_mark)
+            if self._apply_deletions(state, deletions) is None:
+                logger.info("Suppressions impossibles dans l'index HNSW du snapshot, reconstruction.")
+                return False
+
+            # Des suppressions ou des insertions hors ordre d'_id ne sont pas visibles via le high-water mark
+            expected = self.collection.estimated_document_count()
+            if index.ntotal + len(state.skipped_ids) != expected:
+                logger.info(
+                    f"Snapshot désynchronisé de MongoDB ({index.ntotal + len(state.skipped_ids)} chunks contre {expected}), reconstruction."
+                )
+                return False
+
+            self._state = state
+            elapsed = time.perf_counter() - started
+            logger.info(f"Index FAISS chargé depuis le snapshot en {elapsed:.2f}s ({index.ntotal} vecteurs, {new_chunks} rattrapés).")
+            if new_chunks or deletions:
+                self.save_snapshot()
+            return True
+        except Exception as e:
+            logger.warning(f"Snapshot de l'index illisible, reconstruction depuis MongoDB : {e}")
+            return False
+
+    def _ensure_writable(self) -> bool:
+        """
+        Remplace un index mappé (lecture seule) par une copie en mémoire avant modification.
+        À appeler sous `_write_lock` mais hors de `_lock` : la copie est lue sans bloquer les
+        recherches. Retourne False si le snapshot a été réécrit par un autre worker depuis le
+        chargement ; l'appelant recharge alors l'index (`reload_index`), lui aussi hors de `_lock`.
+        """
+        state = self._state
+        if not state.mapped:
+            return True
+        index_path, _ = self._snapshot_paths()
+        index, _ = self._read_index(index_path, mmap=False)
+        if index.ntotal != state.store.index.ntotal:
+            logger.info("Snapshot modifié depuis le chargement, reconstruction de l'index.")
+            return False
+        apply_search_params(index)
+        with self._lock:
+            state.store.index = index
+            state.mapped = False
+        return True
+
     def reload_index(self):
         """
         Recharge l'index FAISS avec tous les chunks de la base de données.
+        Le nouvel index est construit à part puis substitué à l'ancien, les recherches
+        en cours continuent donc de servir l'index précédent pendant le rechargement.
         """
         try:
-            logger.info("Rechargement de l'index FAISS...")
-            total_chunks = self.collection.count_documents({})
-            logger.info(f"Nombre total de chunks dans MongoDB avant rechargement : {total_chunks}")
-
-            self.index.index.reset()  # Réinitialiser l'index FAISS
-
-            # Recharger les chunks depuis MongoDB
-            chunks = self.collection.find()
-            count = 0
-
-            for chunk in chunks:
-                vector = chunk.get("vector")
-                if vector and len(vector) == self.index.index.d:
-                    self.index.add_texts(
-                        [chunk["text"]],
-                        embeddings=[vector],
-                        ids=[str(chunk["_id"])]
-                    )
-                    count += 1
-                else:
-                    logger.warning(f"Chunk ignoré : vecteur invalide ou manquant (ID : {chunk.get('_id')})")
-
-            logger.info(f"Index FAISS rechargé avec succès. {count} chunks ajoutés à l'index.")
+            with self._write_lock:
+                logger.info("Rechargement de l'index FAISS...")
+                state = self._new_state()
+                count = self._bulk_load(state)
+                self._apply_deletions(state, self._pending_deletions(state))
+                with self._lock:
+                    self._state = state
+                    self._bump_version()
+                logger.info(f"Index FAISS rechargé avec succès. {count} chunks ajoutés à l'index.")
+                self.save_snapshot()
         except Exception as e:
             logger.error(f"Erreur lors du rechargement de l'index FAISS : {e}")
             raise
 
+    def add_chunks(self, chunks: List[Dict]) -> int:
+        """
+        Ajoute à l'index des chunks déjà insérés dans MongoDB (documents avec `_id`).
+        Seuls les nouveaux vecteurs sont ajoutés : le coût dépend du nombre de chunks fournis.
+        Les chunks déjà indexés sont ignorés.
+        """
+        valid = [chunk for chunk in chunks if self._is_valid_chunk(chunk)]
+        with self._write_lock:
+            if not self._ensure_writable():
+                self.reload_index()
+            with self._lock:
+                state = self._state
+                state.skipped_ids.update(chunk["_id"] for chunk in chunks if not self._is_valid_chunk(chunk))
+                # Si l'index vient d'être rechargé (snapshot réécrit par un autre worker),
+                # le rechargement a déjà lu ces chunks dans MongoDB
+                docstore = state.store.docstore
+                valid = [chunk for chunk in valid if not isinstance(docstore.search(str(chunk["_id"])), Document)]
+                if valid:
+                    self._add_batch(state, valid)
+                    self._bump_version()
+                newest = max((chunk["_id"] for chunk in chunks), default=None)
+                if newest is not None and (state.high_water_mark is None or newest > state.high_water_mark):
+                    state.high_water_mark = newest
+        logger.info(f"{len(valid)} chunks ajoutés à l'index FAISS ({state.store.index.ntotal} au total).")
+        return len(valid)
+
+    def remove_document(self, file_name: str) -> int:
+        """
+        Supprime de MongoDB et de l'index tous les chunks d'un fichier.
+        Retourne le nombre de vecteurs retirés de l'index.
+        """
+        with self._write_lock:
+            return self._remove_document(file_name)
+
+    def _remove_document(self, file_name: str) -> int:
+        chunk_ids = [chunk["_id"] for chunk in self.collection.find({"file_name": file_name}, {"_id": 1})]
+        for start in range(0, len(chunk_ids), settings.index_load_batch_size):
+            batch = chunk_ids[start:start + settings.index_load_batch_size]
+            # Journalisés avant la suppression : les autres processus retirent ces chunks de leur index
+            self.deletions.insert_one({"file_name": file_name, "chunk_ids": batch, "at": datetime.utcnow()})
+            self.collection.delete_many({"_id": {"$in": batch}})
+        if not self._ensure_writable():
+            self.reload_index()
+        with self._lock:
+            removed = self._remove_chunks(self._state, file_name, chunk_ids)
+            if removed:
+                self._bump_version()
+        if removed is None:
+            # HNSW ne supporte pas la suppression de vecteurs : reconstruction complète
+            removed = len(self._state.file_labels.get(file_name, []))
+            self.reload_index()
+        elif removed:
+            self.save_snapshot()
+        logger.info(f"Document {file_name} supprimé : {len(chunk_ids)} chunks MongoDB, {removed} vecteurs FAISS.")
+        return removed
+
+    def _remove_chunks(self, state: _IndexState, file_name: str, chunk_ids: List[ObjectId]) -> Optional[int]:
+        """
+        Retire de l'index les chunks `chunk_ids` du fichier (sous `_lock` si l'état est servi).
+        Seuls les identifiants FAISS du fichier sont parcourus : le coût ne dépend pas de la
+        taille du corpus. Retourne le nombre de vecteurs retirés, ou None si l'index (HNSW)
+        ne permet pas la suppression.
+        """
+        state.skipped_ids.difference_update(chunk_ids)
+        doc_ids = {str(chunk_id) for chunk_id in chunk_ids}
+        store = state.store
+        file_labels = state.file_labels.get(file_name, [])
+        labels = [label for label in file_labels if store.index_to_docstore_id.get(label) in doc_ids]
+        if not labels:
+            return 0
+        if state.index_type == "hnsw":
+            return None
+        store.index.remove_ids(np.asarray(labels, dtype=np.int64))
+        store.docstore.delete([store.index_to_docstore_id.pop(label) for label in labels])
+        state.lexical.remove(labels)
+        removed = set(labels)
+        remaining = [label for label in file_labels if label not in removed]
+        if remaining:
+            state.file_labels[file_name] = remaining
+        else:
+            state.file_labels.pop(file_name, None)
+        return len(labels)
+
+    def _pending_deletions(self, state: _IndexState) -> List[Dict]:
+        """
+        Entrées du journal des suppressions postérieures à la dernière appliquée à `state`.
+        """
+        query = {"_id": {"$gt": state.deletions_seen}} if state.deletions_seen is not None else {}
+        return list(self.deletions.find(query).sort("_id", 1))
+
+    def _apply_deletions(self, state: _IndexState, deletions: List[Dict]) -> Optional[int]:
+        """
+        Applique à `state` des entrées du journal des suppressions (sous `_lock` si l'état est
+        servi). Retourne le nombre de vecteurs retirés, ou None si une reconstruction est nécessaire.
+        """
+        removed = 0
+        for deletion in deletions:
+            count = self._remove_chunks(state, deletion["file_name"], deletion["chunk_ids"])
+            if count is None:
+                return None
+            removed += count
+            state.deletions_seen = deletion["_id"]
+        return removed
+
+    def refresh(self) -> int:
+        """
+        Rattrape les modifications faites par d'autres processus (workers d'ingestion,
+        autres workers de l'API) : ajoute les chunks insérés depuis le high-water mark,
+        puis retire les chunks inscrits depuis au journal des suppressions.
+        Retourne le nombre de chunks ajoutés.
+        """
+        with self._write_lock:
+            since = self.high_water_mark
+            query = {"_id": {"$gt": since}} if since is not None else {}
+            new_chunks = list(self.collection.find(query, CHUNK_PROJECTION))
+            added = self.add_chunks(new_chunks) if new_chunks else 0
+            deletions = self._pending_deletions(self._state)
+            removed = 0
+            if deletions:
+                if not self._ensure_writable():
+                    self.reload_index()
+                with self._lock:
+                    removed = self._apply_deletions(self._state, deletions)
+                    if removed:
+                        self._bump_version()
+            if removed is None:
+                logger.info("Suppressions impossibles dans l'index HNSW, rechargement.")
+                self.reload_index()
+            elif added or deletions:
+                if removed:
+                    logger.info(f"{removed} chunks supprimés retirés de l'index FAISS.")
+                self.save_snapshot()
+            return added
+
+    async def refresh_periodically(self, interval: float):
+        """
+        Appelle `refresh` toutes les `interval` secondes (tâche de fond du lifespan).
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Hors du pool de recherche : un rechargement complet ne doit pas retarder les requêtes
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"Erreur lors du rattrapage de l'index FAISS : {e}")
+
+    def _bump_version(self):
+        """
+        Signale une modification de l'index : les résultats en cache deviennent invalides.
+        """
+        self.index_version += 1
+        self.result_cache.clear()
+
+    def _search(self, query_vector: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """
+        Recherche FAISS brute : retourne les couples (identifiant FAISS, distance L2).
+        """
+        query = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            distances, labels = self.index.index.search(query, k)
+        return [(int(label), float(distance)) for label, distance in zip(labels[0], distances[0]) if label != -1]
+
+    def _lexical_search(self, query: str, k: int) -> List[int]:
+        """
+        Recherche BM25 : identifiants FAISS des `k` meilleurs chunks.
+        """
+        return [label for label, _ in self._state.lexical.search(query, k)]
+
+    def _fetch_k(self, k: int) -> int:
+        """
+        Nombre de candidats demandés à chaque recherche (davantage si les classements sont fusionnés).
+        """
+        return max(k, settings.hybrid_candidates) if settings.hybrid_search else k
+
+    def _candidates(self, dense_labels: List[int], lexical_labels: List[int], k: int) -> _Candidates:
+        """
+        Fusionne les classements dense et lexical et retient les `k` meilleurs chunks.
+        """
+        if settings.hybrid_search:
+            labels = reciprocal_rank_fusion([dense_labels, lexical_labels], k, settings.rrf_k)
+        else:
+            labels = dense_labels[:k]
+        mapping = self.index.index_to_docstore_id
+        labels = [label for label in labels if label in mapping]
+        return _Candidates([mapping[label] for label in labels], labels)
+
+    def _vectors(self, candidates: _Candidates) -> np.ndarray:
+        """
+        Vecteurs des chunks retenus, reconstruits depuis l'index FAISS ou, si l'index ne le
+        permet pas (snapshot IVF sans table directe) ou a été rechargé depuis la recherche,
+        relus dans MongoDB.
+        """
+        if not candidates.labels:
+            return np.empty((0, self.vector_dimension), dtype=np.float32)
+        with self._lock:
+            # Le rechargement remplace l'état sous ce verrou : les identifiants FAISS
+            # ne désignent les mêmes chunks que si la correspondance n'a pas changé
+            store = self.index
+            mapping = store.index_to_docstore_id
+            if all(mapping.get(label) == doc_id for label, doc_id in zip(candidates.labels, candidates.doc_ids)):
+                try:
+                    return np.vstack([store.index.reconstruct(label) for label in candidates.labels]).astype(np.float32)
+                except RuntimeError:
+                    pass
+        cursor = self.collection.find(
+            {"_id": {"$in": [ObjectId(doc_id) for doc_id in candidates.doc_ids]}}, {"vector": 1}
+        )
+        vectors = {str(chunk["_id"]): chunk["vector"] for chunk in cursor}
+        zeros = np.zeros(self.vector_dimension, dtype=np.float32)
+        return np.asarray([vectors.get(doc_id, zeros) for doc_id in candidates.doc_ids], dtype=np.float32)
+
+    def _documents(self, doc_ids: List[str]) -> List[Document]:
+        """
+        Documents du docstore correspondant aux identifiants (les absents sont ignorés).
+        """
+        docstore = self.index.docstore
+        documents = [docstore.search(doc_id) for doc_id in doc_ids]
+        return [document for document in documents if isinstance(document, Document)]
+
+    def _log_results(self, results: List[Document]):
+        if results:
+            logger.info(f"Chunks similaires trouvés : {[result.page_content for result in results]}")
+        else:
+            logger.info("Aucun chunk similaire trouvé.")
+
+    def search_by_vector(self, query_vector: np.ndarray, k: int = 5):
+        """
+        Recherche les chunks les plus proches d'un vecteur de requête déjà calculé.
+        """
+        candidates = self._candidates([label for label, _ in self._search(query_vector, k)], [], k)
+        results = self._documents(candidates.doc_ids)
+        self._log_results(results)
+        return results
 
     def search_similar_chunks(self, query: str, k: int = 5):
         """
@@ -110,17 +748,95 @@ class VectorSearchService:
         """
         try:
             logger.info(f"Recherche de chunks similaires pour : {query}")
-            query_vector = self.embeddings.encode(query)
-
-            # Recherche par similarité
-            results = self.index.similarity_search_by_vector(query_vector, k=k)
-            if results:
-                logger.info(f"Chunks similaires trouvés : {[result.page_content for result in results]}")
-            else:
-                logger.info("Aucun chunk similaire trouvé.")
+            key = normalize_query(query)
+            result_key = (key, k, self.index_version)
+            candidates = self.result_cache.get(result_key)
+            if candidates is MISSING:
+                query_vector = self.embedding_cache.get(key)
+                if query_vector is MISSING:
+                    query_vector = self.embeddings.encode(key)
+                    self.embedding_cache.set(key, query_vector)
+
+                # Recherche par similarité, fusionnée avec la recherche lexicale
+                fetch_k = self._fetch_k(k)
+                dense_labels = [label for label, _ in self._search(query_vector, fetch_k)]
+                lexical_labels = self._lexical_search(key, fetch_k) if settings.hybrid_search else []
+                candidates = self._candidates(dense_labels, lexical_labels, k)
+                self.result_cache.set(result_key, candidates)
+
+            results = self._documents(candidates.doc_ids)
+            self._log_results(results)
             return results
 
         except Exception as e:
             logger.error(f"Erreur lors de la recherche de chunks similaires : {e}")
             return []
 
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return self.embeddings.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+    async def aretrieve(self, query: str, k: int = 5) -> Retrieval:
+        """
+        Recherche awaitable retournant, en plus des documents, l'embedding de la requête,
+        les identifiants et vecteurs des chunks et la version de l'index interrogée.
+        L'embedding de la requête est regroupé avec celui des requêtes concurrentes ;
+        la recherche lexicale s'exécute pendant l'embedding et la recherche FAISS.
+        """
+        loop = asyncio.get_running_loop()
+        key = normalize_query(query)
+        index_version = self.index_version
+        result_key = (key, k, index_version)
+        candidates = self.result_cache.get(result_key)
+        fetch_k = self._fetch_k(k)
+        lexical = None
+        if candidates is MISSING and settings.hybrid_search:
+            lexical = loop.run_in_executor(self._executor, self._lexical_search, key, fetch_k)
+
+        try:
+            query_vector = self.embedding_cache.get(key)
+            if query_vector is MISSING:
+                query_vector = await self.query_batcher.encode(key)
+                self.embedding_cache.set(key, query_vector)
+
+            if candidates is MISSING:
+                hits = await loop.run_in_executor(self._executor, self._search, query_vector, fetch_k)
+                lexical_labels = await lexical if lexical is not None else []
+                candidates = self._candidates([label for label, _ in hits], lexical_labels, k)
+                self.result_cache.set(result_key, candidates)
+        finally:
+            if lexical is not None and not lexical.done():
+                lexical.cancel()
+        vectors = await loop.run_in_executor(self._executor, self._vectors, candidates)
+
+        # Documents, identifiants et vecteurs restent alignés si un chunk a disparu entre-temps
+        documents = [self.index.docstore.search(doc_id) for doc_id in candidates.doc_ids]
+        found = [row for row, document in enumerate(documents) if isinstance(document, Document)]
+        return Retrieval(
+            query_vector,
+            [candidates.doc_ids[row] for row in found],
+            [documents[row] for row in found],
+            index_version,
+            vectors[found]
+        )
+
+    async def asearch_similar_chunks(self, query: str, k: int = 5):
+        """
+        Version awaitable de `search_similar_chunks`, exécutée dans le pool de recherche
+        pour ne pas bloquer la boucle d'événements pendant l'embedding et la recherche FAISS.
+        """
+        try:
+            logger.info(f"Recherche de chunks similaires pour : {query}")
+            results = (await self.aretrieve(query, k)).documents
+            self._log_results(results)
+            return results
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche de chunks similaires : {e}")
+            return []
+
+    def cache_stats(self) -> Dict:
+        return {
+            "index_version": self.index_version,
+            "lexical_index": self._state.lexical.stats(),
+            "embedding_cache": self.embedding_cache.stats(),
+            "result_cache": self.result_cache.stats(),
+        }
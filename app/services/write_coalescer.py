@@ -0,0 +1,82 @@
+# app/services/write_coalescer.py
+"""
+Regroupement des écritures de tours de conversation de sessions concurrentes.
+"""
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TurnWriteCoalescer:
+    """
+    Collecte les tours à écrire pendant quelques millisecondes (ou jusqu'à
+    `max_batch_size` tours) et les transmet ensemble à `write_batch`, qui les
+    écrit en un seul bulk_write. Chaque appelant attend l'écriture de son lot.
+    """
+    def __init__(self, write_batch: Callable[[List[Tuple[str, List[Dict]]]], Awaitable[None]],
+                 max_batch_size: int = 100, max_wait_ms: float = 5.0):
+        self._write_batch = write_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.batches = 0
+        self.turns = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def append(self, session_id: str, messages: List[Dict]) -> bool:
+        """
+        Ajoute un tour au prochain lot et attend son écriture.
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((session_id, messages, future))
+        return await future
+
+    async def _collect_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            try:
+                await self._write_batch([(session_id, messages) for session_id, messages, _ in batch])
+            except Exception as e:
+                logger.error(f"Erreur lors de l'écriture groupée de {len(batch)} tours : {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.turns += len(batch)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_result(True)
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "turns": self.turns,
+            "avg_batch_size": self.turns / self.batches if self.batches else 0.0,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+        }
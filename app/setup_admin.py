@@ -1,4 +1,5 @@
 import asyncio
+from core import database
 from services.mongo_service import MongoService
 
 async def setup_admin():
@@ -6,13 +7,17 @@ async def setup_admin():
     Script pour configurer et enregistrer la clé administrateur dans la base de données.
     """
     # Initialisez le service MongoDB
+    await database.connect()
     mongo_service = MongoService()
 
     # La clé administrateur à enregistrer
     admin_key = "nQ0yzhPzH8a7lirrMMx1ZQttesv_9-3vnci6AVhr2tQ"
 
     # Appeler la méthode save_admin_key
-    success = await mongo_service.save_admin_key(admin_key)
+    try:
+        success = await mongo_service.save_admin_key(admin_key)
+    finally:
+        database.close()
     if success:
         print("Clé administrateur enregistrée avec succès.")
     else:
@@ -0,0 +1,9 @@
+# app/tests/conftest.py
+"""
+Les modules de l'application s'importent depuis app/ (`from services...`), comme
+lorsque l'API ou les scripts sont lancés depuis ce répertoire.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,65 @@
+# app/tests/test_cache.py
+from types import SimpleNamespace
+import pytest
+from services import cache
+from services.cache import MISSING, TTLCache, normalize_query
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_missing_key_is_a_miss(clock):
+    entries = TTLCache(maxsize=2, ttl=10)
+    assert entries.get("absent") is MISSING
+    assert entries.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    entries = TTLCache(maxsize=2, ttl=10)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    assert entries.get("a") == 1
+    entries.set("c", 3)
+    assert entries.get("b") is MISSING
+    assert entries.get("a") == 1
+    assert entries.get("c") == 3
+    assert entries.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    entries = TTLCache(maxsize=4, ttl=10)
+    entries.set("a", 1)
+    entries.set("b", 2, ttl=30)
+    clock[0] = 9
+    assert entries.get("a") == 1
+    clock[0] = 11
+    assert entries.get("a") is MISSING
+    assert entries.get("b") == 2
+    assert len(entries) == 1
+
+
+def test_zero_size_cache_stores_nothing(clock):
+    entries = TTLCache(maxsize=0, ttl=10)
+    entries.set("a", 1)
+    assert entries.get("a") is MISSING
+    assert len(entries) == 0
+
+
+def test_stats_hit_ratio(clock):
+    entries = TTLCache(maxsize=2, ttl=10)
+    entries.set("a", 1)
+    entries.get("a")
+    entries.get("a")
+    entries.get("b")
+    stats = entries.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_ratio"] == pytest.approx(2 / 3)
+
+
+def test_normalize_query():
+    assert normalize_query("  Quel   est le DÉLAI ?  ") == "quel est le délai ?"
+    assert normalize_query("ﬁchier") == "fichier"
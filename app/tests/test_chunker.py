@@ -0,0 +1,62 @@
+# app/tests/test_chunker.py
+import pytest
+
+chunker = pytest.importorskip("services.chunker")
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # Un token par mot : les découpages ne dépendent pas de la présence de tiktoken
+    monkeypatch.setattr(chunker, "count_tokens", lambda text: len(text.split()))
+
+
+def texts(text, target, overlap):
+    return [text[start:end] for start, end in chunker.split_text(text, target, overlap)]
+
+
+def test_chunks_overlap_by_whole_sentences():
+    text = "Alpha beta gamma. Delta epsilon zeta. Eta theta iota. Kappa lambda mu."
+    assert texts(text, target=6, overlap=3) == [
+        "Alpha beta gamma. Delta epsilon zeta.",
+        "Delta epsilon zeta. Eta theta iota.",
+        "Eta theta iota. Kappa lambda mu.",
+    ]
+
+
+def test_no_overlap():
+    text = "Alpha beta gamma. Delta epsilon zeta. Eta theta iota."
+    assert texts(text, target=6, overlap=0) == [
+        "Alpha beta gamma. Delta epsilon zeta.",
+        "Eta theta iota.",
+    ]
+
+
+def test_heading_starts_a_new_chunk():
+    text = "INTRODUCTION\n\nAlpha beta gamma. Delta epsilon zeta.\n\nMETHODES\n\nEta theta iota."
+    assert texts(text, target=8, overlap=3) == [
+        "INTRODUCTION\n\nAlpha beta gamma. Delta epsilon zeta.",
+        "METHODES\n\nEta theta iota.",
+    ]
+
+
+def test_long_sentence_is_split_between_words():
+    text = "one two three four five six seven."
+    assert texts(text, target=3, overlap=0) == ["one two three", "four five six", "seven."]
+
+
+def test_chunk_page_offsets_and_metadata():
+    text = "  Premier paragraphe court. Une deuxième phrase ici.\n\nUn autre paragraphe, plus loin. Fin du texte."
+    chunks = chunker.chunk_page(3, text, target_tokens=8, overlap_tokens=4)
+    assert [chunk["chunk_index"] for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert chunk["page_number"] == 3
+        assert text[chunk["char_start"]:chunk["char_end"]] == chunk["text"]
+        assert chunk["token_count"] == len(chunk["text"].split()) <= 8
+    assert chunks[0]["char_start"] == 2
+    assert chunks[-1]["char_end"] == len(text)
+    starts = [chunk["char_start"] for chunk in chunks]
+    assert starts == sorted(starts)
+
+
+def test_empty_page_has_no_chunks():
+    assert chunker.chunk_page(1, "   \n\n  ", target_tokens=8, overlap_tokens=2) == []
@@ -0,0 +1,44 @@
+# app/tests/test_context_builder.py
+from types import SimpleNamespace
+import pytest
+
+np = pytest.importorskip("numpy")
+context_builder = pytest.importorskip("services.context_builder")
+
+
+def builder(token_budget=100, max_chunks=5):
+    return context_builder.ContextBuilder(
+        token_budget=token_budget, max_chunks=max_chunks, min_similarity=0.5,
+        mmr_lambda=0.5, duplicate_similarity=0.95
+    )
+
+
+def retrieval(*vectors):
+    return SimpleNamespace(query_vector=np.array([1.0, 0.0]), vectors=np.array(vectors, dtype=np.float32))
+
+
+# Pertinent, doublon du premier, moins pertinent mais différent, hors sujet
+CHUNKS = ([1.0, 0.0], [2.0, 0.0], [0.8, 0.6], [0.0, 1.0])
+
+
+def test_mmr_drops_duplicates_and_irrelevant_chunks():
+    selector = builder()
+    assert selector._select(retrieval(*CHUNKS), [10, 10, 10, 10]) == [0, 2]
+    stats = selector.stats()
+    assert stats["dropped_duplicates"] == 1
+    assert stats["dropped_below_threshold"] == 1
+
+
+def test_token_budget_skips_chunks_that_do_not_fit():
+    selector = builder(token_budget=100)
+    assert selector._select(retrieval(*CHUNKS), [10, 10, 95, 10]) == [0]
+    assert selector.stats()["dropped_over_budget"] == 1
+
+
+def test_max_chunks():
+    selector = builder(max_chunks=1)
+    assert selector._select(retrieval(*CHUNKS), [10, 10, 10, 10]) == [0]
+
+
+def test_empty_retrieval_gives_empty_context():
+    assert builder().build(None) == context_builder.Context("", 0, 0, 0)
@@ -0,0 +1,51 @@
+# app/tests/test_pagination.py
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("bcrypt")
+
+from fastapi import HTTPException
+from core.config import settings
+from services.pagination import decode_cursor, encode_cursor, page, page_limit
+
+
+def test_cursor_round_trip():
+    values = {"id": "65f1c0ffee0000000000abcd", "seq": 12, "timestamp": "2024-05-01T10:00:00"}
+    cursor = encode_cursor(values)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, id=str, seq=int, timestamp=str) == values
+
+
+def test_cursor_fields_are_converted():
+    cursor = encode_cursor({"seq": "7"})
+    assert decode_cursor(cursor, seq=int) == {"seq": 7}
+
+
+def test_no_cursor_means_first_page():
+    assert decode_cursor(None, id=str) is None
+    assert decode_cursor("", id=str) is None
+
+
+@pytest.mark.parametrize("cursor", ["pas-un-curseur", encode_cursor({"other": 1}), "e30"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, id=str)
+    assert error.value.status_code == 400
+
+
+def test_unconvertible_field_is_rejected():
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_cursor({"seq": "abc"}), seq=int)
+
+
+def test_page_encodes_next_cursor():
+    result = page([1, 2], {"id": "x"})
+    assert result["items"] == [1, 2]
+    assert decode_cursor(result["next_cursor"], id=str) == {"id": "x"}
+    assert page([], None) == {"items": [], "next_cursor": None}
+
+
+def test_page_limit_bounds():
+    assert page_limit(None) == settings.default_page_size
+    assert page_limit(0) == 1
+    assert page_limit(settings.max_page_size + 1) == settings.max_page_size
@@ -0,0 +1,67 @@
+# app/tests/test_ranking.py
+import pytest
+
+pytest.importorskip("numpy")
+
+from services.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+
+def test_fusion_orders_by_summed_reciprocal_rank():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]], limit=3, rrf_k=60)
+    assert fused == [1, 3, 2]
+
+
+def test_fusion_favours_documents_found_by_both_rankings():
+    fused = reciprocal_rank_fusion([["dense", "both"], ["lexical", "both"]], limit=3)
+    assert fused[0] == "both"
+    assert set(fused) == {"dense", "both", "lexical"}
+
+
+def test_fusion_limit_and_empty_rankings():
+    assert reciprocal_rank_fusion([[1, 2, 3]], limit=2) == [1, 2]
+    assert reciprocal_rank_fusion([[], []], limit=5) == []
+
+
+def test_tokenize_keeps_compound_words_and_their_parts():
+    assert tokenize("Dry-Run v2.1") == ["dry-run", "dry", "run", "v2.1", "v2", "1"]
+    assert tokenize("Réseau") == ["reseau"]
+
+
+@pytest.fixture
+def index():
+    lexical = LexicalIndex()
+    lexical.add([0, 1, 2], [
+        "erreur ERR-404 lors du chargement de la page",
+        "chargement du modèle",
+        "configuration du réseau",
+    ])
+    return lexical
+
+
+def test_exact_term_is_found(index):
+    assert [label for label, _ in index.search("code err-404", k=5)] == [0]
+
+
+def test_shorter_document_ranks_first(index):
+    results = index.search("chargement", k=5)
+    assert [label for label, _ in results] == [1, 0]
+    assert results[0][1] > results[1][1] > 0
+
+
+def test_accents_are_ignored(index):
+    assert [label for label, _ in index.search("reseau", k=5)] == [2]
+
+
+def test_k_limits_results(index):
+    assert len(index.search("du", k=2)) == 2
+
+
+def test_removed_documents_are_not_returned(index):
+    index.remove([1])
+    assert [label for label, _ in index.search("chargement", k=5)] == [0]
+    assert index.stats()["documents"] == 2
+
+
+def test_unknown_terms_return_nothing(index):
+    assert index.search("inexistant", k=5) == []
+    assert LexicalIndex().search("chargement", k=5) == []
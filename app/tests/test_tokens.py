@@ -0,0 +1,44 @@
+# app/tests/test_tokens.py
+import pytest
+from services import tokens
+from services.tokens import MESSAGE_OVERHEAD_TOKENS, split_history
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # Un token par mot : les budgets ne dépendent pas de la présence de tiktoken
+    monkeypatch.setattr(tokens, "count_tokens", lambda text: len(text.split()))
+
+
+def messages(count):
+    return [{"role": "user", "content": f"message numéro {position}"} for position in range(count)]
+
+
+def test_recent_messages_fit_in_budget():
+    history = messages(5)
+    cost = 3 + MESSAGE_OVERHEAD_TOKENS
+    older, recent = split_history(history, budget=2 * cost)
+    assert recent == history[3:]
+    assert older == history[:3]
+
+
+def test_partial_message_does_not_fit():
+    history = messages(5)
+    cost = 3 + MESSAGE_OVERHEAD_TOKENS
+    older, recent = split_history(history, budget=2 * cost + cost - 1)
+    assert recent == history[3:]
+    assert older + recent == history
+
+
+def test_budget_larger_than_history():
+    history = messages(3)
+    assert split_history(history, budget=10_000) == ([], history)
+
+
+def test_zero_budget_keeps_nothing_recent():
+    history = messages(3)
+    assert split_history(history, budget=0) == (history, [])
+
+
+def test_empty_history():
+    assert split_history([], budget=100) == ([], [])
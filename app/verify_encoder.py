@@ -0,0 +1,96 @@
+import argparse
+import sys
+import time
+import numpy as np
+from pymongo import MongoClient
+from core.config import settings
+from services.encoders import ENCODER_BACKENDS, export_onnx, load_encoder
+
+# Textes utilisés si la collection des chunks est vide
+SAMPLE_TEXTS = [
+    "Quels sont les bénéfices d'une solution de GMAO ?",
+    "La maintenance préventive réduit les arrêts non planifiés des équipements.",
+    "Erreur E-1042 : le capteur de température ne répond plus.",
+    "Lancer la commande avec l'option --dry-run pour simuler la migration.",
+    "Le planning des interventions est partagé avec les techniciens sur site.",
+]
+
+
+def load_texts(limit: int):
+    """
+    Charge jusqu'à `limit` textes de chunks PDF (les textes d'exemple si la collection est vide).
+    """
+    client = MongoClient(settings.mongodb_uri)
+    collection = client[settings.database_name][settings.pdf_chunks_collection]
+    texts = [chunk["text"] for chunk in collection.find({}, {"text": 1, "_id": 0}).limit(limit) if chunk.get("text")]
+    client.close()
+    return texts or SAMPLE_TEXTS
+
+
+def measure(encoder, texts, batch_size: int, n_queries: int):
+    """
+    Retourne (embeddings, débit en textes/s, latence p50 et p99 en ms d'une requête seule).
+    """
+    encoder.encode(texts[:batch_size], batch_size=batch_size)  # Préchauffage
+    started = time.perf_counter()
+    embeddings = np.asarray(encoder.encode(texts, batch_size=batch_size), dtype=np.float32)
+    throughput = len(texts) / (time.perf_counter() - started)
+    latencies = []
+    for text in texts[:n_queries]:
+        started = time.perf_counter()
+        encoder.encode(text)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return embeddings, throughput, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.clip(np.linalg.norm(a, axis=1, keepdims=True), 1e-12, None)
+    b = b / np.clip(np.linalg.norm(b, axis=1, keepdims=True), 1e-12, None)
+    return (a * b).sum(axis=1)
+
+
+def verify_encoder(backends, limit: int, batch_size: int, n_queries: int, min_cosine: float, export: bool) -> bool:
+    """
+    Script pour vérifier les backends d'encodage (ENCODER_BACKEND) par rapport à la
+    référence PyTorch : similarité cosinus des embeddings d'un même texte, débit
+    d'encodage par lots (ingestion) et latence d'une requête seule (chat).
+    Avec --export, le modèle est d'abord exporté en ONNX et en ONNX int8.
+    Retourne False si un backend s'écarte de la référence (cosinus minimal < --min-cosine).
+    """
+    if export:
+        print(f"Modèle exporté dans {export_onnx(settings.embedding_model_name)}")
+    texts = load_texts(limit)
+    print(f"{len(texts)} textes, modèle {settings.embedding_model_name}, lots de {batch_size}")
+    print(f"{'backend':<10} {'chargement (s)':>14} {'textes/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'cos min':>8} {'cos moyen':>9}")
+
+    reference = None
+    valid = True
+    for backend in ["torch"] + [backend for backend in backends if backend != "torch"]:
+        started = time.perf_counter()
+        encoder = load_encoder(backend)
+        load_time = time.perf_counter() - started
+        embeddings, throughput, p50, p99 = measure(encoder, texts, batch_size, n_queries)
+        if reference is None:
+            reference = embeddings
+            similarity = np.ones(len(texts))
+        else:
+            similarity = cosine(reference, embeddings)
+            valid = valid and similarity.min() >= min_cosine
+        print(f"{backend:<10} {load_time:>14.2f} {throughput:>9.1f} {p50:>9.2f} {p99:>9.2f} "
+              f"{similarity.min():>8.4f} {similarity.mean():>9.4f}")
+    if not valid:
+        print(f"Écart à la référence supérieur au seuil (cosinus < {min_cosine}).")
+    return valid
+
+# Exécuter le script
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parité et performances des backends d'encodage.")
+    parser.add_argument("--backends", nargs="+", default=list(ENCODER_BACKENDS), choices=ENCODER_BACKENDS)
+    parser.add_argument("--export", action="store_true", help="Exporter d'abord le modèle en ONNX et ONNX int8")
+    parser.add_argument("--limit", type=int, default=1000, help="Nombre maximal de textes encodés")
+    parser.add_argument("--batch-size", type=int, default=32, help="Taille des lots d'encodage")
+    parser.add_argument("--queries", type=int, default=100, help="Requêtes seules pour la mesure de latence")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Similarité cosinus minimale avec la référence")
+    args = parser.parse_args()
+    ok = verify_encoder(args.backends, args.limit, args.batch_size, args.queries, args.min_cosine, args.export)
+    sys.exit(0 if ok else 1)
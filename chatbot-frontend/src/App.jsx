@@ -17,6 +17,8 @@ function App() {
   const [isAdminLogin, setIsAdminLogin] = useState(false); // État pour basculer vers AdminLogin
   const [messages, setMessages] = useState([]);
   const [sessions, setSessions] = useState([]);
+  const [sessionsCursor, setSessionsCursor] = useState(null); // Curseur de la page de sessions suivante
+  const [historyCursor, setHistoryCursor] = useState(null); // Curseur des messages plus anciens
   const [currentSession, setCurrentSession] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
 
@@ -49,21 +51,47 @@ function App() {
   const loadSessions = async () => {
     try {
       const response = await chatApi.getAllSessions();
-      console.log('Loaded sessions:', response);
-      setSessions(response);
-      if (response.length > 0) {
-        setCurrentSession(response[0]);
+      console.log('Loaded sessions:', response.items);
+      setSessions(response.items);
+      setSessionsCursor(response.nextCursor);
+      if (response.items.length > 0) {
+        setCurrentSession(response.items[0].session_id);
       }
     } catch (error) {
       console.error('Error loading sessions:', error);
     }
   };
 
+  // Charge la page de sessions suivante, à la demande
+  const loadMoreSessions = async () => {
+    if (!sessionsCursor) return;
+    try {
+      const response = await chatApi.getAllSessions(sessionsCursor);
+      setSessions((prev) => [...prev, ...response.items]);
+      setSessionsCursor(response.nextCursor);
+    } catch (error) {
+      console.error('Error loading sessions:', error);
+    }
+  };
+
   const loadHistory = async () => {
     try {
       const history = await chatApi.getHistory(currentSession);
-      console.log('Loaded history:', history);
-      setMessages(history);
+      console.log('Loaded history:', history.items);
+      setMessages(history.items);
+      setHistoryCursor(history.nextCursor);
+    } catch (error) {
+      console.error('Error loading history:', error);
+    }
+  };
+
+  // Charge les messages plus anciens de la session courante, à la demande
+  const loadOlderMessages = async () => {
+    if (!historyCursor) return;
+    try {
+      const history = await chatApi.getHistory(currentSession, historyCursor);
+      setMessages((prev) => [...history.items, ...prev]);
+      setHistoryCursor(history.nextCursor);
     } catch (error) {
       console.error('Error loading history:', error);
     }
@@ -90,9 +118,11 @@ function App() {
   const handleCreateSession = async () => {
     try {
       const newSessionId = await chatApi.createSession();
-      setSessions([...sessions, newSessionId]);
+      // Les sessions sont triées de la plus récente à la plus ancienne
+      setSessions((prev) => [{ session_id: newSessionId, session_name: null }, ...prev]);
       setCurrentSession(newSessionId);
       setMessages([]);
+      setHistoryCursor(null);
     } catch (error) {
       console.error('Error creating session:', error);
     }
@@ -101,10 +131,11 @@ function App() {
   const handleDeleteSession = async (sessionId) => {
     try {
       await chatApi.deleteSession(sessionId);
-      setSessions((prev) => prev.filter((session) => session !== sessionId));
+      setSessions((prev) => prev.filter((session) => session.session_id !== sessionId));
       if (currentSession === sessionId) {
         setCurrentSession(null);
         setMessages([]);
+        setHistoryCursor(null);
       }
     } catch (error) {
       console.error('Error deleting session:', error);
@@ -131,6 +162,8 @@ function App() {
     setIsAdmin(false); // Réinitialiser l'état admin
     setMessages([]);
     setSessions([]);
+    setSessionsCursor(null);
+    setHistoryCursor(null);
     setCurrentSession(null);
   };
   const renameSession = async (sessionId, newName) => {
@@ -142,7 +175,7 @@ function App() {
 
        setSessions((prevSessions) =>
             prevSessions.map((session) =>
-                session === sessionId ? newName : session
+                session.session_id === sessionId ? { ...session, session_name: newName } : session
             )
         );
     } catch (error) {
@@ -203,10 +236,16 @@ function App() {
           onCreateSession={handleCreateSession}
           onDeleteSession={handleDeleteSession}
           onRenameSession={renameSession} 
+          hasMoreSessions={Boolean(sessionsCursor)}
+          onLoadMoreSessions={loadMoreSessions}
         />
         {/* Chat Area */}
         <div className="flex-1 flex flex-col bg-gray-800 shadow-xl rounded-tl-lg">
-          <ChatWindow messages={messages} />
+          <ChatWindow
+            messages={messages}
+            hasOlderMessages={Boolean(historyCursor)}
+            onLoadOlderMessages={loadOlderMessages}
+          />
           <MessageInput
             onSendMessage={handleSendMessage}
             isLoading={isLoading}
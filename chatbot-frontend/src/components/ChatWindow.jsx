@@ -1,19 +1,29 @@
 import { useEffect, useRef } from 'react';
 import Message from './Message';
 
-const ChatWindow = ({ messages }) => {
+const ChatWindow = ({ messages, hasOlderMessages, onLoadOlderMessages }) => {
   const messagesEndRef = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
+  // Défiler seulement à l'arrivée d'un nouveau message, pas au chargement de messages plus anciens
+  const lastMessage = messages[messages.length - 1];
   useEffect(() => {
     scrollToBottom();
-  }, [messages]);
+  }, [lastMessage]);
 
   return (
     <div className="flex-1 overflow-y-auto p-4 bg-gray-900 text-white">
+      {hasOlderMessages && (
+        <button
+          onClick={onLoadOlderMessages}
+          className="btn btn-link text-decoration-none text-gray-400 w-100 mb-3"
+        >
+          <i className="bi bi-arrow-up-circle me-2"></i> Messages précédents
+        </button>
+      )}
       {messages.map((message, index) => (
         <Message
           key={index}
@@ -2,16 +2,20 @@ import React, { useState } from 'react';
 import Dropdown from 'react-bootstrap/Dropdown';
 import DropdownButton from 'react-bootstrap/DropdownButton';
 
-const ConversationsList = ({ sessions, currentSession, onSessionChange, onCreateSession, onDeleteSession, onRenameSession }) => {
+// Nom affiché d'une session : son nom s'il a été renommé, sinon la fin de son identifiant
+const sessionLabel = (session) => session.session_name || session.session_id.slice(-6);
+
+const ConversationsList = ({ sessions, currentSession, onSessionChange, onCreateSession, onDeleteSession, onRenameSession,
+  hasMoreSessions, onLoadMoreSessions }) => {
   const [hoveredSession, setHoveredSession] = useState(null);
   const [editingSession, setEditingSession] = useState(null);
   const [newSessionName, setNewSessionName] = useState('');
 
   const handleRename = (session) => {
-    console.log(`Renommer la session : ${session}`);
-    setEditingSession(session);
-    setNewSessionName(session);
-    console.log(`État après clic sur renommer : editingSession=${session}, newSessionName=${session}`);
+    console.log(`Renommer la session : ${session.session_id}`);
+    setEditingSession(session.session_id);
+    setNewSessionName(sessionLabel(session));
+    console.log(`État après clic sur renommer : editingSession=${session.session_id}, newSessionName=${sessionLabel(session)}`);
   };
   const handleRenameSession = async () => {
     if (!editingSession) return; // Pas de session sélectionnée
@@ -24,9 +28,9 @@ const ConversationsList = ({ sessions, currentSession, onSessionChange, onCreate
     }
   };
   const handleRenameSubmit = (session) => {
-    console.log(`Soumission du nouveau nom : ${newSessionName} pour la session : ${session}`);
-    if (newSessionName.trim() !== '' && newSessionName !== session) {
-      onRenameSession(session, newSessionName.trim());
+    console.log(`Soumission du nouveau nom : ${newSessionName} pour la session : ${session.session_id}`);
+    if (newSessionName.trim() !== '' && newSessionName !== sessionLabel(session)) {
+      onRenameSession(session.session_id, newSessionName.trim());
     }
     setEditingSession(null);
   };
@@ -42,19 +46,19 @@ const ConversationsList = ({ sessions, currentSession, onSessionChange, onCreate
           <ul className="list-group">
             {sessions.map((session) => (
               <li
-                key={session + (editingSession === session ? '-editing' : '')}
+                key={session.session_id + (editingSession === session.session_id ? '-editing' : '')}
                 className={`d-flex justify-content-between align-items-center transition-all duration-200 
               rounded-lg shadow-sm
-              ${currentSession === session
+              ${currentSession === session.session_id
                     ? 'bg-gray-700 text-white' // Style pour l'élément sélectionné
                     : 'bg-gray-800 text-gray-300'
                   } 
-              ${hoveredSession === session ? 'bg-gray-600 text-white' : ''}`}
-                onMouseEnter={() => setHoveredSession(session)}
+              ${hoveredSession === session.session_id ? 'bg-gray-600 text-white' : ''}`}
+                onMouseEnter={() => setHoveredSession(session.session_id)}
                 onMouseLeave={() => setHoveredSession(null)}
               >
 
-                {editingSession === session ? (
+                {editingSession === session.session_id ? (
                   <input
                     type="text"
                     value={newSessionName}
@@ -69,20 +73,24 @@ const ConversationsList = ({ sessions, currentSession, onSessionChange, onCreate
                   />
                 ) : (
                   <button
-                    onClick={() => onSessionChange(session)}
+                    onClick={() => onSessionChange(session.session_id)}
                     className="btn btn-link text-decoration-none text-start flex-grow-1"
                     style={{
-                      color: currentSession === session ? '#fff' : '#9CA3AF', // Gris clair
-                      fontWeight: currentSession === session ? 'bold' : 'normal',
+                      color: currentSession === session.session_id ? '#fff' : '#9CA3AF', // Gris clair
+                      fontWeight: currentSession === session.session_id ? 'bold' : 'normal',
                     }}
+                    title={session.updated_at ? `Modifiée le ${session.updated_at}` : undefined}
                   >
                     <i className="bi bi-chat-dots me-2"></i>
-                    {session.slice(-6)}
+                    {sessionLabel(session)}
+                    {session.updated_at && (
+                      <small className="d-block text-gray-500">{session.updated_at}</small>
+                    )}
                   </button>
                 )}
 
                 <DropdownButton
-                  id={`dropdown-${session}`}
+                  id={`dropdown-${session.session_id}`}
                   title={<i className="bi bi-three-dots"></i>}
                   variant="link"
                   align="end"
@@ -95,7 +103,7 @@ const ConversationsList = ({ sessions, currentSession, onSessionChange, onCreate
                     <i className="bi bi-pencil me-2"></i> Renommer
                   </Dropdown.Item>
                   <Dropdown.Item
-                    onClick={() => onDeleteSession(session)}
+                    onClick={() => onDeleteSession(session.session_id)}
                     className="text-red-500 hover:bg-red-800 hover:text-white transition duration-300"
                   >
                     <i className="bi bi-trash me-2"></i> Supprimer
@@ -108,6 +116,14 @@ const ConversationsList = ({ sessions, currentSession, onSessionChange, onCreate
         ) : (
           <p className="text-gray-500 text-center">No sessions available</p>
         )}
+        {hasMoreSessions && (
+          <button
+            onClick={onLoadMoreSessions}
+            className="btn btn-link text-decoration-none text-gray-400 w-100 mt-2"
+          >
+            <i className="bi bi-chevron-down me-2"></i> Charger plus
+          </button>
+        )}
       </div>
       <button
         onClick={onCreateSession}
@@ -3,14 +3,17 @@ import { chatApi } from '../services/api';
 
 const UserManagement = () => {
     const [users, setUsers] = useState([]);
+    const [usersCursor, setUsersCursor] = useState(null);
     const [error, setError] = useState(null);
     const [isLoading, setIsLoading] = useState(true);
+    const [isLoadingMore, setIsLoadingMore] = useState(false);
 
     const fetchUsers = async () => {
         try {
             setIsLoading(true);
-            const data = await chatApi.getAllUsers();
-            setUsers(Array.isArray(data) ? data : []);
+            const { items, nextCursor } = await chatApi.getAllUsers();
+            setUsers(Array.isArray(items) ? items : []);
+            setUsersCursor(nextCursor);
             setError(null);
         } catch (err) {
             console.error('Error fetching users:', err);
@@ -20,6 +23,22 @@ const UserManagement = () => {
         }
     };
 
+    // Page suivante, chargée à la demande
+    const loadMoreUsers = async () => {
+        if (!usersCursor || isLoadingMore) return;
+        try {
+            setIsLoadingMore(true);
+            const { items, nextCursor } = await chatApi.getAllUsers(usersCursor);
+            setUsers((previous) => [...previous, ...items]);
+            setUsersCursor(nextCursor);
+        } catch (err) {
+            console.error('Error fetching users:', err);
+            setError(err.message || 'Error loading users');
+        } finally {
+            setIsLoadingMore(false);
+        }
+    };
+
     useEffect(() => {
         fetchUsers();
     }, []);
@@ -28,7 +47,8 @@ const UserManagement = () => {
         if (window.confirm(`Êtes-vous sûr de vouloir supprimer l'utilisateur ${userEmail} ?`)) {
             try {
                 await chatApi.deleteUser(userId);
-                fetchUsers();
+                // Mise à jour locale : les pages déjà chargées sont conservées
+                setUsers((previous) => previous.filter((user) => user.id !== userId));
                 setError(null);
             } catch (err) {
                 console.error('Error deleting user:', err);
@@ -45,7 +65,9 @@ const UserManagement = () => {
                 if (response.is_blocked) {
                     await chatApi.checkUserStatus();
                 }
-                fetchUsers();
+                setUsers((previous) => previous.map((user) => (
+                    user.id === userId ? { ...user, is_blocked: response.is_blocked } : user
+                )));
                 setError(null);
             } catch (err) {
                 console.error('Error toggling user block status:', err);
@@ -218,6 +240,17 @@ const UserManagement = () => {
                     )}
                 </tbody>
             </table>
+            {usersCursor && (
+                <div className="p-4 text-center">
+                    <button
+                        onClick={loadMoreUsers}
+                        disabled={isLoadingMore}
+                        className="text-sm text-blue-400 hover:text-blue-200 disabled:opacity-50"
+                    >
+                        {isLoadingMore ? 'Chargement...' : 'Charger plus'}
+                    </button>
+                </div>
+            )}
         </div>
     );
 
@@ -4,6 +4,12 @@ const API_URL = 'http://localhost:8000';
 let usersCache = null;
 let lastFetch = null;
 
+// Lit une page d'une liste paginée par curseur : { items, nextCursor } (nextCursor null à la fin).
+const fetchPage = async (url, headers, cursor = null) => {
+  const response = await axios.get(url, { headers, params: cursor ? { cursor } : {} });
+  return { items: response.data.items, nextCursor: response.data.next_cursor };
+};
+
 export const chatApi = {
   login: async (data) => {
     const response = await axios.post(`${API_URL}/auth/login`, data);
@@ -45,20 +51,16 @@ export const chatApi = {
     return response.data;
   },
 
-  getHistory: async (sessionId) => {
+  // Page de l'historique : les messages les plus récents, puis les plus anciens avec `nextCursor`
+  getHistory: async (sessionId, cursor = null) => {
     const token = localStorage.getItem('token');
-    const response = await axios.get(`${API_URL}/chat/history/${sessionId}`, {
-      headers: { Authorization: `Bearer ${token}` },
-    });
-    return response.data;
+    return fetchPage(`${API_URL}/chat/history/${sessionId}`, { Authorization: `Bearer ${token}` }, cursor);
   },
 
-  getAllSessions: async () => {
+  // Page des sessions ({ session_id, session_name, created_at, updated_at }), les plus récentes d'abord
+  getAllSessions: async (cursor = null) => {
     const token = localStorage.getItem('token');
-    const response = await axios.get(`${API_URL}/chat/sessions`, {
-      headers: { Authorization: `Bearer ${token}` },
-    });
-    return response.data;
+    return fetchPage(`${API_URL}/chat/sessions`, { Authorization: `Bearer ${token}` }, cursor);
   },
 
   createSession: async () => {
@@ -96,7 +98,8 @@ export const chatApi = {
 
 
 
-  getAllUsers: async () => {
+  // Page des utilisateurs : la première, puis les suivantes avec `nextCursor`
+  getAllUsers: async (cursor = null) => {
     const token = localStorage.getItem('token');
     const role = localStorage.getItem('role');
 
@@ -105,19 +108,17 @@ export const chatApi = {
     }
 
     try {
-      const response = await axios.get(`${API_URL}/auth/admin/users`, {
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json',
-          'Accept': 'application/json'
-        }
-      });
+      const result = await fetchPage(`${API_URL}/auth/admin/users`, {
+        'Authorization': `Bearer ${token}`,
+        'Content-Type': 'application/json',
+        'Accept': 'application/json'
+      }, cursor);
 
       // Update cache
-      usersCache = response.data;
+      usersCache = cursor && usersCache ? [...usersCache, ...result.items] : result.items;
       lastFetch = Date.now();
 
-      return response.data;
+      return result;
     } catch (error) {
       console.error('Error fetching users:', error);
       throw error;